@@ -0,0 +1 @@
+"""Бенчмарки горячих путей анализатора и генератор синтетических логов."""
@@ -0,0 +1,163 @@
+"""
+Детерминированный генератор логов в формате logs/app*.log.
+
+Пример:
+    python -m benchmarks.generate /tmp/bench.log --lines 1000000 --endpoints 500
+"""
+
+import argparse
+import os
+import random
+import sys
+from collections.abc import Generator
+from itertools import islice
+
+DEFAULT_LEVEL_MIX = {"DEBUG": 20, "INFO": 50, "WARNING": 13, "ERROR": 12, "CRITICAL": 5}
+LOG_LEVELS = tuple(DEFAULT_LEVEL_MIX)
+BASE_ENDPOINTS = (
+    "/admin/dashboard/",
+    "/admin/login/",
+    "/api/v1/auth/login/",
+    "/api/v1/cart/",
+    "/api/v1/checkout/",
+    "/api/v1/orders/",
+    "/api/v1/payments/",
+    "/api/v1/products/",
+    "/api/v1/reviews/",
+    "/api/v1/shipping/",
+    "/api/v1/support/",
+    "/api/v1/users/",
+)
+OTHER_MESSAGES = (
+    "django.db.backends: (0.41) SELECT * FROM 'products' WHERE id = {n};",
+    "django.db.backends: (0.19) SELECT * FROM 'users' WHERE id = {n};",
+    "django.security: SuspiciousOperation: Invalid HTTP_HOST header",
+    "django.security: PermissionDenied: User does not have permission",
+    "django.security: ConnectionError: Failed to connect to payment gateway",
+    "django.core.management: DatabaseError: Deadlock detected",
+)
+WRITE_BATCH = 10_000  # строк, записываемых за один вызов write
+
+
+def parse_level_mix(value: str) -> dict[str, int]:
+    """Разбирает доли уровней вида INFO=60,ERROR=10 для argparse."""
+    mix = {}
+    for item in value.split(","):
+        level, sep, weight = item.partition("=")
+        if not sep or not weight.isdigit():
+            raise argparse.ArgumentTypeError(
+                f"ожидается LEVEL=WEIGHT, получено {item!r}"
+            )
+        level = level.strip().upper()
+        if level not in LOG_LEVELS:
+            known = ", ".join(LOG_LEVELS)
+            raise argparse.ArgumentTypeError(
+                f"неизвестный уровень {level!r}, ожидается один из: {known}"
+            )
+        mix[level] = int(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("сумма весов уровней должна быть больше 0")
+    return mix
+
+
+def make_endpoints(cardinality: int) -> list[str]:
+    """Возвращает cardinality различных endpoint, начиная с реальных из logs/."""
+    endpoints = list(BASE_ENDPOINTS[:cardinality])
+    endpoints.extend(
+        f"/api/v1/resource{i}/" for i in range(cardinality - len(endpoints))
+    )
+    return endpoints
+
+
+def generate_lines(
+    lines: int,
+    seed: int = 0,
+    level_mix: dict[str, int] | None = None,
+    endpoints: int = len(BASE_ENDPOINTS),
+    request_share: float = 0.6,
+) -> Generator[str, None, None]:
+    """
+    Генерирует строки лога с переводом строки.
+
+    Одинаковые параметры всегда дают одинаковый лог. Доля request_share строк
+    пишется логгером django.request, уровни выбираются по весам level_mix,
+    endpoint - равномерно из endpoints различных значений.
+    """
+    rng = random.Random(seed)
+    mix = level_mix or DEFAULT_LEVEL_MIX
+    levels, weights = list(mix), list(mix.values())
+    paths = make_endpoints(endpoints)
+
+    for _ in range(lines):
+        level = rng.choices(levels, weights)[0]
+        stamp = f"2025-03-28 12:{rng.randrange(60):02d}:{rng.randrange(60):02d},000"
+        ip = f"192.168.1.{rng.randrange(1, 100)}"
+        if rng.random() < request_share:
+            path = paths[rng.randrange(len(paths))]
+            if level in ("ERROR", "CRITICAL"):
+                message = f"django.request: Internal Server Error: {path} [{ip}]"
+            else:
+                status = rng.choice((200, 201, 204))
+                message = f"django.request: GET {path} {status} OK [{ip}]"
+        else:
+            template = OTHER_MESSAGES[rng.randrange(len(OTHER_MESSAGES))]
+            message = template.format(n=rng.randrange(100))
+        yield f"{stamp} {level} {message}\n"
+
+
+def write_log(path: str, lines: int, **options) -> int:
+    """Записывает сгенерированный лог в файл и возвращает его размер в байтах."""
+    generator = generate_lines(lines, **options)
+    with open(path, "w", encoding="utf-8") as file:
+        while batch := "".join(islice(generator, WRITE_BATCH)):
+            file.write(batch)
+    return os.path.getsize(path)
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    """Добавляет в парсер параметры генератора."""
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Число строк")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно генератора")
+    parser.add_argument(
+        "--levels",
+        type=parse_level_mix,
+        default=DEFAULT_LEVEL_MIX,
+        metavar="LEVEL=WEIGHT,...",
+        help="Веса уровней логирования",
+    )
+    parser.add_argument(
+        "--endpoints",
+        type=int,
+        default=len(BASE_ENDPOINTS),
+        help="Число различных endpoint",
+    )
+    parser.add_argument(
+        "--request-share",
+        type=float,
+        default=0.6,
+        help="Доля строк логгера django.request",
+    )
+
+
+def generator_options(args: argparse.Namespace) -> dict:
+    """Параметры generate_lines из аргументов командной строки."""
+    return {
+        "seed": args.seed,
+        "level_mix": args.levels,
+        "endpoints": args.endpoints,
+        "request_share": args.request_share,
+    }
+
+
+def main():
+    """Точка входа генератора."""
+    parser = argparse.ArgumentParser(description="Генератор синтетических логов")
+    parser.add_argument("output", help="Путь к создаваемому файлу лога")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    size = write_log(args.output, args.lines, **generator_options(args))
+    sys.stdout.write(f"{args.output}: {args.lines} строк, {size} байт\n")
+
+
+if __name__ == "__main__":
+    main()
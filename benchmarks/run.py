@@ -0,0 +1,405 @@
+"""
+Бенчмарки горячих путей анализатора с выводом в JSON и сравнением с базой.
+
+Каждый бенчмарк запускается в отдельном процессе, чтобы пиковый RSS
+относился только к нему. Время импорта main (python -X importtime)
+сверяется с бюджетом --startup-budget. Пример:
+    python -m benchmarks.run --lines 1000000 --output bench.json
+    python -m benchmarks.run --lines 1000000 --baseline bench.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Generator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import get_context
+
+from benchmarks.generate import add_generator_arguments, generator_options, write_log
+
+logger = logging.getLogger(__name__)
+
+PARSE_SAMPLE = 1_000_000  # строк, загружаемых в память для parse_log_line
+MATCH_GROUPS = ("log_level", "endpoint")
+DEFAULT_TOLERANCE = 0.1  # допустимое ухудшение относительно базы
+SMALL_FILES = 1000  # файлов в бенчмарках множества небольших файлов
+SMALL_FILE_LINES = 100  # строк в каждом небольшом файле
+OPEN_LATENCY = 0.002  # секунд задержки открытия файла, как на сетевом диске
+SMALL_CONCURRENCY = 64
+MERGE_SNAPSHOTS = 100  # снимков --save-stats в бенчмарке merge_snapshots
+STARTUP_BUDGET_MS = 100  # бюджет времени импорта main по python -X importtime
+
+
+def bench_read_file(main, path: str):
+    """Построчное чтение файла."""
+
+    def run():
+        lines = 0
+        for _ in main.read_file(path):
+            lines += 1
+        return lines
+
+    return run, os.path.getsize(path)
+
+
+def bench_parse_log_line(main, path: str):
+    """Разбор строк по одной, строки заранее загружены в память."""
+    sample = list(islice(main.read_file(path), PARSE_SAMPLE))
+
+    def run():
+        parse = main.parse_log_line
+        for line in sample:
+            parse(line, MATCH_GROUPS)
+        return len(sample)
+
+    return run, sum(len(line.encode()) for line in sample)
+
+
+def bench_process_file(main, path: str):
+    """Подсчет запросов в одном файле."""
+
+    def run():
+        main.process_file(path, "handlers")
+
+    return run, os.path.getsize(path)
+
+
+def bench_collect_statistics(main, path: str):
+    """Сбор статистики по файлу в пуле процессов из os.cpu_count() воркеров."""
+    workers = os.cpu_count() or 1
+
+    def run():
+        main.collect_statistics([path], "handlers", workers)
+
+    return run, os.path.getsize(path)
+
+
+def bench_create_report(main, path: str):
+    """Построение отчета по готовой статистике файла, строки - строки отчета."""
+    stats = main.process_file(path, "handlers")
+
+    def run():
+        return len(main.create_report(stats))
+
+    return run, None
+
+
+def small_files(main, path: str) -> tuple[list[str], int]:
+    """
+    Делит начало лога на SMALL_FILES файлов по SMALL_FILE_LINES строк рядом с ним.
+
+    Файлы создаются при первом запуске и переиспользуются, как и сам лог.
+
+    :return (пути к файлам, число строк в них)
+    """
+    directory = f"{path}.small-{SMALL_FILES}"
+    paths = [os.path.join(directory, f"worker-{i:04}.log") for i in range(SMALL_FILES)]
+    if not os.path.isdir(directory):
+        tmp_directory = f"{directory}.tmp"
+        os.makedirs(tmp_directory, exist_ok=True)
+        lines = main.read_file(path)
+        for file_path in paths:
+            name = os.path.join(tmp_directory, os.path.basename(file_path))
+            with open(name, "w", encoding="utf-8") as file:
+                file.writelines(islice(lines, SMALL_FILE_LINES))
+        os.replace(tmp_directory, directory)
+    paths = [file_path for file_path in paths if os.path.getsize(file_path)]
+    lines = 0
+    for file_path in paths:
+        with open(file_path, "rb") as file:
+            lines += sum(1 for _ in file)
+    return paths, lines
+
+
+@contextmanager
+def open_latency(main) -> Generator[None, None, None]:
+    """Добавляет OPEN_LATENCY к каждому открытию файла в модуле main."""
+
+    def slow_open(*args, **kwargs):
+        time.sleep(OPEN_LATENCY)
+        return open(*args, **kwargs)
+
+    main.open = slow_open
+    try:
+        yield
+    finally:
+        del main.open
+
+
+def bench_small_files_serial(main, path: str):
+    """Проверка и подсчет небольших файлов по очереди с задержкой открытия."""
+    paths, lines = small_files(main, path)
+
+    def run():
+        with open_latency(main):
+            valid = main.validate_log_files(argparse.ArgumentParser(), paths)
+            main.collect_statistics(valid, "handlers")
+        return lines
+
+    return run, sum(map(os.path.getsize, paths))
+
+
+def bench_small_files_async(main, path: str):
+    """Те же файлы через --concurrency SMALL_CONCURRENCY с задержкой открытия."""
+    paths, lines = small_files(main, path)
+
+    def run():
+        with open_latency(main):
+            main.collect_statistics(paths, "handlers", concurrency=SMALL_CONCURRENCY)
+        return lines
+
+    return run, sum(map(os.path.getsize, paths))
+
+
+def bench_merge_snapshots(main, path: str):
+    """Объединение MERGE_SNAPSHOTS снимков, строки - строки логов вместо снимков."""
+    aggregator = main.Aggregator()
+    snapshot = f"{path}.stats"
+    stats = main.process_file(path, "handlers")
+    main.save_snapshot(snapshot, "handlers", aggregator, stats)
+    lines = sum(1 for _ in main.read_file(path))
+
+    def run():
+        main.merge_snapshots([snapshot] * MERGE_SNAPSHOTS, "handlers", aggregator)
+        return lines * MERGE_SNAPSHOTS
+
+    return run, os.path.getsize(snapshot) * MERGE_SNAPSHOTS
+
+
+BENCHMARKS = {
+    "read_file": bench_read_file,
+    "parse_log_line": bench_parse_log_line,
+    "process_file": bench_process_file,
+    "collect_statistics": bench_collect_statistics,
+    "create_report": bench_create_report,
+    "small_files_serial": bench_small_files_serial,
+    "small_files_async": bench_small_files_async,
+    "merge_snapshots": bench_merge_snapshots,
+}
+
+
+def import_time_ms(module: str = "main") -> float:
+    """
+    Время импорта модуля в новом интерпретаторе по python -X importtime, мс.
+
+    Байт-код пишется в __pycache__, как при обычном запуске, поэтому
+    повторные замеры не включают компиляцию исходника.
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+    )
+    # строки вида «import time: self [us] | cumulative | imported package»
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise RuntimeError(f"python -X importtime не показал импорт {module}")
+
+
+def measure_startup(repeat: int, budget_ms: float) -> dict:
+    """Лучшее из repeat время импорта main после прогревочного запуска."""
+    import_time_ms()
+    import_ms = min(import_time_ms() for _ in range(repeat))
+    return {"import_ms": round(import_ms, 1), "budget_ms": budget_ms}
+
+
+def peak_rss_mb() -> float | None:
+    """Пиковый RSS текущего процесса в МБ или None, если он недоступен."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def run_benchmark(name: str, path: str, lines: int, repeat: int) -> dict:
+    """
+    Выполняет бенчмарк в текущем процессе и возвращает его метрики.
+
+    Время - лучшее из repeat запусков. Если бенчмарк вернул число строк,
+    пропускная способность считается по нему, иначе по всем строкам файла.
+    """
+    import main
+
+    logging.getLogger(main.__name__).setLevel(logging.WARNING)
+    run, size = BENCHMARKS[name](main, path)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processed = run()
+        timings.append(time.perf_counter() - start)
+    seconds = min(timings)
+    processed = lines if processed is None else processed
+    return {
+        "seconds": round(seconds, 6),
+        "lines": processed,
+        "lines_per_sec": round(processed / seconds, 1),
+        "mb_per_sec": None if size is None else round(size / 2**20 / seconds, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def prepare_log(args: argparse.Namespace) -> str:
+    """Возвращает путь к сгенерированному логу, создавая его при первом запуске."""
+    options = generator_options(args)
+    key = json.dumps({"lines": args.lines, **options}, sort_keys=True)
+    digest = hashlib.sha256(key.encode()).hexdigest()[:12]
+    path = os.path.join(args.data_dir, f"bench-{args.lines}-{digest}.log")
+    if not os.path.exists(path):
+        logger.info("Генерация лога %s на %s строк", path, args.lines)
+        tmp_path = f"{path}.tmp"
+        write_log(tmp_path, args.lines, **options)
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_all(names: list[str], path: str, lines: int, repeat: int) -> dict:
+    """Запускает бенчмарки, каждый в новом процессе spawn."""
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            results[name] = executor.submit(
+                run_benchmark, name, path, lines, repeat
+            ).result()
+        result = results[name]
+        logger.info(
+            "%s: %.0f строк/с, %s МБ/с, RSS %s МБ",
+            name,
+            result["lines_per_sec"],
+            result["mb_per_sec"] or "-",
+            result["peak_rss_mb"],
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Сравнивает результаты с базой и возвращает описания регрессий.
+
+    Регрессия - падение строк/с или рост пикового RSS больше чем на tolerance.
+    Бенчмарки, которых нет в базе, не сравниваются.
+    """
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            continue
+        if current["lines_per_sec"] < base["lines_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {current['lines_per_sec']:.0f} строк/с "
+                f"против {base['lines_per_sec']:.0f} в базе"
+            )
+        if (
+            current["peak_rss_mb"] is not None
+            and base["peak_rss_mb"] is not None
+            and current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance)
+        ):
+            regressions.append(
+                f"{name}: RSS {current['peak_rss_mb']:.0f} МБ "
+                f"против {base['peak_rss_mb']:.0f} МБ в базе"
+            )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Аргументы командной строки бенчмарков."""
+    parser = argparse.ArgumentParser(description="Бенчмарки анализатора логов")
+    add_generator_arguments(parser)
+    parser.add_argument(
+        "--bench",
+        choices=list(BENCHMARKS),
+        action="append",
+        help="Запускаемый бенчмарк, по умолчанию все",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов на бенчмарк")
+    parser.add_argument(
+        "--data-dir",
+        default=tempfile.gettempdir(),
+        help="Каталог для сгенерированных логов, они переиспользуются",
+    )
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--baseline", help="JSON с базовыми результатами")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Допустимое ухудшение относительно базы (доля)",
+    )
+    parser.add_argument(
+        "--startup-budget",
+        type=float,
+        default=STARTUP_BUDGET_MS,
+        metavar="MS",
+        help="Бюджет времени импорта main в мс, превышение - регрессия",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Точка входа: 0 - без регрессий, 1 - есть регрессии относительно базы."""
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    args = parse_args(argv)
+    path = prepare_log(args)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "lines": args.lines,
+            "bytes": os.path.getsize(path),
+            "generator": generator_options(args),
+            "repeat": args.repeat,
+        },
+        "benchmarks": run_all(
+            args.bench or list(BENCHMARKS), path, args.lines, args.repeat
+        ),
+        "startup": measure_startup(args.repeat, args.startup_budget),
+    }
+    logger.info(
+        "startup: импорт main %s мс при бюджете %s мс",
+        results["startup"]["import_ms"],
+        args.startup_budget,
+    )
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+    regressions = []
+    if results["startup"]["import_ms"] > args.startup_budget:
+        regressions.append(
+            f"startup: импорт main {results['startup']['import_ms']} мс "
+            f"сверх бюджета {args.startup_budget} мс"
+        )
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions += compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        logger.error("Регрессия %s", regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
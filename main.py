@@ -1,156 +1,4844 @@
 """Анализ журнала логирования."""
 
 import argparse
+import heapq
+import importlib
+import io
+import json
 import logging
+import math
+import mmap
+import os
 import re
+import select
+import struct
 import sys
 import time
-from collections import defaultdict
-from collections.abc import Generator
+import zlib
+from array import array
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Generator, Iterable, Iterator, Mapping
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain, compress, groupby, islice, repeat
+from json.encoder import encode_basestring
+from operator import itemgetter
 
-from coverage.annotate import os
+# asyncio, concurrent.futures, multiprocessing, ctypes, csv, cProfile, random,
+# ipaddress, sqlite3 и модули распаковки импортируются в функциях, которым они
+# нужны: короткий запуск по небольшому файлу не платит за их загрузку.
+logger = logging.getLogger(__name__)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(filename)s:%(lineno)d - %(message)s"
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LEVEL_INDEX = {level: i for i, level in enumerate(LOG_LEVELS)}
+ZERO_ROW = array("Q", bytes(8 * len(LOG_LEVELS)))
+PADDING_COL = 4
+RENDER_CHUNK = 10_000  # строк отчета, форматируемых и записываемых за один шаг
+CHUNK_SIZE = 32 * 1024 * 1024  # размер байтового диапазона для одной задачи пула
+BATCH_SIZE = 10_000  # строк в одной пачке для классификатора
+READ_BLOCK = 1024 * 1024  # байт, читаемых за один вызов при чтении диапазона
+MMAP_WINDOW = 16 * 1024 * 1024  # байт отображения, обрабатываемых за один шаг
+
+# Быстрая проверка подстрокой отсекает строки других логгеров до регулярного
+# выражения, которое компилируется один раз при импорте модуля.
+REQUEST_MARKER = "django.request:"
+LOG_PATTERN = re.compile(
+    rf"(?P<log_level>{'|'.join(LOG_LEVELS)})"
+    r".*?django\.request:"
+    r"\s(?:GET|POST|PUT|DELETE|PATCH|Internal\sServer\sError:)\s"
+    r"(?P<endpoint>/[^\s]+)"
+)
+# Тот же шаблон для поиска по склеенной пачке строк: пробелы и «.» не пересекают
+# перевод строки, а хвост строки поглощается, чтобы в строке было одно совпадение.
+BATCH_PATTERN = re.compile(
+    rf"({'|'.join(LOG_LEVELS)})"
+    r"[^\n]*?django\.request:"
+    r"[^\S\n](?:GET|POST|PUT|DELETE|PATCH|Internal[^\S\n]Server[^\S\n]Error:)"
+    r"[^\S\n](/[^\s]+)[^\n]*"
+)
+# Отрезок строки запроса от уровня до конца endpoint для подсчета пачки. Поиск
+# начинается с литерала перевода строки; 24 символа из цифр и «-:, » (метка
+# времени «YYYY-MM-DD HH:MM:SS,mmm ») не содержат уровня и пропускаются одним
+# шагом, иначе уровень ищется с начала строки, как в BATCH_PATTERN, поэтому
+# совпадения те же.
+REQUEST_SPAN_PATTERN = re.compile(
+    rf"\n(?:[0-9 :,-]{{24}}|[^\n]*?)"
+    rf"((?:{'|'.join(LOG_LEVELS)})(?: |[^\n]*?)django\.request:"
+    r"[^\S\n](?:GET|POST|PUT|DELETE|PATCH|Internal[^\S\n]Server[^\S\n]Error:)"
+    r"[^\S\n]/[^\s]+).*"
+)
+# Байтовые шаблоны для режима mmap: хвост запроса ищется по литералу маркера,
+# уровень ищется левее маркера в пределах той же строки.
+REQUEST_TAIL_BYTES = re.compile(
+    rb"django\.request:"
+    rb"[^\S\n](?:GET|POST|PUT|DELETE|PATCH|Internal[^\S\n]Server[^\S\n]Error:)"
+    rb"[^\S\n](/[^\s]+)"
+)
+LEVEL_PATTERN_BYTES = re.compile("|".join(LOG_LEVELS).encode())
+# Хвост строки запроса для фильтров --endpoint-prefix и --client-ip: префикс
+# вкомпилирован в опережающую проверку, адрес клиента - первые скобки после
+# endpoint, начало адреса подсети тоже вкомпилировано.
+FILTER_TAIL = (
+    r"django\.request:"
+    r"[^\S\n](?:GET|POST|PUT|DELETE|PATCH|Internal[^\S\n]Server[^\S\n]Error:)"
+    r"[^\S\n](?={prefix})(/[^\s]+){client}"
+)
+FILTER_CLIENT = r"[^\[\n]*\[({address}[^\]\s]*)\]"
+FILTER_LEVEL_SCANS = 2  # уровней фильтра, окно mmap просматривается от каждого
+# Строки django.db.backends: (длительность в секундах) SQL
+DB_MARKER = "django.db.backends:"
+DB_PATTERN = re.compile(
+    r"django\.db\.backends:[^\S\n]+\((\d+(?:\.\d+)?)\)[^\S\n]+([^\n]*[^\s;])"
+)
+DB_PATTERN_BYTES = re.compile(DB_PATTERN.pattern.encode())
+# Нормализация SQL до формы запроса: строковые литералы и числа заменяются на ?,
+# имена таблиц в кавычках после FROM, JOIN и т.п. сохраняются.
+SQL_STRING = re.compile(r"((?:FROM|JOIN|INTO|UPDATE|TABLE)\s+'[^']*')|'(?:[^']|'')*'")
+SQL_NUMBER = re.compile(r"(?<![\w.'\"])-?[0-9]+(?:\.[0-9]+)?\b")
+SQL_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SKETCH_ALPHA = 0.01  # относительная погрешность перцентилей отчета db
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+SKETCH_LOG_GAMMA = math.log(SKETCH_GAMMA)
+SKETCH_MAX_BINS = 2048  # корзин скетча, младшие сливаются при переполнении
+DB_PERCENTILES = (0.5, 0.95, 0.99)
+# Отчет errors: «Internal Server Error: /path/ [...] - ValueError: сообщение»,
+# группы - endpoint, тип исключения и сообщение.
+ERROR_MARKER = "Internal Server Error:"
+ERROR_PATTERN = re.compile(
+    r"django\.request:[^\S\n]Internal[^\S\n]Server[^\S\n]Error:[^\S\n](/[^\s]+)"
+    r"(?:[^-\n]++|-(?![^\S\n][A-Za-z_][\w.]*:))*+"  # до « - Тип:» без возвратов
+    r"-[^\S\n]([A-Za-z_][\w.]*):[^\S\n]*([^\n]*)"
+)
+ERROR_PATTERN_BYTES = re.compile(ERROR_PATTERN.pattern.encode())
+# Переменная часть сообщения: токен с цифрами или в кавычках (repr значения)
+ERROR_VARIABLE = re.compile(r"(?<!\S)(?:[^\s0-9]*+[0-9]\S*|(['\"])\S*\1[^\s\w]*(?!\S))")
+WILDCARD = "<*>"
+ERRORS_PREFIX_TOKENS = 2  # первых токенов сообщения в пути дерева сигнатур
+ERRORS_SIMILARITY = 0.5  # доля совпавших токенов для попадания в кластер
+ERRORS_MAX_CHILDREN = 100  # детей у узла дерева, остальные токены идут в <*>
+ERRORS_MAX_LEAF = 32  # кластеров в листе, дальше сообщение идет в ближайший
+ERRORS_MAX_SIGNATURES = 10_000  # кластеров в отчете errors
+ERRORS_CACHE_SIZE = 65_536  # сообщений в кэше сообщение -> кластер
+ERRORS_PER_ENDPOINT = 5  # сигнатур на endpoint в отчете errors по умолчанию
+# Отчет http: метод, endpoint, класс кода ответа (первая цифра) и адрес клиента;
+# строка Internal Server Error - ответ 5XX без метода.
+HTTP_PATTERN = re.compile(
+    r"django\.request:[^\S\n](?:(GET|POST|PUT|DELETE|PATCH)[^\S\n](/[^\s]+)"
+    r"[^\S\n]+([1-5])[0-9]{2}(?!\S)"
+    r"|Internal[^\S\n]Server[^\S\n]Error:[^\S\n](/[^\s]+))"
+    r"(?:[^\[\n]*\[([^\]\s]*)\])?"
+)
+HTTP_PATTERN_BYTES = re.compile(HTTP_PATTERN.pattern.encode())
+HTTP_REQUEST_KEY = itemgetter(0, 1, 2, 3)  # метод, endpoint, класс, endpoint ошибки
+HTTP_CLIENT_KEY = itemgetter(1, 3, 4)  # endpoint, endpoint ошибки, адрес
+STATUS_CLASSES = ("1XX", "2XX", "3XX", "4XX", "5XX")
+HTTP_NO_METHOD = "-"  # метод строки Internal Server Error
+HTTP_CLIENTS_CAPACITY = 64  # счетчиков адресов на endpoint в сводке Misra-Gries
+HTTP_CLIENTS_PER_ENDPOINT = 5  # адресов на endpoint в отчете http по умолчанию
+IPV4_MAPPED = 0xFFFF << 32  # IPv4 хранится как IPv4-mapped IPv6 (::ffff:a.b.c.d)
+ADDRESS_CACHE_SIZE = 65_536  # адресов клиентов в кэше pack_address
+# Отчет timeline: строка начинается с метки «YYYY-MM-DD HH:MM:SS», которая
+# разбирается срезами по фиксированным позициям, а не через strptime.
+TIMESTAMP_SIZE = 19
+TIMESTAMP = r"[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}"
+TIMESTAMP_BYTES = re.compile(TIMESTAMP.encode())
+TIMELINE_PATTERN = re.compile(
+    rf"^({TIMESTAMP})[^\n]*?" + BATCH_PATTERN.pattern, re.MULTILINE
+)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+TIMELINE_BUCKET = 60  # секунд в корзине отчета timeline по умолчанию
+IO_MODES = ("lines", "mmap")
+STDIN_PATH = "-"  # путь лога, означающий стандартный ввод
+REPORTS = {}  # имя отчета -> класс агрегатора, заполняется register_report
+# Сжатые файлы распознаются по сигнатуре в начале, а не по расширению; модуль
+# распаковки импортируется по имени, когда сигнатура встретилась
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "lzma",
+}
+MAGIC_SIZE = max(map(len, COMPRESSION_MAGIC))
+STATE_VERSION = 1
+SNAPSHOT_MAGIC = b"DJLOGSNP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sH")  # сигнатура и версия формата снимка
+BLOCK_SIZE = struct.Struct("<Q")  # длина блока снимка перед его байтами
+CHECKPOINT_INTERVAL = 60.0  # секунд между записями контрольной точки --checkpoint
+# База SQLite команды ingest: строки хранятся целыми кодами, строковые значения
+# (endpoint, форма SQL, адрес клиента) - в словарях, уровень - номер в LOG_LEVELS.
+# Время - секунды от эпохи, длительность SQL - микросекунды. Индексы покрывают
+# запросы отчетов с фильтрами: отчет читает только индекс, не строки таблицы.
+DATABASE_VERSION = 1
+DATABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS levels (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS endpoints (id INTEGER PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS statements (id INTEGER PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS clients (id INTEGER PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS requests (
+    file INTEGER NOT NULL,
+    ts INTEGER,
+    level INTEGER NOT NULL,
+    endpoint INTEGER NOT NULL,
+    status INTEGER,
+    client INTEGER
+);
+CREATE TABLE IF NOT EXISTS queries (
+    file INTEGER NOT NULL,
+    ts INTEGER,
+    statement INTEGER NOT NULL,
+    duration INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_endpoint ON requests (endpoint, level, client);
+CREATE INDEX IF NOT EXISTS requests_ts ON requests (ts, endpoint, level, client);
+CREATE INDEX IF NOT EXISTS queries_statement ON queries (statement, duration);
+CREATE INDEX IF NOT EXISTS requests_file ON requests (file);
+CREATE INDEX IF NOT EXISTS queries_file ON queries (file);
+"""
+DATABASE_TABLES = ("requests", "queries")  # таблицы строк лога с колонкой file
+DATABASE_INSERTS = {
+    "requests": "INSERT INTO requests VALUES (?, ?, ?, ?, ?, ?)",
+    "queries": "INSERT INTO queries VALUES (?, ?, ?, ?)",
+}
+# Строки для базы: метка времени (если строка с нее начинается), уровень,
+# endpoint, код ответа и адрес клиента; для SQL - метка, длительность и SQL.
+INGEST_REQUEST_PATTERN = re.compile(
+    rf"^({TIMESTAMP})?[^\n]*?({'|'.join(LOG_LEVELS)})[^\n]*?django\.request:"
+    r"[^\S\n](?:GET|POST|PUT|DELETE|PATCH|Internal[^\S\n]Server[^\S\n]Error:)"
+    r"[^\S\n](/[^\s]+)(?:[^\S\n]+([0-9]{3})(?!\S))?(?:[^\[\n]*\[([^\]\s]*)\])?",
+    re.MULTILINE,
+)
+INGEST_QUERY_PATTERN = re.compile(
+    rf"^({TIMESTAMP})?[^\n]*?" + DB_PATTERN.pattern, re.MULTILINE
+)
+FOLLOW_REFRESH = 1.0  # секунд между перерисовками отчета в режиме --follow
+FOLLOW_IDLE_CHECK = 5.0  # секунд ожидания без событий до проверки ротации
+HEAD_SIZE = 1024  # байт начала файла, по которым узнается подмена при ротации
+# Встроенные правила нормализации: сегмент пути целиком заменяется плейсхолдером
+SEGMENT_END = r"(?=[/?]|$)"
+NORMALIZE_RULES = (
+    (r"(?<=/)\d+" + SEGMENT_END, "{id}"),
+    (
+        r"(?<=/)[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}" + SEGMENT_END,
+        "{uuid}",
+    ),
+    (r"(?<=/)[0-9a-fA-F]{16,}" + SEGMENT_END, "{hash}"),
+)
+NORMALIZE_CACHE_SIZE = 65_536  # исходных путей в кэше нормализатора
+TOP_HEAP_SLACK = 4  # во сколько раз куча top-K может превысить число endpoint
+SAMPLE_BLOCK = 256 * 1024  # байт в блоке выборки --sample и --budget
+SAMPLE_MIN_BLOCKS = 2  # блоков выборки, без которых не оценить разброс
+SAMPLE_Z = 1.96  # квантиль нормального распределения для 95% интервала
+
+
+def match_compression(head: bytes):
+    """Возвращает модуль распаковки (gzip, bz2, lzma) по сигнатуре или None."""
+    for magic, module in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return importlib.import_module(module)
+    return None
+
+
+def detect_compression(file_path: str) -> str | None:
+    """Возвращает имя формата сжатия файла или None для обычного текста."""
+    with open(file_path, "rb") as file:
+        module = match_compression(file.read(MAGIC_SIZE))
+    return module.__name__ if module else None
+
+
+@contextmanager
+def open_log(file_path: str) -> Generator[io.BufferedIOBase, None, None]:
+    """
+    Открывает файл лога в двоичном режиме, STDIN_PATH - стандартный ввод.
+
+    Сжатые файлы распаковываются потоком блоками READ_BLOCK, без временных
+    файлов на диске. Стандартный ввод при выходе не закрывается.
+    """
+    if file_path == STDIN_PATH:
+        source = nullcontext(sys.stdin.buffer)
+    else:
+        source = open(file_path, "rb")
+    with source as raw:
+        module = match_compression(raw.peek(MAGIC_SIZE)[:MAGIC_SIZE])
+        if module is None:
+            yield raw
+            return
+        with module.open(raw) as stream:
+            yield io.BufferedReader(stream, buffer_size=READ_BLOCK)
+
+
+def read_file(file_path: str) -> Generator[str, None, None]:
+    """Генератор для построчного чтения файлов с обработкой ошибок."""
+    with open_log(file_path) as stream:
+        file = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+        logger.debug("Начато чтение файла: %s", file_path)
+        yield from file
+        logger.debug("Файл полностью прочитан: %s", file_path)
+
+
+def read_file_range(file_path: str, start: int, end: int) -> Generator[str, None, None]:
+    """
+    Генератор строк файла, которые начинаются в диапазоне байтов [start, end).
+
+    Строка, начатая в предыдущем диапазоне, целиком относится к нему, поэтому
+    соседние диапазоны не теряют и не дублируют строки.
+    """
+    with open(file_path, "rb") as file:
+        if start:
+            file.seek(start - 1)
+            file.readline()  # дочитываем строку, принадлежащую прошлому диапазону
+        position = file.tell()
+        while position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line.decode("utf-8", errors="replace")
+
+
+def align_offset(buffer: mmap.mmap, offset: int) -> int:
+    """Сдвигает смещение на начало строки по тем же правилам, что read_file_range."""
+    if offset <= 0 or offset >= len(buffer):
+        return min(max(offset, 0), len(buffer))
+    newline = buffer.find(b"\n", offset - 1)
+    return len(buffer) if newline == -1 else newline + 1
+
+
+def scan_buffer(buffer, start: int, end: int) -> Counter:
+    """
+    Считает пары (log_level, endpoint) в байтовом буфере без разбиения на строки.
+
+    Регулярное выражение хвоста начинается с литерала django.request и быстро
+    перескакивает строки других логгеров, которые не копируются и не декодируются.
+    Уровень ищется левее маркера в той же строке, на строку засчитывается одно
+    совпадение, как в parse_log_line. Декодируются только ключи счетчика.
+    """
+    rfind = buffer.rfind
+    search_level = LEVEL_PATTERN_BYTES.search
+    found = []
+    last_line = -1
+
+    for tail in REQUEST_TAIL_BYTES.finditer(buffer, start, end):
+        pos = tail.start()
+        line_start = rfind(b"\n", start, pos) + 1 or start
+        if line_start != last_line and (level := search_level(buffer, line_start, pos)):
+            found.append((level[0], tail[1]))
+            last_line = line_start
+
+    counter = Counter()
+    for (level, endpoint), count in Counter(found).items():
+        counter[level.decode(), endpoint.decode("utf-8", errors="replace")] += count
+    return counter
+
+
+def scan_timeline_buffer(buffer, start: int, end: int) -> Counter:
+    """
+    Считает тройки (метка времени, log_level, endpoint) в байтовом буфере.
+
+    Поиск устроен как в scan_buffer, дополнительно строка должна начинаться с
+    метки времени.
+    """
+    rfind = buffer.rfind
+    search_level = LEVEL_PATTERN_BYTES.search
+    match_timestamp = TIMESTAMP_BYTES.match
+    found = []
+    last_line = -1
+
+    for tail in REQUEST_TAIL_BYTES.finditer(buffer, start, end):
+        pos = tail.start()
+        line_start = rfind(b"\n", start, pos) + 1 or start
+        if line_start == last_line:
+            continue
+        stamp = match_timestamp(buffer, line_start, pos)
+        if stamp and (level := search_level(buffer, stamp.end(), pos)):
+            found.append((stamp[0], level[0], tail[1]))
+            last_line = line_start
+
+    return Counter(
+        {
+            (stamp.decode(), level.decode(), endpoint.decode(errors="replace")): count
+            for (stamp, level, endpoint), count in Counter(found).items()
+        }
+    )
+
+
+def release_pages(buffer: mmap.mmap, start: int, end: int) -> None:
+    """Отдает системе прочитанные страницы отображения, чтобы RSS не рос с файлом."""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    start -= start % mmap.PAGESIZE
+    end -= end % mmap.PAGESIZE
+    if end > start:
+        buffer.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+
+def mmap_windows(
+    file_path: str, start: int = 0, end: int | None = None
+) -> Generator[tuple, None, None]:
+    """
+    Отдает окна (buffer, start, end) диапазона файла, отображенного через mmap.
+
+    Отображение обходится окнами MMAP_WINDOW по границам строк, страницы окна
+    освобождаются, когда потребитель запрашивает следующее.
+    """
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                buffer.madvise(mmap.MADV_SEQUENTIAL)
+            end = align_offset(buffer, len(buffer) if end is None else end)
+            position = align_offset(buffer, start)
+            while position < end:
+                window_end = align_offset(buffer, min(position + MMAP_WINDOW, end))
+                yield buffer, position, window_end
+                release_pages(buffer, position, window_end)
+                position = window_end
+
+
+def scan_file(file_path: str, start: int = 0, end: int | None = None) -> Counter:
+    """Считает пары (log_level, endpoint) в диапазоне файла через mmap."""
+    counter = Counter()
+    for window in mmap_windows(file_path, start, end):
+        counter.update(scan_buffer(*window))
+    return counter
+
+
+def read_blocks(
+    stream: io.BufferedIOBase, limit: int | None = None
+) -> Generator[bytes, None, None]:
+    """
+    Читает поток блоками READ_BLOCK, обрезанными по последнему переводу строки.
+
+    Остаток строки переносится в следующий блок, последний блок может не
+    заканчиваться переводом строки. limit ограничивает число читаемых байт.
+    """
+    remaining = limit
+    tail = b""
+    while remaining is None or remaining > 0:
+        size = READ_BLOCK if remaining is None else min(READ_BLOCK, remaining)
+        block = stream.read(size)
+        if not block:
+            break
+        if remaining is not None:
+            remaining -= len(block)
+        block = tail + block
+        cut = block.rfind(b"\n") + 1
+        tail = block[cut:]
+        if cut:
+            yield block[:cut]
+    if tail:
+        yield tail
+
+
+def split_lines(block: bytes) -> list[str]:
+    """Декодирует блок целиком и делит его на строки без переводов строки."""
+    lines = block.decode("utf-8", errors="replace").split("\n")
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def read_range_batches(
+    file_path: str, start: int = 0, end: int | None = None
+) -> Generator[list[str], None, None]:
+    """
+    Читает строки диапазона [start, end) блоками READ_BLOCK и отдает пачками.
+
+    Границы диапазона выравниваются так же, как в read_file_range. Каждый блок
+    обрезается по последнему переводу строки и декодируется целиком, строки
+    отдаются без завершающего перевода строки.
+    """
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start:
+            file.seek(start - 1)
+            file.readline()
+            start = file.tell()
+        if start < end < size:
+            file.seek(end - 1)
+            file.readline()
+            end = file.tell()
+
+        file.seek(start)
+        for block in read_blocks(file, end - start):
+            yield split_lines(block)
+
+
+def split_file(
+    file_path: str, chunk_size: int = CHUNK_SIZE, start: int = 0, end: int | None = None
+) -> list[tuple]:
+    """
+    Разбивает файл на байтовые диапазоны (file_path, start, end) для пула.
+
+    Сжатый файл не делится: он распаковывается целиком в одной задаче, которой
+    соответствует диапазон (file_path, 0, None).
+    """
+    if detect_compression(file_path):
+        return [(file_path, 0, None)] if end is None or start < end else []
+    end = os.path.getsize(file_path) if end is None else end
+    return [
+        (file_path, chunk_start, min(chunk_start + chunk_size, end))
+        for chunk_start in range(start, end, chunk_size)
+    ]
+
+
+def read_batches(
+    lines: Iterable[str], size: int = BATCH_SIZE
+) -> Generator[list[str], None, None]:
+    """Группирует поток строк в пачки фиксированного размера."""
+    iterator = iter(lines)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_log_line(line: str, match_groups: tuple) -> dict | None:
+    """Парсит строку лога и возвращает совпадение."""
+    if REQUEST_MARKER in line and (match := LOG_PATTERN.search(line)):
+        return {group: match.group(group) for group in match_groups}
+
+
+def classify_line(line: str) -> tuple[str, str] | None:
+    """Возвращает (endpoint, log_level) для строки django.request или None."""
+    if REQUEST_MARKER in line and (match := LOG_PATTERN.search(line)):
+        return match.group("endpoint", "log_level")
+
+
+def find_requests(lines: list[str]) -> list[tuple[str, str]]:
+    """
+    Находит пары (log_level, endpoint) в пачке строк одним вызовом findall.
+
+    Строки других логгеров отбрасываются проверкой подстрокой, оставшиеся
+    склеиваются, и регулярное выражение проходит по ним без вызова на строку.
+    """
+    candidates = [line for line in lines if REQUEST_MARKER in line]
+    return BATCH_PATTERN.findall("\n".join(candidates))
+
+
+def count_requests(lines: list[str]) -> Counter:
+    """
+    Считает пары (log_level, endpoint) в пачке строк.
+
+    Совпадения те же, что у find_requests, но findall отдает один отрезок строки
+    без кортежа групп, а уровень и endpoint извлекаются только из различных
+    отрезков.
+    """
+    candidates = [line for line in lines if REQUEST_MARKER in line]
+    spans = Counter(REQUEST_SPAN_PATTERN.findall("\n" + "\n".join(candidates)))
+    counter = Counter()
+    for span, count in spans.items():
+        counter[BATCH_PATTERN.match(span).groups()] += count
+    return counter
+
+
+def classify_lines(lines: list[str]) -> list[tuple[str, str]]:
+    """Пакетная классификация: пары (endpoint, log_level) совпавших строк."""
+    return [(endpoint, level) for level, endpoint in find_requests(lines)]
+
+
+def check_report_type(report_type: str) -> None:
+    """Завершает работу, если тип отчета не реализован."""
+    for name in report_type.split(","):
+        if name not in REPORTS:
+            logger.critical("Тип отчета '%s' не реализован", name)
+            sys.exit(1)
+
+
+def register_report(name: str):
+    """Декоратор: регистрирует класс агрегатора как отчет name для --report."""
+
+    def register(cls: type) -> type:
+        REPORTS[name] = cls
+        return cls
+
+    return register
+
+
+@lru_cache(maxsize=4096)
+def day_seconds(day: str) -> int:
+    """Секунды от эпохи до начала дня «YYYY-MM-DD»."""
+    return (date.fromisoformat(day).toordinal() - EPOCH_ORDINAL) * 86400
+
+
+def timestamp_seconds(timestamp: str) -> int:
+    """Секунды от эпохи для метки «YYYY-MM-DD HH:MM:SS» (время без пояса)."""
+    return (
+        day_seconds(timestamp[:10])
+        + int(timestamp[11:13]) * 3600
+        + int(timestamp[14:16]) * 60
+        + int(timestamp[17:19])
+    )
+
+
+def format_bucket(seconds: int) -> str:
+    """Метка «YYYY-MM-DD HH:MM:SS» начала корзины."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(seconds))
+
+
+def next_timestamp(file: io.BufferedIOBase, offset: int) -> tuple[int, str | None]:
+    """
+    Ищет первую строку с меткой времени, начиная с границы строки после offset.
+
+    :return (начало первой строки не раньше offset, метка или None до конца файла)
+    """
+    file.seek(max(offset - 1, 0))
+    if offset:
+        file.readline()
+    start = file.tell()
+    for line in file:
+        if TIMESTAMP_BYTES.match(line):
+            return start, line[:TIMESTAMP_SIZE].decode()
+    return start, None
+
+
+def find_time_offset(file_path: str, timestamp: str) -> int:
+    """
+    Бинарным поиском находит начало первой строки с меткой не раньше timestamp.
+
+    Файл должен быть отсортирован по времени; строки без метки (например,
+    traceback) относятся к предыдущей строке с меткой.
+    """
+    with open(file_path, "rb") as file:
+        low, high = 0, os.fstat(file.fileno()).st_size
+        while low < high:
+            middle = (low + high) // 2
+            found = next_timestamp(file, middle)[1]
+            if found is None or found >= timestamp:
+                high = middle
+            else:
+                low = middle + 1
+        return next_timestamp(file, low)[0]
+
+
+def count_lines(data, start: int, end: int) -> int:
+    """
+    Число строк окна data[start:end] без копирования всего окна.
+
+    У mmap нет метода count, поэтому окно mmap считается срезами по
+    READ_BLOCK. Последняя строка файла может не заканчиваться переводом
+    строки и тоже считается.
+    """
+    if isinstance(data, bytes):
+        lines = data.count(b"\n", start, end)
+    else:
+        lines = sum(
+            data[offset : min(offset + READ_BLOCK, end)].count(b"\n")
+            for offset in range(start, end, READ_BLOCK)
+        )
+    if end > start and data[end - 1 : end] != b"\n":
+        lines += 1
+    return lines
+
+
+class Metrics:
+    """
+    Таймеры этапов и счетчики обработки с разбивкой по файлам и процессам.
+
+    Этапы: read - чтение и декодирование пачек строк, parse - поиск запросов
+    (в режиме mmap сюда же входит чтение страниц), merge - сложение счетчиков,
+    checkpoint - запись контрольной точки, report - построение отчета.
+    Счетчики: bytes_read, lines_seen, lines_matched и, для отчета handlers,
+    число запросов каждого уровня. Значения копятся по пачкам строк, а не по
+    отдельным строкам; при выключенном инструментировании объект не создается.
+    """
+
+    __slots__ = ("counters", "timers", "worker")
+    STAGES = ("read", "parse", "merge", "checkpoint", "report")
+
+    def __init__(self):
+        """Создает пустые таймеры и счетчики текущего процесса."""
+        from multiprocessing import current_process
+
+        self.timers = defaultdict(float)  # (file_path, worker, stage) -> секунды
+        self.counters = defaultdict(int)  # (file_path, worker, name) -> значение
+        self.worker = current_process().name
+
+    def add_time(self, file_path: str, stage: str, seconds: float) -> None:
+        """Добавляет время этапа stage при обработке file_path."""
+        self.timers[file_path, self.worker, stage] += seconds
+
+    def add(self, file_path: str, name: str, value: int) -> None:
+        """Увеличивает счетчик name файла file_path."""
+        self.counters[file_path, self.worker, name] += value
+
+    @contextmanager
+    def timer(self, file_path: str, stage: str) -> Generator[None, None, None]:
+        """Засекает время блока как этап stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(file_path, stage, time.perf_counter() - started)
+
+    def count_parts(
+        self, file_path: str, parts: Iterable, count
+    ) -> Generator[Counter, None, None]:
+        """Считает части файла функцией count, разделяя время чтения и разбора."""
+        iterator = iter(parts)
+        while True:
+            started = time.perf_counter()
+            part = next(iterator, None)
+            read_done = time.perf_counter()
+            self.add_time(file_path, "read", read_done - started)
+            if part is None:
+                return
+            counter = count(part)
+            self.add_time(file_path, "parse", time.perf_counter() - read_done)
+
+            if isinstance(part, list):
+                self.add(file_path, "lines_seen", len(part))
+            else:
+                data, start, end = part
+                self.add(file_path, "lines_seen", count_lines(data, start, end))
+            self.count_matches(file_path, counter)
+            yield counter
+
+    def count_matches(self, file_path: str, found, prefix: str = "") -> None:
+        """
+        Считает совпадения в результате count_part.
+
+        Для нескольких отчетов одного прохода счетчики ведутся отдельно для
+        каждого с префиксом «имя_отчета.».
+        """
+        if isinstance(found, Counter):
+            self.add(file_path, f"{prefix}lines_matched", sum(found.values()))
+            for key, matched in found.items():
+                self.add(file_path, f"{prefix}level_{key[0]}", matched)
+        elif isinstance(found, dict):
+            for name, report_found in found.items():
+                self.count_matches(file_path, report_found, f"{prefix}{name}.")
+        else:
+            self.add(file_path, f"{prefix}lines_matched", len(found))
+
+    def merge(self, other: "Metrics") -> "Metrics":
+        """Добавляет таймеры и счетчики other, например из процесса пула."""
+        for key, seconds in other.timers.items():
+            self.timers[key] += seconds
+        for key, value in other.counters.items():
+            self.counters[key] += value
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        Возвращает метрики для JSON.
+
+        :return {"totals": {"timers": {...}, "counters": {...}},
+            "files": {file_path: {"timers", "counters",
+            "workers": {worker: {"timers", "counters"}}}}}
+        """
+
+        def empty() -> dict:
+            return {"timers": defaultdict(float), "counters": defaultdict(int)}
+
+        totals = empty()
+        files = defaultdict(lambda: {**empty(), "workers": defaultdict(empty)})
+        for kind, values in (("timers", self.timers), ("counters", self.counters)):
+            for (file_path, worker, name), value in sorted(values.items()):
+                totals[kind][name] += value
+                files[file_path][kind][name] += value
+                files[file_path]["workers"][worker][kind][name] += value
+        return json.loads(json.dumps({"totals": totals, "files": files}))
+
+    def summary(self) -> list[str]:
+        """Сводка метрик построчно: итоги, затем файлы и процессы."""
+        data = self.to_dict()
+
+        def describe(section: dict) -> str:
+            timers = [
+                f"{stage} {section['timers'][stage]:.3f} с"
+                for stage in self.STAGES
+                if stage in section["timers"]
+            ]
+            counters = [
+                f"{name} {value}" for name, value in section["counters"].items()
+            ]
+            return ", ".join(timers + counters)
+
+        lines = [f"Итого: {describe(data['totals'])}"]
+        for file_path, section in data["files"].items():
+            lines.append(f"{file_path or '(общее)'}: {describe(section)}")
+            if len(section["workers"]) > 1:
+                for worker, worker_section in section["workers"].items():
+                    lines.append(f"    {worker}: {describe(worker_section)}")
+        return lines
+
+
+def iter_parts(
+    file_path: str, io_mode: str = "lines", start: int = 0, end: int | None = None
+) -> Generator:
+    """
+    Отдает части файла или его диапазона: пачки строк или окна байтов.
+
+    В режиме mmap часть - кортеж (buffer, start, end) для scan_buffer, иначе -
+    список строк. Сжатый файл всегда читается целиком. Стандартный ввод
+    читается блоками READ_BLOCK, которые делятся на строки целиком, без
+    чтения по строке.
+    """
+    if file_path == STDIN_PATH:
+        with open_log(file_path) as stream:
+            for block in read_blocks(stream):
+                if io_mode == "mmap":
+                    yield block, 0, len(block)
+                else:
+                    yield split_lines(block)
+        return
+    if detect_compression(file_path):
+        with open_log(file_path) as stream:
+            if io_mode == "mmap":
+                for block in read_blocks(stream):
+                    yield block, 0, len(block)
+                return
+            file = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+            yield from read_batches(file)
+        return
+    if io_mode == "mmap":
+        yield from mmap_windows(file_path, start, end)
+    elif start == 0 and end is None:
+        yield from read_batches(read_file(file_path))
+    else:
+        yield from read_range_batches(file_path, start, end)
+
+
+def count_part(part) -> Counter:
+    """Считает пары (log_level, endpoint) в пачке строк или окне байтов."""
+    if isinstance(part, list):
+        return count_requests(part)
+    return scan_buffer(*part)
+
+
+def range_size(file_path: str, start: int = 0, end: int | None = None) -> int:
+    """Число байт файла на диске, приходящихся на диапазон [start, end)."""
+    size = os.path.getsize(file_path)
+    if detect_compression(file_path):
+        return size if start == 0 else 0
+    return max(min(size if end is None else end, size) - start, 0)
+
+
+def find_queries(part) -> list[tuple[str, str]]:
+    """Находит пары (длительность, SQL) django.db.backends в пачке или окне."""
+    if isinstance(part, list):
+        candidates = [line for line in part if DB_MARKER in line]
+        return DB_PATTERN.findall("\n".join(candidates))
+    data, start, end = part
+    return [
+        (duration.decode(), sql.decode("utf-8", errors="replace"))
+        for duration, sql in DB_PATTERN_BYTES.findall(data, start, end)
+    ]
+
+
+def find_errors(part) -> list[tuple[str, str, str]]:
+    """Находит тройки (endpoint, тип исключения, сообщение) в пачке или окне."""
+    if isinstance(part, list):
+        candidates = [line for line in part if ERROR_MARKER in line]
+        return ERROR_PATTERN.findall("\n".join(candidates))
+    data, start, end = part
+    return [
+        (
+            endpoint.decode("utf-8", errors="replace"),
+            exception.decode(),
+            message.decode("utf-8", errors="replace"),
+        )
+        for endpoint, exception, message in ERROR_PATTERN_BYTES.findall(
+            data, start, end
+        )
+    ]
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def pack_address(address: str) -> int | None:
+    """Адрес клиента 128-битным числом; не адрес - None."""
+    import ipaddress
+
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    return IPV4_MAPPED | int(ip) if ip.version == 4 else int(ip)
+
+
+def format_address(value: int) -> str:
+    """Строка адреса из числа pack_address."""
+    import ipaddress
+
+    if value >> 32 == IPV4_MAPPED >> 32:
+        return str(ipaddress.IPv4Address(value & 0xFFFFFFFF))
+    return str(ipaddress.IPv6Address(value))
+
+
+def find_http(part) -> tuple[Counter, Counter]:
+    """
+    Считает запросы отчета http в пачке строк или окне байтов.
+
+    Совпадения сводятся в счетчики встроенными Counter и itemgetter, а
+    разбор ключей (декодирование, класс кода, упаковка адреса) идет один раз
+    на различный ключ, а не на строку.
+
+    :return счетчики {(endpoint, метод, номер класса кода): count} и
+        {(endpoint, адрес числом): count}
+    """
+    if isinstance(part, list):
+        candidates = [line for line in part if REQUEST_MARKER in line]
+        found = HTTP_PATTERN.findall("\n".join(candidates))
+    else:
+        found = HTTP_PATTERN_BYTES.findall(*part)
+    encoded = not isinstance(part, list)
+
+    requests = Counter()
+    for key, count in Counter(map(HTTP_REQUEST_KEY, found)).items():
+        if encoded:
+            key = [value.decode("utf-8", "replace") for value in key]
+        method, endpoint, status, error_endpoint = key
+        if error_endpoint:
+            requests[error_endpoint, HTTP_NO_METHOD, len(STATUS_CLASSES) - 1] += count
+        else:
+            requests[endpoint, method, int(status) - 1] += count
+
+    clients = Counter()
+    for (endpoint, error_endpoint, address), count in Counter(
+        map(HTTP_CLIENT_KEY, found)
+    ).items():
+        if encoded:
+            endpoint = (endpoint or error_endpoint).decode("utf-8", "replace")
+            address = address.decode("ascii", "replace")
+        code = pack_address(address) if address else None
+        if code is not None:
+            clients[endpoint or error_endpoint, code] += count
+    return requests, clients
+
+
+def iter_counts(
+    file_path: str,
+    io_mode: str = "lines",
+    start: int = 0,
+    end: int | None = None,
+    metrics: Metrics | None = None,
+    count=count_part,
+) -> Iterable:
+    """
+    Отдает результаты функции count по частям файла или его диапазона.
+
+    По умолчанию это счетчики пар (log_level, endpoint). Часть - это пачка
+    строк или окно mmap, поэтому размер каждого счетчика ограничен, даже если
+    различных endpoint в файле неограниченно много.
+    """
+    parts = iter_parts(file_path, io_mode, start, end)
+    if metrics is None:
+        return map(count, parts)
+    if file_path != STDIN_PATH:  # размер стандартного ввода заранее неизвестен
+        metrics.add(file_path, "bytes_read", range_size(file_path, start, end))
+    return metrics.count_parts(file_path, parts, count)
+
+
+def count_file(
+    file_path: str, io_mode: str = "lines", start: int = 0, end: int | None = None
+) -> Counter:
+    """Считает пары (log_level, endpoint) в файле или его байтовом диапазоне."""
+    counter = Counter()
+    for part in iter_counts(file_path, io_mode, start, end):
+        counter.update(part)
+    return counter
+
+
+def pack_blocks(blocks: Iterable[bytes]) -> bytes:
+    """Склеивает блоки снимка, перед каждым записывается его длина."""
+    parts = []
+    for block in blocks:
+        parts.append(BLOCK_SIZE.pack(len(block)))
+        parts.append(block)
+    return b"".join(parts)
+
+
+def unpack_blocks(data: memoryview) -> list[memoryview]:
+    """Разбивает байты pack_blocks на блоки без копирования."""
+    blocks, offset = [], 0
+    while offset < len(data):
+        if offset + BLOCK_SIZE.size > len(data):
+            raise ValueError("Снимок поврежден: неполная длина блока")
+        (size,) = BLOCK_SIZE.unpack_from(data, offset)
+        offset += BLOCK_SIZE.size
+        if offset + size > len(data):
+            raise ValueError("Снимок поврежден: блок выходит за конец файла")
+        blocks.append(data[offset : offset + size])
+        offset += size
+    return blocks
+
+
+def pack_array(values: array) -> bytes:
+    """Байты массива в порядке little-endian независимо от платформы."""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_array(typecode: str, data: memoryview) -> array:
+    """Массив из байтов pack_array: одно копирование без разбора значений."""
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def pack_strings(strings: Iterable[str]) -> bytes:
+    """Строки в UTF-8, каждая завершается переводом строки (в строках лога его нет)."""
+    return "\n".join(chain(strings, [""])).encode()
+
+
+def unpack_strings(data: memoryview) -> list[str]:
+    """Список строк из байтов pack_strings."""
+    return str(data, "utf-8").split("\n")[:-1]
+
+
+def check_snapshot_rows(rows: int, values: array, width: int) -> None:
+    """Проверяет, что в массиве снимка width значений на каждую из rows строк."""
+    if len(values) != rows * width:
+        raise ValueError("Снимок поврежден: размеры блоков не согласованы")
+
+
+class EndpointCounter(Mapping):
+    """
+    Компактное хранилище счетчиков запросов по endpoint и уровню логирования.
+
+    Endpoint интернируется в номер строки, счетчики всех строк лежат в одном
+    массиве array("Q") по len(LOG_LEVELS) столбцов в порядке LOG_LEVELS. Для
+    чтения объект ведет себя как {endpoint: {INFO: 1, DEBUG: 1,...}, ...}, а
+    при передаче между процессами сериализуется списком endpoint и байтами
+    массива.
+    """
+
+    __slots__ = ("counts", "endpoints", "index")
+    WIDTH = len(LOG_LEVELS)
+
+    def __init__(self):
+        """Создает пустое хранилище."""
+        self.index = {}
+        self.endpoints = []
+        self.counts = array("Q")
+
+    @classmethod
+    def from_arrays(cls, endpoints: list[str], counts: bytes) -> "EndpointCounter":
+        """Восстанавливает хранилище из списка endpoint и байтов массива."""
+        counter = cls()
+        counter.endpoints = list(endpoints)
+        counter.index = {endpoint: row for row, endpoint in enumerate(endpoints)}
+        counter.counts.frombytes(counts)
+        return counter
+
+    @classmethod
+    def from_state(cls, state: dict[str, list[int]]) -> "EndpointCounter":
+        """Восстанавливает хранилище из {endpoint: [счетчики уровней]}."""
+        counter = cls()
+        counter.endpoints = list(state)
+        counter.index = {endpoint: row for row, endpoint in enumerate(state)}
+        for counts in state.values():
+            counter.counts.extend(counts)
+        return counter
+
+    def to_state(self) -> dict[str, list[int]]:
+        """Возвращает {endpoint: [счетчики уровней]} для сохранения в JSON."""
+        width = self.WIDTH
+        return {
+            endpoint: self.counts[row * width : (row + 1) * width].tolist()
+            for row, endpoint in enumerate(self.endpoints)
+        }
+
+    @classmethod
+    def from_bytes(cls, data: memoryview) -> "EndpointCounter":
+        """Восстанавливает хранилище из снимка to_bytes."""
+        endpoints, counts = unpack_blocks(data)[:2]
+        counter = cls()
+        counter.endpoints = unpack_strings(endpoints)
+        counter.index = dict(zip(counter.endpoints, range(len(counter.endpoints))))
+        counter.counts = unpack_array("Q", counts)
+        check_snapshot_rows(len(counter.endpoints), counter.counts, cls.WIDTH)
+        return counter
+
+    def to_bytes(self) -> bytes:
+        """Снимок: блоки списка endpoint и массива счетчиков."""
+        return pack_blocks([pack_strings(self.endpoints), pack_array(self.counts)])
+
+    def add(self, endpoint: str, level: str, count: int = 1) -> None:
+        """Добавляет count запросов endpoint с уровнем level."""
+        row = self.index.get(endpoint)
+        if row is None:
+            row = self.index[endpoint] = len(self.endpoints)
+            self.endpoints.append(endpoint)
+            self.counts.extend(ZERO_ROW)
+        self.counts[row * self.WIDTH + LEVEL_INDEX[level]] += count
+
+    def update(self, counter: Mapping[tuple[str, str], int]) -> "EndpointCounter":
+        """Добавляет счетчик {(log_level, endpoint): count}."""
+        for (level, endpoint), count in counter.items():
+            self.add(endpoint, level, count)
+        return self
+
+    def merge(self, other: "EndpointCounter") -> "EndpointCounter":
+        """
+        Добавляет счетчики other и возвращает self.
+
+        Сначала endpoint other сопоставляются строкам self, затем по столбцам
+        уровней переносятся только ненулевые ячейки массива other.
+        """
+        if not self.endpoints:
+            self.endpoints = list(other.endpoints)
+            self.index = dict(other.index)
+            self.counts = array("Q", other.counts)
+            return self
+
+        rows = list(map(self.index.get, other.endpoints))
+        if None in rows:
+            added = 0
+            for position, endpoint in enumerate(other.endpoints):
+                if rows[position] is None:
+                    rows[position] = self.index[endpoint] = len(self.endpoints)
+                    self.endpoints.append(endpoint)
+                    added += 1
+            self.counts.extend(ZERO_ROW * added)
+
+        counts, width = self.counts, self.WIDTH
+        for column in range(width):
+            values = other.counts[column::width]
+            for row, count in zip(compress(rows, values), filter(None, values)):
+                counts[row * width + column] += count
+        return self
+
+    def __getitem__(self, endpoint: str) -> dict[str, int]:
+        """Возвращает {log_level: count} с ненулевыми счетчиками."""
+        start = self.index[endpoint] * self.WIDTH
+        row = self.counts[start : start + self.WIDTH]
+        return {level: count for level, count in zip(LOG_LEVELS, row) if count}
+
+    def __iter__(self):
+        """Перебирает endpoint в порядке первого появления."""
+        return iter(self.endpoints)
+
+    def __len__(self) -> int:
+        """Число различных endpoint."""
+        return len(self.endpoints)
+
+    def __reduce__(self):
+        """Дешевая сериализация для пула процессов."""
+        return self.from_arrays, (self.endpoints, self.counts.tobytes())
+
+    def __repr__(self) -> str:
+        """Представление в виде словаря."""
+        return f"{type(self).__name__}({dict(self.items())})"
+
+
+class TopEndpointCounter(EndpointCounter):
+    """
+    Хранилище не более capacity endpoint по алгоритму Space-Saving.
+
+    Когда места нет, новый endpoint занимает строку endpoint с наименьшей
+    оценкой, а эта оценка запоминается как его погрешность. Счетчики уровней -
+    точные значения с момента попадания в хранилище, то есть оценки снизу;
+    сумма счетчиков и погрешности - оценка сверху. Любой endpoint, встретившийся
+    больше N / capacity раз из N запросов, гарантированно остается в хранилище.
+    """
+
+    __slots__ = ("capacity", "errors", "heap")
+
+    def __init__(self, capacity: int):
+        """Создает пустое хранилище на capacity endpoint."""
+        super().__init__()
+        self.capacity = capacity
+        self.errors = array("Q")
+        self.heap = []  # (оценка, строка), устаревшие записи удаляются лениво
+
+    @classmethod
+    def from_parts(
+        cls, capacity: int, endpoints: list[str], counts: bytes, errors: bytes
+    ) -> "TopEndpointCounter":
+        """Восстанавливает хранилище из списка endpoint и байтов массивов."""
+        counter = cls(capacity)
+        counter.endpoints = list(endpoints)
+        counter.index = {endpoint: row for row, endpoint in enumerate(endpoints)}
+        counter.counts.frombytes(counts)
+        counter.errors.frombytes(errors)
+        counter.rebuild_heap()
+        return counter
+
+    @classmethod
+    def from_bytes(cls, data: memoryview, capacity: int) -> "TopEndpointCounter":
+        """Восстанавливает хранилище на capacity endpoint из снимка to_bytes."""
+        endpoints, counts, errors = unpack_blocks(data)
+        counter = cls(capacity)
+        counter.endpoints = unpack_strings(endpoints)
+        counter.index = dict(zip(counter.endpoints, range(len(counter.endpoints))))
+        counter.counts = unpack_array("Q", counts)
+        counter.errors = unpack_array("Q", errors)
+        check_snapshot_rows(len(counter.endpoints), counter.counts, cls.WIDTH)
+        check_snapshot_rows(len(counter.endpoints), counter.errors, 1)
+        counter.rebuild_heap()
+        return counter
+
+    def to_bytes(self) -> bytes:
+        """Снимок: блоки списка endpoint, массива счетчиков и погрешностей."""
+        return super().to_bytes() + pack_blocks([pack_array(self.errors)])
+
+    def estimate(self, row: int) -> int:
+        """Оценка сверху числа запросов endpoint строки row."""
+        start = row * self.WIDTH
+        return sum(self.counts[start : start + self.WIDTH]) + self.errors[row]
+
+    def error(self, endpoint: str) -> int:
+        """Наибольшая возможная недостача в счетчиках endpoint."""
+        return self.errors[self.index[endpoint]]
+
+    def rebuild_heap(self) -> None:
+        """Пересобирает кучу минимумов без устаревших записей."""
+        self.heap = [(self.estimate(row), row) for row in range(len(self.endpoints))]
+        heapq.heapify(self.heap)
+
+    def pop_min(self) -> int:
+        """Возвращает строку с наименьшей оценкой."""
+        while True:
+            if not self.heap:
+                self.rebuild_heap()
+            estimate, row = heapq.heappop(self.heap)
+            if estimate == self.estimate(row):
+                return row
+
+    def add_row(self, endpoint: str, values, error: int = 0) -> None:
+        """Добавляет счетчики уровней endpoint в порядке LOG_LEVELS."""
+        width = self.WIDTH
+        row = self.index.get(endpoint)
+        if row is None:
+            if len(self.endpoints) < self.capacity:
+                row = len(self.endpoints)
+                self.endpoints.append(endpoint)
+                self.counts.extend(ZERO_ROW)
+                self.errors.append(0)
+            else:
+                row = self.pop_min()
+                self.errors[row] = self.estimate(row)
+                del self.index[self.endpoints[row]]
+                self.endpoints[row] = endpoint
+                self.counts[row * width : (row + 1) * width] = ZERO_ROW
+            self.index[endpoint] = row
+
+        start = row * width
+        for column, value in enumerate(values):
+            self.counts[start + column] += value
+        self.errors[row] += error
+        heapq.heappush(self.heap, (self.estimate(row), row))
+        if len(self.heap) > TOP_HEAP_SLACK * self.capacity:
+            self.rebuild_heap()
+
+    def add(self, endpoint: str, level: str, count: int = 1) -> None:
+        """Добавляет count запросов endpoint с уровнем level."""
+        values = [0] * self.WIDTH
+        values[LEVEL_INDEX[level]] = count
+        self.add_row(endpoint, values)
+
+    def update(self, counter: Mapping[tuple[str, str], int]) -> "TopEndpointCounter":
+        """Добавляет счетчик {(log_level, endpoint): count} строками по endpoint."""
+        rows = defaultdict(lambda: [0] * self.WIDTH)
+        for (level, endpoint), count in counter.items():
+            rows[endpoint][LEVEL_INDEX[level]] += count
+        for endpoint, values in rows.items():
+            self.add_row(endpoint, values)
+        return self
+
+    def merge(self, other: EndpointCounter) -> "TopEndpointCounter":
+        """Добавляет счетчики other, погрешности складываются."""
+        width = self.WIDTH
+        errors = getattr(other, "errors", None)
+        for row, endpoint in enumerate(other.endpoints):
+            self.add_row(
+                endpoint,
+                other.counts[row * width : (row + 1) * width],
+                errors[row] if errors else 0,
+            )
+        return self
+
+    def __reduce__(self):
+        """Дешевая сериализация для пула процессов."""
+        return self.from_parts, (
+            self.capacity,
+            self.endpoints,
+            self.counts.tobytes(),
+            self.errors.tobytes(),
+        )
+
+
+class EndpointNormalizer:
+    """
+    Схлопывает идентификаторы в endpoint в плейсхолдеры.
+
+    Правила (регулярное выражение, замена) применяются по порядку через re.sub.
+    Результаты запоминаются в кэше, который очищается при переполнении.
+    """
+
+    __slots__ = ("cache", "rules")
+
+    def __init__(self, rules: Iterable[tuple[str, str]] = NORMALIZE_RULES):
+        """Компилирует правила нормализации."""
+        self.rules = [(re.compile(pattern), repl) for pattern, repl in rules]
+        self.cache = {}
+
+    def __call__(self, endpoint: str) -> str:
+        """Возвращает нормализованный endpoint."""
+        normalized = self.cache.get(endpoint)
+        if normalized is None:
+            normalized = endpoint
+            for pattern, repl in self.rules:
+                normalized = pattern.sub(repl, normalized)
+            if len(self.cache) >= NORMALIZE_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[endpoint] = normalized
+        return normalized
+
+    def counter(self, counter: Counter) -> Counter:
+        """Нормализует endpoint в ключах счетчика {(log_level, endpoint): count}."""
+        normalized = Counter()
+        for (level, endpoint), count in counter.items():
+            normalized[level, self(endpoint)] += count
+        return normalized
+
+    def signature(self) -> list:
+        """Описание правил для сверки с файлом состояния."""
+        return [[pattern.pattern, repl] for pattern, repl in self.rules]
+
+
+def address_prefix(network) -> str:
+    """Текстовое начало адресов подсети IPv4: целые октеты маски, «192.168.1.»."""
+    if network.version != 4:
+        return ""
+    octets = str(network.network_address).split(".")[: network.prefixlen // 8]
+    return ".".join(octets) + ("." if 0 < len(octets) < 4 else "")
+
+
+class RequestFilter:
+    """
+    Отбор строк django.request по уровню, префиксу endpoint и подсети клиента.
+
+    Фильтр работает на этапе поиска строк, до разбора отчетом: count сразу
+    считает пары (log_level, endpoint) прошедших строк для отчета handlers,
+    select оставляет в пачке строк или окне байтов только прошедшие строки
+    для остальных отчетов. В пачке строк префикс endpoint, единственный
+    уровень и начало адреса подсети сначала проверяются подстрокой, и
+    регулярное выражение проходит только по оставшимся строкам. В окне байтов
+    поиск начинается с литерала каждого выбранного уровня (если их не больше
+    FILTER_LEVEL_SCANS), поэтому строки других уровней не доходят до Python.
+    Префикс и начало адреса вкомпилированы в выражения; уровень строки, как и
+    без фильтра, - первое слово уровня в ней, адрес сверяется с подсетью точно.
+    """
+
+    __slots__ = (
+        "batch_pattern",
+        "cache",
+        "level_patterns",
+        "levels",
+        "needles",
+        "network",
+        "pattern",
+        "prefix",
+        "tail_pattern",
+    )
+
+    def __init__(
+        self,
+        levels: Iterable[str] | None = None,
+        prefix: str | None = None,
+        network=None,
+    ):
+        """
+        Компилирует выражения фильтра.
+
+        :param levels: допустимые уровни или None - любые
+        :param prefix: префикс endpoint, начинается с /
+        :param network: подсеть клиента ipaddress.ip_network или None
+        """
+        self.levels = (
+            None if levels is None else sorted(set(levels), key=LEVEL_INDEX.get)
+        )
+        self.prefix = prefix
+        self.network = network
+        self.cache = {}
+
+        address = "" if network is None else address_prefix(network)
+        tail = FILTER_TAIL.format(
+            prefix=re.escape(prefix or "/"),
+            client=""
+            if network is None
+            else FILTER_CLIENT.format(address=re.escape(address)),
+        )
+        # Группы: уровень, endpoint и адрес клиента; pattern захватывает строку
+        # целиком для select, batch_pattern - как BATCH_PATTERN для count.
+        request = rf"({'|'.join(LOG_LEVELS)})[^\n]*?{tail}[^\n]*"
+        self.pattern = re.compile(rf"^[^\n]*?{request}", re.MULTILINE)
+        self.batch_pattern = re.compile(request)
+        self.tail_pattern = re.compile(tail.encode())
+        self.level_patterns = []
+        if self.levels is not None and len(self.levels) <= FILTER_LEVEL_SCANS:
+            self.level_patterns = [
+                re.compile(rf"({level})[^\n]*?{tail}[^\n]*".encode())
+                for level in self.levels
+            ]
+        self.needles = [prefix] if prefix else []
+        if self.levels is not None and len(self.levels) == 1:
+            self.needles += self.levels
+        if address:
+            self.needles.append(f"[{address}")
+
+    def allows(self, address: str) -> bool:
+        """Адрес клиента входит в подсеть; результаты запоминаются в кэше."""
+        allowed = self.cache.get(address)
+        if allowed is None:
+            import ipaddress
+
+            try:
+                allowed = ipaddress.ip_address(address) in self.network
+            except ValueError:
+                allowed = False
+            if len(self.cache) >= NORMALIZE_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[address] = allowed
+        return allowed
+
+    def candidates(self, lines: list[str]) -> list[str]:
+        """Строки пачки, прошедшие проверки подстрокой."""
+        candidates = [line for line in lines if REQUEST_MARKER in line]
+        for needle in self.needles:
+            candidates = [line for line in candidates if needle in line]
+        if self.levels is not None and len(self.levels) > 1:
+            levels = self.levels
+            candidates = [
+                line for line in candidates if any(map(line.__contains__, levels))
+            ]
+        return candidates
+
+    def accepts(self, level: str, address: str | None) -> bool:
+        """Уровень и адрес клиента совпавшей строки проходят фильтр."""
+        if self.levels is not None and level not in self.levels:
+            return False
+        return self.network is None or self.allows(address)
+
+    def match_buffer(
+        self, buffer, start: int, end: int
+    ) -> Generator[tuple[int, int, bytes, bytes, bytes | None], None, None]:
+        """
+        Отдает (начало строки, конец совпадения, log_level, endpoint, адрес).
+
+        Если уровней выбрано не больше FILTER_LEVEL_SCANS, окно просматривается
+        от литерала каждого уровня, иначе - от хвоста запроса, как scan_buffer.
+        Уровень и адрес не сверяются с фильтром.
+        """
+        rfind = buffer.rfind
+        search_level = LEVEL_PATTERN_BYTES.search
+        if self.level_patterns:
+            for pattern in self.level_patterns:
+                for match in pattern.finditer(buffer, start, end):
+                    pos = match.start()
+                    line_start = rfind(b"\n", start, pos) + 1 or start
+                    if search_level(buffer, line_start, match.end(1)).start() != pos:
+                        continue  # в строке раньше стоит другой уровень
+                    yield line_start, match.end(), *match.groups()
+            return
+
+        last_line = -1
+        for match in self.tail_pattern.finditer(buffer, start, end):
+            pos = match.start()
+            line_start = rfind(b"\n", start, pos) + 1 or start
+            if line_start != last_line and (
+                level := search_level(buffer, line_start, pos)
+            ):
+                last_line = line_start
+                yield line_start, match.end(), level[0], *match.groups()
+
+    def count(self, part) -> Counter:
+        """
+        Считает пары (log_level, endpoint) прошедших строк пачки или окна.
+
+        Совпадения сначала собираются в счетчик, и уровень с адресом клиента
+        проверяются один раз на различный ключ, а не на строку.
+        """
+        if isinstance(part, list):
+            found = Counter(
+                self.batch_pattern.findall("\n".join(self.candidates(part)))
+            )
+        else:
+            found = Counter(match[2:] for match in self.match_buffer(*part))
+
+        counter = Counter()
+        for key, count in found.items():
+            level, endpoint, address = (*key, None)[:3]
+            if isinstance(level, bytes):
+                level, endpoint = level.decode(), endpoint.decode("utf-8", "replace")
+                address = address and address.decode("ascii", "replace")
+            if self.accepts(level, address):
+                counter[level, endpoint] += count
+        return counter
+
+    def select(self, part):
+        """Оставляет в пачке строк или окне (buffer, start, end) прошедшие строки."""
+        if isinstance(part, list):
+            text = "\n".join(self.candidates(part))
+            return [
+                match[0]
+                for match in self.pattern.finditer(text)
+                if self.accepts(match[1], match[3] if self.network else None)
+            ]
+        buffer, _, end = part
+        ranges = []
+        for line_start, match_end, level, _, *address in self.match_buffer(*part):
+            address = address[0].decode("ascii", "replace") if address else None
+            if self.accepts(level.decode(), address):
+                line_end = buffer.find(b"\n", match_end, end)
+                ranges.append((line_start, end if line_end == -1 else line_end))
+        ranges.sort()
+        data = b"\n".join(
+            [buffer[line_start:line_end] for line_start, line_end in ranges]
+        )
+        return data, 0, len(data)
+
+    def signature(self) -> dict:
+        """Описание фильтра для сверки с файлом состояния."""
+        return {
+            "levels": self.levels,
+            "prefix": self.prefix,
+            "client": None if self.network is None else str(self.network),
+        }
+
+
+@register_report("handlers")
+class Aggregator:
+    """
+    Способ агрегации счетчиков: нормализация endpoint и ограничение top-K.
+
+    Без настроек endpoint считаются точно и без ограничения их числа. Это же
+    интерфейс отчета в реестре REPORTS: count_part извлекает из части файла
+    нужные отчету поля, new_counter, feed и merge хранилища накапливают их,
+    from_state и to_state хранилища переносят их через файл состояния,
+    from_bytes и to_bytes - через двоичный снимок, query строит хранилище
+    запросом к базе ingest, а report строит отчет.
+    """
+
+    __slots__ = ("normalizer", "request_filter", "top")
+
+    def __init__(
+        self,
+        normalizer: EndpointNormalizer | None = None,
+        top: int | None = None,
+        request_filter: RequestFilter | None = None,
+    ):
+        """Запоминает нормализатор, размер top-K и фильтр строк."""
+        self.normalizer = normalizer
+        self.top = top
+        self.request_filter = request_filter
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "Aggregator":
+        """Создает агрегатор по аргументам командной строки."""
+        return cls(create_normalizer(args), args.top, create_filter(args))
+
+    def count_part(self, part) -> Counter:
+        """Считает пары (log_level, endpoint) в части файла, прошедшей фильтр."""
+        if self.request_filter is not None:
+            return self.request_filter.count(part)
+        return count_part(part)
+
+    def new_counter(self) -> EndpointCounter:
+        """Создает пустое хранилище счетчиков."""
+        if self.top is None:
+            return EndpointCounter()
+        return TopEndpointCounter(self.top)
+
+    def feed(self, stats: EndpointCounter, counter: Counter) -> EndpointCounter:
+        """Добавляет счетчик {(log_level, endpoint): count} в хранилище."""
+        if self.normalizer is not None:
+            counter = self.normalizer.counter(counter)
+        return stats.update(counter)
+
+    def count(
+        self,
+        counters: Iterable[Counter],
+        metrics: Metrics | None = None,
+        file_path: str = "",
+    ) -> EndpointCounter:
+        """Собирает поток счетчиков в новое хранилище."""
+        stats = self.new_counter()
+        if metrics is None:
+            for counter in counters:
+                self.feed(stats, counter)
+            return stats
+        for counter in counters:
+            with metrics.timer(file_path, "merge"):
+                self.feed(stats, counter)
+        return stats
+
+    def from_state(self, state: dict) -> EndpointCounter:
+        """Восстанавливает хранилище из файла состояния."""
+        return EndpointCounter.from_state(state)
+
+    def from_bytes(self, data: memoryview) -> EndpointCounter:
+        """Восстанавливает хранилище из блока двоичного снимка."""
+        if self.top is None:
+            return EndpointCounter.from_bytes(data)
+        return TopEndpointCounter.from_bytes(data, self.top)
+
+    def file_range(self, file_path: str) -> tuple[int, int | None]:
+        """Байтовый диапазон [start, end) файла, который нужно прочитать."""
+        return 0, None
+
+    def query(self, connection) -> EndpointCounter:
+        """Хранилище по базе ingest: число запросов по endpoint и уровню."""
+        conditions, params = filter_conditions(connection, self.request_filter)
+        rows = connection.execute(
+            "SELECT level, endpoints.value, count FROM ("
+            "SELECT endpoint, level, COUNT(*) AS count FROM requests"
+            f"{where_clause(conditions)} GROUP BY endpoint, level"
+            ") JOIN endpoints ON endpoints.id = endpoint",
+            params,
+        )
+        counter = Counter(
+            {(LOG_LEVELS[level], endpoint): count for level, endpoint, count in rows}
+        )
+        return self.feed(self.new_counter(), counter)
+
+    def table(self, stats: EndpointCounter) -> "ReportTable":
+        """Таблица отчета handlers."""
+        return requests_table(stats)
+
+    def sections(self, stats) -> list[tuple[str | None, "ReportTable"]]:
+        """Таблицы отчета для вывода: [(имя отчета или None, таблица)]."""
+        return [(None, self.table(stats))]
+
+    def report(self, stats) -> list[str]:
+        """Строит отчет в формате table построчно."""
+        return list(chain.from_iterable(render_sections(self.sections(stats))))
+
+    def signature(self) -> dict:
+        """Описание настроек для сверки с файлом состояния."""
+        return self.filter_signature(
+            {
+                "normalize": self.normalizer.signature() if self.normalizer else None,
+                "top": self.top,
+            }
+        )
+
+    def filter_signature(self, signature: dict) -> dict:
+        """Добавляет к описанию настроек фильтр строк, если он задан."""
+        if self.request_filter is not None:
+            signature["filter"] = self.request_filter.signature()
+        return signature
+
+
+def keep_identifier(match: re.Match) -> str:
+    """Оставляет имя таблицы в кавычках, строковый литерал заменяет на ?."""
+    return match[1] or "?"
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_sql(sql: str) -> str:
+    """Приводит SQL к форме запроса: значения литералов заменяются на ?."""
+    if "'" in sql:
+        sql = SQL_STRING.sub(keep_identifier, sql)
+    sql = SQL_NUMBER.sub("?", sql)
+    if "(?" in sql:
+        sql = SQL_IN_LIST.sub("(?)", sql)
+    if "  " in sql or "\t" in sql:
+        sql = " ".join(sql.split())
+    return sql
+
+
+class QuantileSketch:
+    """
+    Скетч перцентилей в стиле DDSketch с относительной погрешностью SKETCH_ALPHA.
+
+    Значение попадает в корзину ceil(log(x) / log(gamma)), поэтому число корзин
+    растет с логарифмом диапазона значений, а не с числом значений, и не
+    превышает SKETCH_MAX_BINS. Скетчи складываются покорзинно без потери
+    точности. Количество, сумма, минимум и максимум хранятся точно.
+    """
+
+    __slots__ = ("bins", "count", "max", "min", "sum", "zero")
+
+    def __init__(self):
+        """Создает пустой скетч."""
+        self.bins = defaultdict(int)
+        self.zero = 0  # значения, слишком малые для логарифма (0.00)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: list[float]) -> None:
+        """Добавляет значения."""
+        self.count += len(values)
+        self.sum += sum(values)
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+        bins, log, ceil = self.bins, math.log, math.ceil
+        for value in values:
+            if value > 0:
+                bins[ceil(log(value) / SKETCH_LOG_GAMMA)] += 1
+            else:
+                self.zero += 1
+        if len(bins) > SKETCH_MAX_BINS:
+            self.collapse()
+
+    def collapse(self) -> None:
+        """Сливает младшие корзины, пока их не станет SKETCH_MAX_BINS."""
+        keys = sorted(self.bins)
+        excess = keys[: len(keys) - SKETCH_MAX_BINS + 1]
+        self.bins[excess[-1]] += sum(self.bins.pop(key) for key in excess[:-1])
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Добавляет значения другого скетча."""
+        for key, count in other.bins.items():
+            self.bins[key] += count
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > SKETCH_MAX_BINS:
+            self.collapse()
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Оценка q-перцентиля (0 <= q <= 1) с относительной погрешностью."""
+        if not self.count:
+            return math.nan
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                estimate = 2 * SKETCH_GAMMA**key / (SKETCH_GAMMA + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def to_state(self) -> list:
+        """Состояние для JSON: [count, sum, min, max, zero, [[корзина, count]]]."""
+        bins = [[key, count] for key, count in self.bins.items()]
+        return [self.count, self.sum, self.min, self.max, self.zero, bins]
+
+    @classmethod
+    def from_state(cls, state: list) -> "QuantileSketch":
+        """Восстанавливает скетч из состояния to_state."""
+        sketch = cls()
+        sketch.count, sketch.sum, sketch.min, sketch.max, sketch.zero, bins = state
+        sketch.bins.update((key, count) for key, count in bins)
+        return sketch
+
+
+class QueryStats(dict):
+    """Скетчи длительности SQL-запросов по форме запроса {shape: QuantileSketch}."""
+
+    def update(self, queries: Iterable[tuple[str, str]]) -> "QueryStats":
+        """Добавляет пары (длительность в секундах, SQL) пачкой по формам."""
+        durations = defaultdict(list)
+        for duration, sql in queries:
+            durations[normalize_sql(sql)].append(float(duration))
+        for shape, values in durations.items():
+            sketch = self.get(shape)
+            if sketch is None:
+                sketch = self[shape] = QuantileSketch()
+            sketch.add(values)
+        return self
+
+    def merge(self, other: "QueryStats") -> "QueryStats":
+        """Добавляет скетчи другого набора."""
+        for shape, sketch in other.items():
+            if shape in self:
+                self[shape].merge(sketch)
+            else:
+                self[shape] = QuantileSketch().merge(sketch)
+        return self
+
+    def to_state(self) -> dict[str, list]:
+        """Состояние для JSON."""
+        return {shape: sketch.to_state() for shape, sketch in self.items()}
+
+    @classmethod
+    def from_state(cls, state: dict[str, list]) -> "QueryStats":
+        """Восстанавливает набор из состояния to_state."""
+        return cls(
+            (shape, QuantileSketch.from_state(sketch))
+            for shape, sketch in state.items()
+        )
+
+    def to_bytes(self) -> bytes:
+        """Снимок по столбцам: формы SQL, поля скетчей, их корзины и счетчики."""
+        sketches = list(self.values())
+        return pack_blocks(
+            [
+                pack_strings(self),
+                pack_array(
+                    array("Q", chain.from_iterable((s.count, s.zero) for s in sketches))
+                ),
+                pack_array(
+                    array(
+                        "d",
+                        chain.from_iterable((s.sum, s.min, s.max) for s in sketches),
+                    )
+                ),
+                pack_array(array("I", [len(sketch.bins) for sketch in sketches])),
+                pack_array(array("i", chain.from_iterable(s.bins for s in sketches))),
+                pack_array(
+                    array("Q", chain.from_iterable(s.bins.values() for s in sketches))
+                ),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: memoryview) -> "QueryStats":
+        """Восстанавливает набор из снимка to_bytes."""
+        shapes, exact, floats, sizes, keys, values = unpack_blocks(data)
+        shapes = unpack_strings(shapes)
+        exact, floats = unpack_array("Q", exact), unpack_array("d", floats)
+        sizes = unpack_array("I", sizes)
+        keys, values = unpack_array("i", keys), unpack_array("Q", values)
+        check_snapshot_rows(len(shapes), exact, 2)
+        check_snapshot_rows(len(shapes), floats, 3)
+        check_snapshot_rows(len(shapes), sizes, 1)
+        check_snapshot_rows(sum(sizes), keys, 1)
+        check_snapshot_rows(len(keys), values, 1)
+
+        stats, offset = cls(), 0
+        for i, shape in enumerate(shapes):
+            sketch = stats[shape] = QuantileSketch()
+            sketch.count, sketch.zero = exact[2 * i : 2 * i + 2]
+            sketch.sum, sketch.min, sketch.max = floats[3 * i : 3 * i + 3]
+            end = offset + sizes[i]
+            sketch.bins.update(zip(keys[offset:end], values[offset:end]))
+            offset = end
+        return stats
+
+
+@register_report("db")
+class QueryAggregator(Aggregator):
+    """Агрегация отчета db: скетчи длительности запросов по форме SQL."""
+
+    __slots__ = ()
+    count_part = staticmethod(find_queries)
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "QueryAggregator":
+        """Отчет db не настраивается аргументами."""
+        return cls()
+
+    def new_counter(self) -> QueryStats:
+        """Создает пустой набор скетчей."""
+        return QueryStats()
+
+    def feed(self, stats: QueryStats, queries: list) -> QueryStats:
+        """Добавляет найденные пары (длительность, SQL)."""
+        return stats.update(queries)
+
+    def from_state(self, state: dict) -> QueryStats:
+        """Восстанавливает набор скетчей из файла состояния."""
+        return QueryStats.from_state(state)
+
+    def from_bytes(self, data: memoryview) -> QueryStats:
+        """Восстанавливает набор скетчей из блока двоичного снимка."""
+        return QueryStats.from_bytes(data)
+
+    def query(self, connection) -> QueryStats:
+        """
+        Набор скетчей по базе ingest.
+
+        Длительности приходят сгруппированными по (форма SQL, длительность) из
+        индекса, повторы добавляются в скетч без отдельных строк результата.
+        """
+        rows = connection.execute(
+            "SELECT statement, statements.value, duration, count FROM ("
+            "SELECT statement, duration, COUNT(*) AS count FROM queries "
+            "GROUP BY statement, duration"
+            ") JOIN statements ON statements.id = statement ORDER BY statement"
+        )
+        stats = QueryStats()
+        for (_, shape), group in groupby(rows, key=lambda row: row[:2]):
+            values = []
+            for *_, duration, count in group:
+                values.extend(repeat(duration / 1_000_000, count))
+            stats[shape] = QuantileSketch()
+            stats[shape].add(values)
+        return stats
+
+    def table(self, stats: QueryStats) -> "ReportTable":
+        """Таблица отчета db."""
+        return queries_table(stats)
+
+    def signature(self) -> dict:
+        """Описание настроек для сверки с файлом состояния."""
+        return {"report": "db", "alpha": SKETCH_ALPHA}
+
+
+class TimelineStats(dict):
+    """Счетчики запросов по корзинам времени {начало корзины: EndpointCounter}."""
+
+    def update(self, counter: Mapping[tuple[str, str, int], int]) -> "TimelineStats":
+        """Добавляет счетчик {(log_level, endpoint, начало корзины): count}."""
+        for (level, endpoint, bucket), count in counter.items():
+            counts = self.get(bucket)
+            if counts is None:
+                counts = self[bucket] = EndpointCounter()
+            counts.add(endpoint, level, count)
+        return self
+
+    def merge(self, other: "TimelineStats") -> "TimelineStats":
+        """Добавляет счетчики другого набора."""
+        for bucket, counts in other.items():
+            self.setdefault(bucket, EndpointCounter()).merge(counts)
+        return self
+
+    def to_state(self) -> dict[str, dict]:
+        """Состояние для JSON: {начало корзины: {endpoint: [счетчики уровней]}}."""
+        return {str(bucket): counts.to_state() for bucket, counts in self.items()}
+
+    @classmethod
+    def from_state(cls, state: dict[str, dict]) -> "TimelineStats":
+        """Восстанавливает набор из состояния to_state."""
+        return cls(
+            (int(bucket), EndpointCounter.from_state(counts))
+            for bucket, counts in state.items()
+        )
+
+    def to_bytes(self) -> bytes:
+        """Снимок: массив начал корзин и снимки их счетчиков."""
+        return pack_blocks(
+            [
+                pack_array(array("q", self)),
+                *(counts.to_bytes() for counts in self.values()),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: memoryview) -> "TimelineStats":
+        """Восстанавливает набор из снимка to_bytes."""
+        buckets, *counters = unpack_blocks(data)
+        buckets = unpack_array("q", buckets)
+        check_snapshot_rows(len(counters), buckets, 1)
+        return cls(zip(buckets, map(EndpointCounter.from_bytes, counters)))
+
+
+@register_report("timeline")
+class TimelineAggregator(Aggregator):
+    """
+    Агрегация отчета timeline: запросы по уровням и endpoint в корзинах времени.
+
+    Корзина строки определяется ее меткой времени, а не порядком строк, поэтому
+    перемешанные строки попадают в свои корзины. Фильтр since/until сравнивает
+    префикс строки со строкой метки до регулярного выражения. Для файлов,
+    отсортированных по времени (sorted_input), читается только диапазон байт
+    между since и until, найденный бинарным поиском.
+    """
+
+    __slots__ = ("bucket", "since", "sorted_input", "until")
+
+    def __init__(
+        self,
+        bucket: int = TIMELINE_BUCKET,
+        since: str | None = None,
+        until: str | None = None,
+        sorted_input: bool = False,
+        normalizer: EndpointNormalizer | None = None,
+        request_filter: RequestFilter | None = None,
+    ):
+        """Запоминает размер корзины в секундах и границы [since, until)."""
+        super().__init__(normalizer, request_filter=request_filter)
+        self.bucket = bucket
+        self.since = since
+        self.until = until
+        self.sorted_input = sorted_input
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "TimelineAggregator":
+        """Создает агрегатор по аргументам --bucket, --since, --until и --sorted."""
+        return cls(
+            args.bucket,
+            args.since,
+            args.until,
+            args.sorted,
+            create_normalizer(args),
+            create_filter(args),
+        )
+
+    def count_part(self, part) -> Counter:
+        """Считает тройки (log_level, endpoint, начало корзины) в части файла."""
+        if self.request_filter is not None:
+            part = self.request_filter.select(part)
+        since, until = self.since or "", self.until or "~"
+        if isinstance(part, list):
+            candidates = [
+                line
+                for line in part
+                if REQUEST_MARKER in line and since <= line[:TIMESTAMP_SIZE] < until
+            ]
+            found = Counter(TIMELINE_PATTERN.findall("\n".join(candidates)))
+        else:
+            found = scan_timeline_buffer(*part)
+
+        counter, buckets = Counter(), {}
+        for (timestamp, level, endpoint), count in found.items():
+            bucket = buckets.get(timestamp)
+            if bucket is None:
+                if not since <= timestamp < until:
+                    continue
+                try:
+                    seconds = timestamp_seconds(timestamp)
+                except ValueError:
+                    continue
+                bucket = buckets[timestamp] = seconds - seconds % self.bucket
+            counter[level, endpoint, bucket] += count
+        return counter
+
+    def new_counter(self) -> TimelineStats:
+        """Создает пустой набор корзин."""
+        return TimelineStats()
+
+    def feed(self, stats: TimelineStats, counter: Counter) -> TimelineStats:
+        """Добавляет счетчик {(log_level, endpoint, начало корзины): count}."""
+        if self.normalizer is not None:
+            normalized = Counter()
+            for (level, endpoint, bucket), count in counter.items():
+                normalized[level, self.normalizer(endpoint), bucket] += count
+            counter = normalized
+        return stats.update(counter)
+
+    def from_state(self, state: dict) -> TimelineStats:
+        """Восстанавливает набор корзин из файла состояния."""
+        return TimelineStats.from_state(state)
+
+    def from_bytes(self, data: memoryview) -> TimelineStats:
+        """Восстанавливает набор корзин из блока двоичного снимка."""
+        return TimelineStats.from_bytes(data)
+
+    def file_range(self, file_path: str) -> tuple[int, int | None]:
+        """Для отсортированного несжатого файла - байты между since и until."""
+        if (
+            not self.sorted_input
+            or file_path == STDIN_PATH
+            or detect_compression(file_path)
+        ):
+            return 0, None
+        start = find_time_offset(file_path, self.since) if self.since else 0
+        end = find_time_offset(file_path, self.until) if self.until else None
+        return start, end
+
+    def query(self, connection) -> TimelineStats:
+        """Набор корзин по базе ingest; since и until ищутся по индексу времени."""
+        conditions, params = filter_conditions(connection, self.request_filter)
+        conditions.insert(0, "ts IS NOT NULL")
+        if self.since:
+            conditions.append("ts >= ?")
+            params.append(timestamp_seconds(self.since))
+        if self.until:
+            conditions.append("ts < ?")
+            params.append(timestamp_seconds(self.until))
+        # Внутренний GROUP BY идет в порядке индекса requests_ts без сортировки,
+        # в корзины сводятся уже сгруппированные по секундам строки.
+        rows = connection.execute(
+            "SELECT level, endpoints.value, bucket, count FROM ("
+            "SELECT ts - ts % ? AS bucket, endpoint, level, SUM(count) AS count FROM ("
+            "SELECT ts, endpoint, level, COUNT(*) AS count "
+            f"FROM requests{where_clause(conditions)} GROUP BY ts, endpoint, level"
+            ") GROUP BY bucket, endpoint, level"
+            ") JOIN endpoints ON endpoints.id = endpoint",
+            [self.bucket, *params],
+        )
+        counter = Counter(
+            {
+                (LOG_LEVELS[level], endpoint, bucket): count
+                for level, endpoint, bucket, count in rows
+            }
+        )
+        return self.feed(self.new_counter(), counter)
+
+    def table(self, stats: TimelineStats) -> "ReportTable":
+        """Таблица отчета timeline."""
+        return timeline_table(stats)
+
+    def signature(self) -> dict:
+        """Описание настроек для сверки с файлом состояния."""
+        return self.filter_signature(
+            {
+                "report": "timeline",
+                "bucket": self.bucket,
+                "since": self.since,
+                "until": self.until,
+                "normalize": self.normalizer.signature() if self.normalizer else None,
+            }
+        )
+
+
+class ErrorStats:
+    """
+    Сигнатуры исключений по endpoint: шаблоны сообщений в стиле Drain.
+
+    Сообщение делится на токены по пробелам, токены с цифрами или в кавычках
+    заменяются на WILDCARD. Дерево ведет от (тип исключения, число токенов) через первые
+    ERRORS_PREFIX_TOKENS токенов к листу - короткому списку кластеров, и
+    сообщение сравнивается только с кластерами своего листа, а не со всеми
+    сообщениями. Кластер, с шаблоном которого совпадает не меньше доли
+    ERRORS_SIMILARITY токенов, поглощает сообщение, а несовпавшие позиции
+    шаблона становятся WILDCARD. Повторы сообщений после замены переменных
+    частей находят кластер по кэшу.
+    У узла не больше ERRORS_MAX_CHILDREN детей, в листе не больше
+    ERRORS_MAX_LEAF кластеров, поэтому время на сообщение ограничено. Сверх
+    ERRORS_MAX_SIGNATURES кластеров сообщение попадает в ближайший кластер
+    листа или в общий кластер своего типа исключения, поэтому ограничена и
+    память.
+    """
+
+    __slots__ = ("cache", "counts", "exceptions", "overflow", "templates", "tree")
+
+    def __init__(self):
+        """Создает пустой набор сигнатур."""
+        self.exceptions = []  # тип исключения кластера
+        self.templates = []  # шаблон кластера - кортеж токенов
+        self.tree = {}  # (тип, число токенов) -> {токен: ... -> [кластеры]}
+        self.overflow = {}  # тип исключения -> общий кластер сверх лимита
+        self.cache = {}  # (тип исключения, сообщение) -> кластер
+        self.counts = Counter()  # (endpoint, кластер) -> число ошибок
+
+    @staticmethod
+    def mask(message: str) -> str:
+        """Сообщение с переменными токенами, замененными на WILDCARD."""
+        return ERROR_VARIABLE.sub(WILDCARD, message)
+
+    def leaf(self, exception: str, tokens: tuple[str, ...]) -> list[int]:
+        """Список кластеров листа дерева для сообщения tokens."""
+        prefix = tokens[:ERRORS_PREFIX_TOKENS]
+        node = self.tree.setdefault((exception, len(tokens)), {} if prefix else [])
+        for depth, token in enumerate(prefix, 1):
+            if token not in node and len(node) >= ERRORS_MAX_CHILDREN:
+                token = WILDCARD
+            child = node.get(token)
+            if child is None:
+                child = node[token] = {} if depth < len(prefix) else []
+            node = child
+        return node
+
+    def new_cluster(self, exception: str, template: tuple[str, ...]) -> int:
+        """Добавляет кластер и возвращает его номер."""
+        self.exceptions.append(exception)
+        self.templates.append(template)
+        return len(self.templates) - 1
+
+    def overflow_cluster(self, exception: str) -> int:
+        """Общий кластер типа исключения для сообщений сверх лимита."""
+        cluster = self.overflow.get(exception)
+        if cluster is None:
+            cluster = self.overflow[exception] = self.new_cluster(
+                exception, (WILDCARD,)
+            )
+        return cluster
+
+    def cluster(self, exception: str, tokens: tuple[str, ...]) -> int:
+        """Номер кластера сообщения tokens, шаблон кластера обобщается."""
+        leaf = self.leaf(exception, tokens)
+        best, best_score = None, (-1, -1)
+        for cluster in leaf:
+            same = wild = 0
+            for token, other in zip(self.templates[cluster], tokens):
+                if token == other:
+                    same += 1
+                elif token == WILDCARD:
+                    wild += 1
+            if (same, wild) > best_score:
+                best, best_score = cluster, (same, wild)
+
+        full = len(self.templates) >= ERRORS_MAX_SIGNATURES
+        if best is not None and (
+            full
+            or len(leaf) >= ERRORS_MAX_LEAF
+            or best_score[0] >= ERRORS_SIMILARITY * len(tokens)
+        ):
+            template = self.templates[best]
+            if sum(best_score) < len(tokens):
+                self.templates[best] = tuple(
+                    token if token == other else WILDCARD
+                    for token, other in zip(template, tokens)
+                )
+            return best
+        if full:
+            return self.overflow_cluster(exception)
+        cluster = self.new_cluster(exception, tokens)
+        leaf.append(cluster)
+        return cluster
+
+    def signature(self, cluster: int) -> str:
+        """Сигнатура кластера: «тип исключения: шаблон сообщения»."""
+        return f"{self.exceptions[cluster]}: {' '.join(self.templates[cluster])}"
+
+    def update(self, errors: Iterable[tuple[str, str, str]]) -> "ErrorStats":
+        """Добавляет тройки (endpoint, тип исключения, сообщение)."""
+        for (endpoint, exception, message), count in Counter(errors).items():
+            key = exception, self.mask(message)
+            cluster = self.cache.get(key)
+            if cluster is None:
+                cluster = self.cluster(exception, tuple(key[1].split()))
+                if len(self.cache) >= ERRORS_CACHE_SIZE:
+                    self.cache.clear()
+                self.cache[key] = cluster
+            self.counts[endpoint, cluster] += count
+        return self
+
+    def merge(self, other: "ErrorStats") -> "ErrorStats":
+        """Добавляет кластеры и счетчики другого набора по их шаблонам."""
+        overflow = set(other.overflow.values())
+        clusters = [
+            self.overflow_cluster(exception)
+            if cluster in overflow
+            else self.cluster(exception, template)
+            for cluster, (exception, template) in enumerate(
+                zip(other.exceptions, other.templates)
+            )
+        ]
+        for (endpoint, cluster), count in other.counts.items():
+            self.counts[endpoint, clusters[cluster]] += count
+        return self
+
+    @classmethod
+    def from_parts(
+        cls,
+        exceptions: list[str],
+        templates: list[tuple[str, ...]],
+        overflow: Iterable[int],
+        counts: Iterable[tuple[str, int, int]],
+    ) -> "ErrorStats":
+        """Восстанавливает набор: кластеры занимают листья своих шаблонов."""
+        stats = cls()
+        overflow = set(overflow)
+        for cluster, (exception, template) in enumerate(zip(exceptions, templates)):
+            stats.new_cluster(exception, template)
+            if cluster in overflow:
+                stats.overflow[exception] = cluster
+            else:
+                stats.leaf(exception, template).append(cluster)
+        for endpoint, cluster, count in counts:
+            stats.counts[endpoint, cluster] += count
+        return stats
+
+    def to_state(self) -> dict[str, list]:
+        """Состояние для JSON: кластеры, общие кластеры и счетчики."""
+        return {
+            "clusters": [list(item) for item in zip(self.exceptions, self.templates)],
+            "overflow": list(self.overflow.values()),
+            "counts": [[*key, count] for key, count in self.counts.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, list]) -> "ErrorStats":
+        """Восстанавливает набор из состояния to_state."""
+        clusters = state.get("clusters", [])
+        return cls.from_parts(
+            [exception for exception, _ in clusters],
+            [tuple(template) for _, template in clusters],
+            state.get("overflow", []),
+            state.get("counts", []),
+        )
+
+    def to_bytes(self) -> bytes:
+        """Снимок: типы и шаблоны кластеров, общие кластеры, счетчики."""
+        keys = list(self.counts)
+        return pack_blocks(
+            [
+                pack_strings(self.exceptions),
+                pack_strings(map(" ".join, self.templates)),
+                pack_array(array("I", self.overflow.values())),
+                pack_strings(endpoint for endpoint, _ in keys),
+                pack_array(array("I", [cluster for _, cluster in keys])),
+                pack_array(array("Q", self.counts.values())),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: memoryview) -> "ErrorStats":
+        """Восстанавливает набор из снимка to_bytes."""
+        exceptions, templates, overflow, endpoints, clusters, counts = unpack_blocks(
+            data
+        )
+        exceptions = unpack_strings(exceptions)
+        templates = [tuple(template.split()) for template in unpack_strings(templates)]
+        endpoints = unpack_strings(endpoints)
+        clusters, counts = unpack_array("I", clusters), unpack_array("Q", counts)
+        check_snapshot_rows(len(exceptions), templates, 1)
+        check_snapshot_rows(len(endpoints), clusters, 1)
+        check_snapshot_rows(len(endpoints), counts, 1)
+        if any(cluster >= len(exceptions) for cluster in clusters):
+            raise ValueError("Снимок поврежден: номер кластера вне диапазона")
+        return cls.from_parts(
+            exceptions,
+            templates,
+            unpack_array("I", overflow),
+            zip(endpoints, clusters, counts),
+        )
+
+
+@register_report("errors")
+class ErrorAggregator(Aggregator):
+    """Агрегация отчета errors: сигнатуры исключений Internal Server Error."""
+
+    __slots__ = ("limit",)
+
+    def __init__(
+        self,
+        limit: int = ERRORS_PER_ENDPOINT,
+        normalizer: EndpointNormalizer | None = None,
+        request_filter: RequestFilter | None = None,
+    ):
+        """Запоминает число сигнатур на endpoint в отчете."""
+        super().__init__(normalizer, request_filter=request_filter)
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "ErrorAggregator":
+        """Создает агрегатор по аргументу --errors-per-endpoint."""
+        return cls(
+            args.errors_per_endpoint, create_normalizer(args), create_filter(args)
+        )
+
+    def count_part(self, part) -> list[tuple[str, str, str]]:
+        """Находит тройки (endpoint, тип исключения, сообщение), прошедшие фильтр."""
+        if self.request_filter is not None:
+            part = self.request_filter.select(part)
+        return find_errors(part)
+
+    def new_counter(self) -> ErrorStats:
+        """Создает пустой набор сигнатур."""
+        return ErrorStats()
+
+    def feed(self, stats: ErrorStats, errors: list) -> ErrorStats:
+        """Добавляет найденные тройки (endpoint, тип исключения, сообщение)."""
+        if self.normalizer is not None:
+            errors = [
+                (self.normalizer(endpoint), exception, message)
+                for endpoint, exception, message in errors
+            ]
+        return stats.update(errors)
+
+    def from_state(self, state: dict) -> ErrorStats:
+        """Восстанавливает набор сигнатур из файла состояния."""
+        return ErrorStats.from_state(state)
+
+    def from_bytes(self, data: memoryview) -> ErrorStats:
+        """Восстанавливает набор сигнатур из блока двоичного снимка."""
+        return ErrorStats.from_bytes(data)
+
+    def query(self, connection) -> ErrorStats:
+        """Сообщения исключений в базу ingest не загружаются."""
+        raise ValueError("Отчет errors не строится по базе ingest")
+
+    def table(self, stats: ErrorStats) -> "ReportTable":
+        """Таблица отчета errors."""
+        return errors_table(stats, self.limit)
+
+    def signature(self) -> dict:
+        """Описание настроек для сверки с файлом состояния."""
+        return self.filter_signature(
+            {
+                "report": "errors",
+                "similarity": ERRORS_SIMILARITY,
+                "prefix": ERRORS_PREFIX_TOKENS,
+                "normalize": self.normalizer.signature() if self.normalizer else None,
+            }
+        )
+
+
+class HttpStats:
+    """
+    Коды ответа по endpoint и методу и самые частые адреса клиентов endpoint.
+
+    Счетчики классов кода точные. Адреса хранятся числами pack_address в
+    сводке Misra-Gries на HTTP_CLIENTS_CAPACITY счетчиков на endpoint: когда
+    счетчиков больше, из всех вычитается значение, следующее за
+    HTTP_CLIENTS_CAPACITY наибольшими, и неположительные удаляются. Сводка
+    обновляется счетчиком части файла целиком, а не по строке, и объединяется
+    с другой сводкой тем же сложением с усечением. Оставшийся счетчик меньше
+    точного не больше чем на сумму вычтенных значений dropped, поэтому адрес
+    с долей больше 1 / (HTTP_CLIENTS_CAPACITY + 1) запросов endpoint не теряется.
+    """
+
+    __slots__ = ("clients", "dropped", "statuses")
+
+    def __init__(self):
+        """Создает пустой набор."""
+        self.statuses = {}  # (endpoint, метод) -> счетчики по STATUS_CLASSES
+        self.clients = {}  # endpoint -> {адрес числом: count}
+        self.dropped = Counter()  # endpoint -> сумма вычтенных из сводки значений
+
+    def add_statuses(self, endpoint: str, method: str, counts: Iterable[int]) -> None:
+        """Добавляет счетчики классов кода для endpoint и метода."""
+        row = self.statuses.get((endpoint, method))
+        if row is None:
+            row = self.statuses[endpoint, method] = [0] * len(STATUS_CLASSES)
+        for column, count in enumerate(counts):
+            row[column] += count
+
+    def add_clients(
+        self, endpoint: str, counts: Iterable[tuple[int, int]], dropped: int = 0
+    ) -> None:
+        """Добавляет пары (адрес, count) в сводку endpoint и усекает ее."""
+        sketch = self.clients.get(endpoint)
+        if sketch is None:
+            sketch = self.clients[endpoint] = {}
+        for address, count in counts:
+            sketch[address] = sketch.get(address, 0) + count
+        self.dropped[endpoint] += dropped
+        if len(sketch) > HTTP_CLIENTS_CAPACITY:
+            cut = heapq.nlargest(HTTP_CLIENTS_CAPACITY + 1, sketch.values())[-1]
+            self.clients[endpoint] = {
+                address: count - cut for address, count in sketch.items() if count > cut
+            }
+            self.dropped[endpoint] += cut
+
+    def update(self, requests: Mapping, clients: Mapping) -> "HttpStats":
+        """Добавляет счетчики find_http."""
+        for (endpoint, method, column), count in requests.items():
+            counts = [0] * len(STATUS_CLASSES)
+            counts[column] = count
+            self.add_statuses(endpoint, method, counts)
+        by_endpoint = defaultdict(list)
+        for (endpoint, address), count in clients.items():
+            by_endpoint[endpoint].append((address, count))
+        for endpoint, counts in by_endpoint.items():
+            self.add_clients(endpoint, counts)
+        return self
+
+    def merge(self, other: "HttpStats") -> "HttpStats":
+        """Добавляет счетчики и сводки адресов другого набора."""
+        for (endpoint, method), counts in other.statuses.items():
+            self.add_statuses(endpoint, method, counts)
+        for endpoint, sketch in other.clients.items():
+            self.add_clients(endpoint, sketch.items(), other.dropped[endpoint])
+        return self
+
+    def endpoint_totals(self) -> dict[str, list[int]]:
+        """Счетчики классов кода по endpoint без разбивки по методу."""
+        totals = defaultdict(lambda: [0] * len(STATUS_CLASSES))
+        for (endpoint, _), counts in self.statuses.items():
+            row = totals[endpoint]
+            for column, count in enumerate(counts):
+                row[column] += count
+        return totals
+
+    def top_clients(self, endpoint: str, limit: int) -> list[tuple[str, int]]:
+        """Адреса endpoint с наибольшими счетчиками сводки, не больше limit."""
+        sketch = self.clients.get(endpoint, {})
+        top = heapq.nsmallest(
+            limit, sketch.items(), key=lambda item: (-item[1], item[0])
+        )
+        return [(format_address(address), count) for address, count in top]
+
+    def to_state(self) -> dict[str, list]:
+        """Состояние для JSON: счетчики кодов и сводки адресов."""
+        return {
+            "statuses": [[*key, *counts] for key, counts in self.statuses.items()],
+            "clients": [
+                [
+                    endpoint,
+                    self.dropped[endpoint],
+                    [list(item) for item in sketch.items()],
+                ]
+                for endpoint, sketch in self.clients.items()
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict[str, list]) -> "HttpStats":
+        """Восстанавливает набор из состояния to_state."""
+        stats = cls()
+        for endpoint, method, *counts in state.get("statuses", []):
+            stats.add_statuses(endpoint, method, counts)
+        for endpoint, dropped, counts in state.get("clients", []):
+            stats.add_clients(endpoint, map(tuple, counts), dropped)
+        return stats
+
+    def to_bytes(self) -> bytes:
+        """Снимок по столбцам: счетчики кодов ответа и сводки адресов клиентов."""
+        keys = list(self.statuses)
+        endpoints = list(self.clients)
+        sketches = list(self.clients.values())
+        return pack_blocks(
+            [
+                pack_strings(endpoint for endpoint, _ in keys),
+                pack_strings(method for _, method in keys),
+                pack_array(array("Q", chain.from_iterable(self.statuses.values()))),
+                pack_strings(endpoints),
+                pack_array(array("Q", map(self.dropped.__getitem__, endpoints))),
+                pack_array(array("I", map(len, sketches))),
+                b"".join(
+                    address.to_bytes(16, "little")
+                    for sketch in sketches
+                    for address in sketch
+                ),
+                pack_array(array("Q", chain.from_iterable(map(dict.values, sketches)))),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: memoryview) -> "HttpStats":
+        """Восстанавливает набор из снимка to_bytes."""
+        keys, methods, rows, endpoints, dropped, sizes, addresses, counts = (
+            unpack_blocks(data)
+        )
+        keys, methods = unpack_strings(keys), unpack_strings(methods)
+        rows, endpoints = unpack_array("Q", rows), unpack_strings(endpoints)
+        dropped, sizes = unpack_array("Q", dropped), unpack_array("I", sizes)
+        counts = unpack_array("Q", counts)
+        width = len(STATUS_CLASSES)
+        check_snapshot_rows(len(keys), methods, 1)
+        check_snapshot_rows(len(keys), rows, width)
+        check_snapshot_rows(len(endpoints), dropped, 1)
+        check_snapshot_rows(len(endpoints), sizes, 1)
+        check_snapshot_rows(sum(sizes), counts, 1)
+        if len(addresses) != 16 * len(counts):
+            raise ValueError("Снимок поврежден: размеры блоков не согласованы")
+
+        stats = cls()
+        for row, key in enumerate(zip(keys, methods)):
+            stats.statuses[key] = rows[row * width : (row + 1) * width].tolist()
+        offset = 0
+        for endpoint, size, lost in zip(endpoints, sizes, dropped):
+            stats.clients[endpoint] = {
+                int.from_bytes(addresses[16 * i : 16 * (i + 1)], "little"): counts[i]
+                for i in range(offset, offset + size)
+            }
+            stats.dropped[endpoint] = lost
+            offset += size
+        return stats
+
+
+@register_report("http")
+class HttpAggregator(Aggregator):
+    """Агрегация отчета http: коды ответа, доля ошибок и частые адреса клиентов."""
+
+    __slots__ = ("limit",)
+
+    def __init__(
+        self,
+        limit: int = HTTP_CLIENTS_PER_ENDPOINT,
+        normalizer: EndpointNormalizer | None = None,
+        request_filter: RequestFilter | None = None,
+    ):
+        """Запоминает число адресов на endpoint в отчете."""
+        super().__init__(normalizer, request_filter=request_filter)
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "HttpAggregator":
+        """Создает агрегатор по аргументу --clients-per-endpoint."""
+        return cls(
+            args.clients_per_endpoint, create_normalizer(args), create_filter(args)
+        )
+
+    def count_part(self, part) -> tuple[Counter, Counter]:
+        """Считает коды ответа и адреса клиентов строк, прошедших фильтр."""
+        if self.request_filter is not None:
+            part = self.request_filter.select(part)
+        return find_http(part)
+
+    def new_counter(self) -> HttpStats:
+        """Создает пустой набор."""
+        return HttpStats()
+
+    def feed(self, stats: HttpStats, found: tuple[Counter, Counter]) -> HttpStats:
+        """Добавляет счетчики find_http, endpoint нормализуются."""
+        requests, clients = found
+        if self.normalizer is not None:
+            normalize = self.normalizer
+            requests = Counter(
+                {
+                    (normalize(endpoint), method, column): count
+                    for (endpoint, method, column), count in requests.items()
+                }
+            )
+            normalized = Counter()
+            for (endpoint, address), count in clients.items():
+                normalized[normalize(endpoint), address] += count
+            clients = normalized
+        return stats.update(requests, clients)
+
+    def from_state(self, state: dict) -> HttpStats:
+        """Восстанавливает набор из файла состояния."""
+        return HttpStats.from_state(state)
+
+    def from_bytes(self, data: memoryview) -> HttpStats:
+        """Восстанавливает набор из блока двоичного снимка."""
+        return HttpStats.from_bytes(data)
+
+    def query(self, connection) -> HttpStats:
+        """Метод запроса в базу ingest не загружается."""
+        raise ValueError("Отчет http не строится по базе ingest")
+
+    def table(self, stats: HttpStats) -> "ReportTable":
+        """Таблица кодов ответа отчета http."""
+        return http_table(stats)
+
+    def sections(self, stats: HttpStats) -> list[tuple[str, "ReportTable"]]:
+        """Таблицы кодов ответа и адресов клиентов."""
+        return [
+            ("http", http_table(stats)),
+            ("http-clients", clients_table(stats, self.limit)),
+        ]
+
+    def signature(self) -> dict:
+        """Описание настроек для сверки с файлом состояния."""
+        return self.filter_signature(
+            {
+                "report": "http",
+                "capacity": HTTP_CLIENTS_CAPACITY,
+                "normalize": self.normalizer.signature() if self.normalizer else None,
+            }
+        )
+
+
+class ReportStats(dict):
+    """Хранилища нескольких отчетов одного прохода {имя отчета: хранилище}."""
+
+    def merge(self, other: "ReportStats") -> "ReportStats":
+        """Добавляет хранилища другого набора поотчетно."""
+        for name, stats in other.items():
+            self[name].merge(stats)
+        return self
+
+    def to_state(self) -> dict[str, dict]:
+        """Состояние для JSON: {имя отчета: состояние хранилища}."""
+        return {name: stats.to_state() for name, stats in self.items()}
+
+
+class ReportSet(Aggregator):
+    """
+    Несколько отчетов за один проход по файлам.
+
+    Каждая часть файла читается и декодируется один раз и передается count_part
+    всех отчетов; результаты и хранилища хранятся по именам отчетов.
+    """
+
+    __slots__ = ("reports",)
+
+    def __init__(self, reports: dict[str, Aggregator]):
+        """Запоминает агрегаторы отчетов {имя отчета: агрегатор}."""
+        super().__init__()
+        self.reports = reports
+
+    def count_part(self, part) -> dict:
+        """Результаты count_part каждого отчета {имя отчета: результат}."""
+        return {name: report.count_part(part) for name, report in self.reports.items()}
+
+    def new_counter(self) -> ReportStats:
+        """Создает пустые хранилища всех отчетов."""
+        return ReportStats(
+            (name, report.new_counter()) for name, report in self.reports.items()
+        )
+
+    def feed(self, stats: ReportStats, found: dict) -> ReportStats:
+        """Передает результаты части файла агрегаторам отчетов."""
+        for name, report in self.reports.items():
+            report.feed(stats[name], found[name])
+        return stats
+
+    def from_state(self, state: dict) -> ReportStats:
+        """Восстанавливает хранилища отчетов из файла состояния."""
+        return ReportStats(
+            (name, report.from_state(state.get(name, {})))
+            for name, report in self.reports.items()
+        )
+
+    def query(self, connection) -> ReportStats:
+        """Хранилища всех отчетов по базе ingest."""
+        return ReportStats(
+            (name, report.query(connection)) for name, report in self.reports.items()
+        )
+
+    def file_range(self, file_path: str) -> tuple[int, int | None]:
+        """Наименьший диапазон файла, покрывающий диапазоны всех отчетов."""
+        starts, ends = zip(
+            *(report.file_range(file_path) for report in self.reports.values())
+        )
+        return min(starts), None if None in ends else max(ends)
+
+    def sections(self, stats: ReportStats) -> list[tuple[str, "ReportTable"]]:
+        """Таблицы всех отчетов под их именами или именами их таблиц."""
+        return [
+            (section or name, table)
+            for name, report in self.reports.items()
+            for section, table in report.sections(stats[name])
+        ]
+
+    def signature(self) -> dict:
+        """Описание настроек всех отчетов для сверки с файлом состояния."""
+        return {name: report.signature() for name, report in self.reports.items()}
+
+
+def combine_reports(reports: dict[str, Aggregator]) -> Aggregator:
+    """Агрегатор одного отчета или ReportSet для нескольких."""
+    if len(reports) == 1:
+        return next(iter(reports.values()))
+    return ReportSet(reports)
+
+
+def default_aggregator(report_type: str) -> Aggregator:
+    """
+    Агрегатор отчета report_type без нормализации и ограничений.
+
+    :param report_type: имя отчета или несколько имен через запятую
+    """
+    check_report_type(report_type)
+    return combine_reports({name: REPORTS[name]() for name in report_type.split(",")})
+
+
+def process_file(
+    file_path: str,
+    report_type: str,
+    io_mode: str = "lines",
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+    start: int = 0,
+    end: int | None = None,
+) -> EndpointCounter:
+    """
+    Обрабатывает один файл или его байтовый диапазон [start, end).
+
+    :return (EndpointCounter) {endpoint: {INFO: 1, DEBUG: 1,...}, ...}
+    """
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    counters = iter_counts(
+        file_path, io_mode, start, end, metrics, count=aggregator.count_part
+    )
+    return aggregator.count(counters, metrics, file_path)
+
+
+def describe_error(error: Exception) -> str:
+    """Текст ошибки файла для лога: тип исключения и сообщение."""
+    return f"{type(error).__name__}: {error}"
+
+
+def skip_file(file_path: str, error: str) -> None:
+    """Сообщает о файле, пропущенном из-за ошибки чтения или разбора."""
+    logger.error("Файл %s пропущен из-за ошибки: %s", file_path, error)
+
+
+def check_read(log_files: list[str], read: int) -> None:
+    """Завершает запуск, если ни один из файлов не прочитан без ошибки."""
+    if log_files and not read:
+        logger.critical("Нет файлов для создания отчета")
+        sys.exit(1)
+
+
+def process_chunk(
+    task: tuple,
+) -> tuple[EndpointCounter | None, Metrics | None, str | None]:
+    """
+    Обрабатывает байтовый диапазон файла в процессе пула.
+
+    Ошибка чтения или распаковки (поврежденный файл) не прерывает пул: она
+    возвращается текстом, и файл диапазона пропускается вызывающим кодом.
+
+    :param task: (file_path, start, end, report_type, io_mode, aggregator,
+        instrument)
+    :return (счетчики диапазона или None при ошибке, метрики процесса или None
+        без instrument, текст ошибки или None)
+    """
+    file_path, start, end, report_type, io_mode, aggregator, instrument = task
+    check_report_type(report_type)
+    metrics = Metrics() if instrument else None
+    try:
+        counters = iter_counts(
+            file_path, io_mode, start, end, metrics, count=aggregator.count_part
+        )
+        return aggregator.count(counters, metrics, file_path), metrics, None
+    except Exception as e:
+        return None, metrics, describe_error(e)
+
+
+def count_ranges(
+    ranges: list[tuple],
+    report_type: str,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    io_mode: str = "lines",
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+) -> list[EndpointCounter | None]:
+    """
+    Считает запросы в байтовых диапазонах (file_path, start, end).
+
+    Диапазоны дробятся на части по chunk_size, при workers > 1 части
+    обрабатываются в пуле процессов. Результат возвращается для каждого
+    исходного диапазона отдельно; диапазон файла, который не удалось прочитать,
+    получает None, а файл пропускается с ошибкой в логе.
+    """
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    results = [aggregator.new_counter() for _ in ranges]
+    failed = set()
+
+    def fail(index: int, error: str) -> None:
+        file_path = ranges[index][0]
+        if file_path not in failed:
+            failed.add(file_path)
+            skip_file(file_path, error)
+
+    tasks, owners = [], []
+    for index, (file_path, start, end) in enumerate(ranges):
+        try:
+            chunks = split_file(file_path, chunk_size, start, end)
+        except Exception as e:
+            fail(index, describe_error(e))
+            continue
+        for chunk in chunks:
+            tasks.append(
+                (*chunk, report_type, io_mode, aggregator, metrics is not None)
+            )
+            owners.append(index)
+
+    def merge(index: int, chunk_result: tuple) -> None:
+        chunk_stats, chunk_metrics, error = chunk_result
+        if metrics is not None:
+            metrics.merge(chunk_metrics)
+        if error is not None:
+            fail(index, error)
+        elif metrics is None:
+            results[index].merge(chunk_stats)
+        else:
+            with metrics.timer(ranges[index][0], "merge"):
+                results[index].merge(chunk_stats)
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for index, chunk_result in zip(owners, executor.map(process_chunk, tasks)):
+                merge(index, chunk_result)
+    else:
+        for index, task in zip(owners, tasks):
+            merge(index, process_chunk(task))
+    return [
+        None if file_path in failed else file_stats
+        for (file_path, *_), file_stats in zip(ranges, results)
+    ]
+
+
+def collect_statistics_parallel(
+    log_files: list[str],
+    report_type: str,
+    workers: int,
+    chunk_size: int,
+    io_mode: str,
+    aggregator: Aggregator,
+    metrics: Metrics | None = None,
+) -> EndpointCounter:
+    """
+    Собирает статистику в пуле процессов.
+
+    Каждый файл делится на диапазоны по границам строк, частичные счетчики
+    диапазонов суммируются в основном процессе. Файл с ошибкой чтения
+    пропускается, остальные файлы учитываются.
+    """
+    ranges = [(log_file, *aggregator.file_range(log_file)) for log_file in log_files]
+    totals = aggregator.new_counter()
+    counted = count_ranges(
+        ranges, report_type, workers, chunk_size, io_mode, aggregator, metrics
+    )
+    check_read(log_files, sum(file_totals is not None for file_totals in counted))
+    for log_file, file_totals in zip(log_files, counted):
+        if file_totals is None:
+            continue
+        if metrics is None:
+            totals.merge(file_totals)
+            continue
+        with metrics.timer(log_file, "merge"):
+            totals.merge(file_totals)
+    return totals
+
+
+def ingest_file(
+    file_path: str,
+    aggregator: Aggregator,
+    instrument: bool = False,
+    io_mode: str = "lines",
+) -> tuple[EndpointCounter | None, Metrics | None]:
+    """
+    Считает файл, открывая его один раз; проверка файла совмещена с чтением.
+
+    В режиме mmap и для диапазона байт aggregator.file_range (timeline с
+    --sorted) файл читается как в process_chunk, а пустой файл определяется
+    по размеру. Отсутствующий, недоступный, пустой или поврежденный файл
+    пропускается с ошибкой в логе.
+
+    :return (счетчики файла или None, если файл пропущен; метрики или None)
+    """
+    metrics = Metrics() if instrument else None
+    try:
+        start, end = aggregator.file_range(file_path)
+        if io_mode != "lines" or (start, end) != (0, None):
+            if not os.path.getsize(file_path):
+                logger.error("Файл пустой: %s", file_path)
+                return None, metrics
+            counters = iter_counts(
+                file_path, io_mode, start, end, metrics, count=aggregator.count_part
+            )
+            return aggregator.count(counters, metrics, file_path), metrics
+        with open_log(file_path) as stream:
+            if not stream.peek(1):
+                logger.error("Файл пустой: %s", file_path)
+                return None, metrics
+            file = io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+            parts = read_batches(file)
+            if metrics is None:
+                counters = map(aggregator.count_part, parts)
+            else:
+                counters = metrics.count_parts(file_path, parts, aggregator.count_part)
+            return aggregator.count(counters, metrics, file_path), metrics
+    except FileNotFoundError:
+        logger.error("Файл не найден: %s", file_path)
+    except PermissionError:
+        logger.error("Ошибка доступа к файлу: %s", file_path)
+    except Exception as e:
+        skip_file(file_path, describe_error(e))
+    return None, metrics
+
+
+async def ingest_files(
+    log_files: list[str],
+    aggregator: Aggregator,
+    concurrency: int,
+    instrument: bool,
+    io_mode: str = "lines",
+) -> list[tuple]:
+    """
+    Читает файлы в пуле из concurrency потоков, перекрывая открытия и чтения.
+
+    Задержка открытия и чтения (например, на сетевом диске) ожидается в потоке
+    без GIL, поэтому одновременно открыто до concurrency файлов.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    executor, ingest_file, log_file, aggregator, instrument, io_mode
+                )
+                for log_file in log_files
+            )
+        )
+
+
+def collect_statistics_async(
+    log_files: list[str],
+    report_type: str,
+    concurrency: int,
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+    io_mode: str = "lines",
+) -> EndpointCounter:
+    """
+    Собирает статистику по множеству небольших файлов через asyncio.
+
+    Файлы не проверяются заранее: каждый открывается один раз, ошибки
+    открытия и пустые файлы обнаруживаются при чтении. Счетчики складываются
+    в порядке файлов.
+    """
+    import asyncio
+
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    results = asyncio.run(
+        ingest_files(log_files, aggregator, concurrency, metrics is not None, io_mode)
+    )
+    totals = aggregator.new_counter()
+    read = 0
+    for log_file, (file_stats, file_metrics) in zip(log_files, results):
+        if file_metrics is not None:
+            metrics.merge(file_metrics)
+        if file_stats is None:
+            continue
+        read += 1
+        if metrics is None:
+            totals.merge(file_stats)
+            continue
+        with metrics.timer(log_file, "merge"):
+            totals.merge(file_stats)
+    check_read(log_files, read)
+    return totals
+
+
+def load_state(state_path: str) -> dict:
+    """Загружает файл состояния инкрементальной обработки."""
+    try:
+        with open(state_path, encoding="utf-8") as file:
+            state = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(
+            "Файл состояния %s не прочитан, полный разбор: %s", state_path, e
+        )
+        return {}
+    if state.get("version") != STATE_VERSION:
+        logger.warning("Версия файла состояния %s не поддерживается", state_path)
+        return {}
+    return state.get("files", {})
+
+
+def save_state(state_path: str, files: dict) -> None:
+    """Атомарно записывает файл состояния через временный файл и os.replace."""
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"version": STATE_VERSION, "files": files}, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, state_path)
+
+
+def split_reports(report_type: str, aggregator: Aggregator) -> dict[str, Aggregator]:
+    """Агрегаторы отчетов по именам: {имя отчета: агрегатор}."""
+    if isinstance(aggregator, ReportSet):
+        return aggregator.reports
+    return {report_type: aggregator}
+
+
+def write_snapshot(snapshot_path: str, meta: dict, blocks: list[bytes]) -> None:
+    """Атомарно записывает снимок: заголовок, JSON meta и блоки данных."""
+    payload = pack_blocks([json.dumps(meta).encode(), *blocks])
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_snapshot(snapshot_path: str) -> tuple[dict, list[memoryview]]:
+    """
+    Читает снимок write_snapshot целиком одним вызовом.
+
+    :return (JSON meta, блоки данных как memoryview без копирования)
+    """
+    with open(snapshot_path, "rb") as file:
+        data = memoryview(file.read())
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise ValueError(f"{snapshot_path} не является снимком статистики")
+    magic, version = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f"{snapshot_path} не является снимком статистики")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Версия снимка {snapshot_path} не поддерживается: {version}")
+    meta, *blocks = unpack_blocks(data[SNAPSHOT_HEADER.size :])
+    return json.loads(bytes(meta)), blocks
+
+
+def stats_blocks(report_type: str, aggregator: Aggregator, stats) -> list[bytes]:
+    """to_bytes хранилищ отчетов в порядке split_reports."""
+    reports = split_reports(report_type, aggregator)
+    if not isinstance(aggregator, ReportSet):
+        stats = {report_type: stats}
+    return [stats[name].to_bytes() for name in reports]
+
+
+def report_signatures(report_type: str, aggregator: Aggregator) -> dict:
+    """Настройки агрегации отчетов для meta снимка: {имя отчета: сигнатура}."""
+    reports = split_reports(report_type, aggregator)
+    return {name: report.signature() for name, report in reports.items()}
+
+
+def stats_from_blocks(
+    snapshot_path: str,
+    saved: dict,
+    blocks: list[memoryview],
+    report_type: str,
+    aggregator: Aggregator,
+):
+    """
+    Восстанавливает хранилища отчетов report_type из блоков снимка.
+
+    Массивы счетчиков копируются в array без разбора отдельных значений.
+    Отчеты снимка, не входящие в report_type, пропускаются; отчет, собранный с
+    другими настройками агрегации, - ошибка.
+
+    :param saved: сигнатуры отчетов снимка в порядке блоков
+    """
+    names = list(saved)
+    stats = ReportStats()
+    for name, report in split_reports(report_type, aggregator).items():
+        if name not in saved:
+            raise ValueError(f"В снимке {snapshot_path} нет отчета {name}")
+        if saved[name] != report.signature():
+            raise ValueError(
+                f"Отчет {name} в снимке {snapshot_path} собран с другими настройками"
+            )
+        stats[name] = report.from_bytes(blocks[names.index(name)])
+    if isinstance(aggregator, ReportSet):
+        return stats
+    return stats[report_type]
+
+
+def save_snapshot(
+    snapshot_path: str, report_type: str, aggregator: Aggregator, stats
+) -> None:
+    """
+    Атомарно записывает хранилища отчетов в двоичный снимок для --merge.
+
+    Снимок: JSON с настройками агрегации каждого отчета и to_bytes хранилищ в
+    том же порядке.
+    """
+    write_snapshot(
+        snapshot_path,
+        {"reports": report_signatures(report_type, aggregator)},
+        stats_blocks(report_type, aggregator, stats),
+    )
+
+
+def load_snapshot(snapshot_path: str, report_type: str, aggregator: Aggregator):
+    """Загружает из снимка save_snapshot хранилища отчетов report_type."""
+    meta, blocks = read_snapshot(snapshot_path)
+    return stats_from_blocks(
+        snapshot_path, meta["reports"], blocks, report_type, aggregator
+    )
+
+
+def merge_snapshots(
+    snapshot_paths: list[str],
+    report_type: str,
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+):
+    """Складывает хранилища из снимков save_snapshot без разбора логов."""
+    aggregator = aggregator or default_aggregator(report_type)
+    totals = aggregator.new_counter()
+    for snapshot_path in snapshot_paths:
+        if metrics is None:
+            totals.merge(load_snapshot(snapshot_path, report_type, aggregator))
+            continue
+        with metrics.timer(snapshot_path, "read"):
+            stats = load_snapshot(snapshot_path, report_type, aggregator)
+        with metrics.timer(snapshot_path, "merge"):
+            totals.merge(stats)
+    return totals
+
+
+def read_head_crc(file_path: str, size: int) -> int:
+    """Контрольная сумма первых size байт файла."""
+    with open(file_path, "rb") as file:
+        return zlib.crc32(file.read(size))
+
+
+def find_complete_end(file_path: str, size: int) -> int:
+    """Возвращает смещение сразу после последнего перевода строки в файле."""
+    with open(file_path, "rb") as file:
+        position = size
+        while position > 0:
+            step = min(HEAD_SIZE * 64, position)
+            position -= step
+            file.seek(position)
+            newline = file.read(step).rfind(b"\n")
+            if newline != -1:
+                return position + newline + 1
+    return 0
+
+
+def plan_file_update(file_path: str, entry: dict | None) -> tuple[dict, int, int]:
+    """
+    Сверяет файл с записью состояния и определяет, что нужно дочитать.
+
+    Запись сбрасывается, если изменился inode, файл стал короче прочитанного
+    или изменилось его начало (ротация copytruncate). Сжатый файл дочитать
+    нельзя, поэтому при любом изменении он разбирается заново целиком.
+
+    :return (новая запись без счетчиков, начало, конец полных строк или None
+        для сжатого файла, читаемого целиком)
+    """
+    stat = os.stat(file_path)
+    signature = {"inode": stat.st_ino, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    compressed = detect_compression(file_path) is not None
+    if entry is not None:
+        if (
+            entry["inode"] == stat.st_ino
+            and entry["offset"] <= stat.st_size
+            and read_head_crc(file_path, entry["head_size"]) == entry["head"]
+        ):
+            if (entry["size"], entry["mtime"]) == (stat.st_size, stat.st_mtime_ns):
+                return {**entry, **signature}, entry["offset"], entry["offset"]
+            if not compressed:
+                end = find_complete_end(file_path, stat.st_size)
+                return (
+                    {**entry, **signature},
+                    entry["offset"],
+                    max(end, entry["offset"]),
+                )
+        logger.info("Файл %s ротирован или усечен, полный разбор", file_path)
+
+    end = None if compressed else find_complete_end(file_path, stat.st_size)
+    head_size = min(HEAD_SIZE, stat.st_size if compressed else end)
+    signature.update(
+        offset=0,
+        head=read_head_crc(file_path, head_size),
+        head_size=head_size,
+        stats={},
+    )
+    return signature, 0, end
+
+
+def collect_statistics_incremental(
+    log_files: list[str],
+    report_type: str,
+    state_path: str,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    io_mode: str = "lines",
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+) -> EndpointCounter:
+    """
+    Собирает статистику, дочитывая только байты, добавленные с прошлого запуска.
+
+    Для каждого файла в состоянии хранятся счетчики полных строк и смещение, до
+    которого он прочитан. Незавершенная последняя строка учитывается в отчете,
+    но не сохраняется и перечитывается при следующем запуске. Счетчики,
+    собранные с другими настройками агрегации, не используются. Файл с ошибкой
+    чтения пропускается, его запись в состоянии остается прежней.
+    """
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    signature = aggregator.signature()
+    cached = load_state(state_path)
+    files, planned, ranges = {}, [], []
+    for log_file in log_files:
+        key = os.path.abspath(log_file)
+        entry = cached.get(key)
+        if entry is not None and entry.get("aggregation") != signature:
+            logger.info(
+                "Настройки агрегации для %s изменились, полный разбор", log_file
+            )
+            entry = None
+        try:
+            entry, start, end = plan_file_update(log_file, entry)
+        except Exception as e:
+            skip_file(log_file, describe_error(e))
+            continue
+        entry["aggregation"] = signature
+        files[key] = entry
+        planned.append(log_file)
+        ranges.append((log_file, start, end))
+        ranges.append((log_file, entry["size"] if end is None else end, entry["size"]))
+
+    counted = count_ranges(
+        ranges, report_type, workers, chunk_size, io_mode, aggregator, metrics
+    )
+    totals = aggregator.new_counter()
+    read = 0
+    for index, log_file in enumerate(planned):
+        key = os.path.abspath(log_file)
+        if counted[2 * index] is None or counted[2 * index + 1] is None:
+            del files[key]
+            continue
+        read += 1
+        entry = files[key]
+        file_stats = aggregator.new_counter()
+        file_stats.merge(aggregator.from_state(entry["stats"]))
+        file_stats.merge(counted[2 * index])
+        entry["stats"] = file_stats.to_state()
+        entry["offset"] = ranges[2 * index + 1][1]
+        totals.merge(file_stats).merge(counted[2 * index + 1])
+    check_read(log_files, read)
+
+    # Записи файлов, которых больше нет на диске, не переносятся
+    for key, entry in cached.items():
+        if key not in files and os.path.exists(key):
+            files[key] = entry
+    save_state(state_path, files)
+    return totals
+
+
+def file_identity(file_path: str) -> dict:
+    """inode, размер и время изменения файла для сверки с контрольной точкой."""
+    stat = os.stat(file_path)
+    return {"inode": stat.st_ino, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def save_checkpoint(
+    checkpoint_path: str,
+    report_type: str,
+    aggregator: Aggregator,
+    totals,
+    partial,
+    progress: dict,
+) -> None:
+    """
+    Атомарно записывает контрольную точку --checkpoint.
+
+    Формат - снимок save_snapshot: хранилища прочитанных целиком файлов, за ними
+    хранилища прочитанной части текущего файла; в meta - прочитанные файлы и
+    смещение, до которого прочитан текущий.
+    """
+    write_snapshot(
+        checkpoint_path,
+        {"reports": report_signatures(report_type, aggregator), "progress": progress},
+        [
+            *stats_blocks(report_type, aggregator, totals),
+            *stats_blocks(report_type, aggregator, partial),
+        ],
+    )
+
+
+def load_checkpoint(
+    checkpoint_path: str, report_type: str, aggregator: Aggregator
+) -> tuple:
+    """
+    Загружает контрольную точку save_checkpoint.
+
+    :return (хранилища прочитанных файлов, хранилища части текущего файла,
+        {"done": {путь: file_identity}, "current": {"file", "offset", ...} или
+        None})
+    """
+    meta, blocks = read_snapshot(checkpoint_path)
+    if "progress" not in meta:
+        raise ValueError(f"{checkpoint_path} не является контрольной точкой")
+    saved = meta["reports"]
+    totals, partial = (
+        stats_from_blocks(checkpoint_path, saved, part, report_type, aggregator)
+        for part in (blocks[: len(saved)], blocks[len(saved) :])
+    )
+    return totals, partial, meta["progress"]
+
+
+def check_checkpoint(checkpoint_path: str, log_files: list[str], progress: dict):
+    """Файлы контрольной точки должны входить в запуск и не меняться с записи."""
+    keys = {os.path.abspath(log_file) for log_file in log_files}
+    current = progress["current"]
+    saved = dict(progress["done"])
+    if current is not None:
+        saved[current["file"]] = {
+            name: current[name] for name in ("inode", "size", "mtime")
+        }
+    for key, identity in saved.items():
+        if key not in keys:
+            raise ValueError(
+                f"Файл {key} из контрольной точки {checkpoint_path} не указан"
+            )
+        if file_identity(key) != identity:
+            raise ValueError(
+                f"Файл {key} изменился после контрольной точки {checkpoint_path}"
+            )
+
+
+def collect_statistics_checkpointed(
+    log_files: list[str],
+    report_type: str,
+    checkpoint_path: str,
+    resume: bool = False,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    io_mode: str = "lines",
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+    interval: float = CHECKPOINT_INTERVAL,
+) -> EndpointCounter:
+    """
+    Собирает статистику с периодической контрольной точкой (--checkpoint).
+
+    Файлы делятся на диапазоны split_file, при workers > 1 диапазоны
+    обрабатываются в пуле процессов, результаты складываются в порядке файлов.
+    Не чаще раза в interval секунд и в конце разбора хранилища прочитанных
+    файлов, часть текущего файла и смещение в нем записываются в
+    checkpoint_path. С resume прочитанные файлы не читаются, текущий файл
+    дочитывается со смещения; файл, изменившийся после записи, - ошибка.
+    Файл с ошибкой чтения пропускается и при следующем resume читается заново.
+    """
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    totals = aggregator.new_counter()
+    partial = aggregator.new_counter()
+    progress = {"done": {}, "current": None}
+    if resume:
+        try:
+            totals, partial, progress = load_checkpoint(
+                checkpoint_path, report_type, aggregator
+            )
+        except FileNotFoundError:
+            logger.warning(
+                "Контрольная точка %s не найдена, полный разбор", checkpoint_path
+            )
+        else:
+            check_checkpoint(checkpoint_path, log_files, progress)
+    done, current = progress["done"], progress["current"]
+
+    pending, tasks = [], []
+    for log_file in log_files:
+        key = os.path.abspath(log_file)
+        if key in done:
+            continue
+        try:
+            identity = file_identity(log_file)
+            start, end = aggregator.file_range(log_file)
+            if current is not None and current["file"] == key:
+                start = current["offset"]
+            chunks = split_file(log_file, chunk_size, start, end)
+        except Exception as e:
+            skip_file(log_file, describe_error(e))
+            continue
+        pending.append((log_file, key, identity, chunks))
+        tasks.extend(
+            (*chunk, report_type, io_mode, aggregator, metrics is not None)
+            for chunk in chunks
+        )
+
+    def timer(file_path: str, stage: str):
+        return nullcontext() if metrics is None else metrics.timer(file_path, stage)
+
+    last_saved = time.monotonic()
+
+    def checkpoint(file_stats, current: dict | None, force: bool = False) -> None:
+        nonlocal last_saved
+        if not force and time.monotonic() - last_saved < interval:
+            return
+        with timer("", "checkpoint"):
+            save_checkpoint(
+                checkpoint_path,
+                report_type,
+                aggregator,
+                totals,
+                file_stats,
+                {"done": done, "current": current},
+            )
+        last_saved = time.monotonic()
+
+    def merge(results: Iterator[tuple]) -> int:
+        read = len(done)
+        for log_file, key, identity, chunks in pending:
+            file_stats, error = aggregator.new_counter(), None
+            if current is not None and current["file"] == key:
+                file_stats = partial
+            for position, (_, _, chunk_end) in enumerate(chunks, 1):
+                chunk_stats, chunk_metrics, chunk_error = next(results)
+                if metrics is not None:
+                    metrics.merge(chunk_metrics)
+                if error is not None:
+                    continue
+                if chunk_error is not None:
+                    error = chunk_error
+                    continue
+                with timer(log_file, "merge"):
+                    file_stats.merge(chunk_stats)
+                if position < len(chunks):
+                    checkpoint(
+                        file_stats, {"file": key, "offset": chunk_end, **identity}
+                    )
+            if error is not None:
+                skip_file(log_file, error)
+                continue
+            with timer(log_file, "merge"):
+                totals.merge(file_stats)
+            done[key] = identity
+            read += 1
+            checkpoint(aggregator.new_counter(), None)
+        return read
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            read = merge(executor.map(process_chunk, tasks))
+    else:
+        read = merge(map(process_chunk, tasks))
+    check_read(log_files, read)
+    checkpoint(aggregator.new_counter(), None, force=True)
+    return totals
+
+
+def open_database(db_path: str, create: bool = False):
+    """
+    Открывает базу SQLite команды ingest.
+
+    :param create: создать базу и недостающие таблицы, иначе база должна
+        существовать
+    """
+    import sqlite3
+
+    if not create and not os.path.exists(db_path):
+        raise FileNotFoundError(
+            f"База {db_path} не найдена, создайте ее командой ingest"
+        )
+    connection = sqlite3.connect(db_path)
+    try:
+        if create:
+            with connection:
+                connection.executescript(DATABASE_SCHEMA)
+                connection.executemany(
+                    "INSERT OR IGNORE INTO levels VALUES (?, ?)", enumerate(LOG_LEVELS)
+                )
+                connection.execute(
+                    "INSERT OR IGNORE INTO meta VALUES ('version', ?)",
+                    (str(DATABASE_VERSION),),
+                )
+        version = connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+    except sqlite3.DatabaseError as e:
+        connection.close()
+        raise ValueError(f"{db_path} не является базой ingest: {e}") from e
+    if version is None or version[0] != str(DATABASE_VERSION):
+        connection.close()
+        raise ValueError(f"Версия базы {db_path} не поддерживается")
+    return connection
+
+
+class ValueCodes:
+    """
+    Словарь базы ingest: строковое значение -> целый код.
+
+    Коды раздаются подряд в памяти, новые пары записываются в таблицу
+    словаря пачкой в flush, поэтому строка лога не стоит запроса к базе.
+    """
+
+    __slots__ = ("codes", "new", "table")
+
+    def __init__(self, connection, table: str):
+        """Загружает словарь из таблицы table (id, value)."""
+        self.table = table
+        self.codes = {
+            value: code
+            for code, value in connection.execute(f"SELECT id, value FROM {table}")
+        }
+        self.new = []
+
+    def __call__(self, value: str) -> int:
+        """Код значения; новому значению выдается следующий код."""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.codes) + 1
+            self.new.append((code, value))
+        return code
+
+    def flush(self, connection) -> None:
+        """Записывает в таблицу значения, получившие код после прошлого flush."""
+        connection.executemany(
+            f"INSERT INTO {self.table} (id, value) VALUES (?, ?)", self.new
+        )
+        self.new.clear()
+
+
+def stamp_seconds(stamp: str) -> int | None:
+    """Секунды от эпохи для метки строки; пустая или неверная метка - None."""
+    try:
+        return timestamp_seconds(stamp) if stamp else None
+    except ValueError:
+        return None
+
+
+def coded(values: tuple[str, ...], code: Callable[[str], object]) -> Iterator:
+    """Колонка кодов: code вызывается один раз на различное значение колонки."""
+    codes = {value: code(value) for value in set(values)}
+    return map(codes.__getitem__, values)
+
+
+def ingest_rows(
+    lines: list[str], file_id: int, codes: dict[str, ValueCodes]
+) -> tuple[list[tuple], list[tuple]]:
+    """
+    Строки таблиц requests и queries из пачки строк лога.
+
+    Строки других логгеров отбрасываются проверкой подстрокой, оставшиеся
+    разбираются одним findall на таблицу. Найденные группы кодируются по
+    колонкам: значение кодируется один раз на пачку, строки собираются zip.
+    """
+    requests = INGEST_REQUEST_PATTERN.findall(
+        "\n".join([line for line in lines if REQUEST_MARKER in line])
+    )
+    queries = INGEST_QUERY_PATTERN.findall(
+        "\n".join([line for line in lines if DB_MARKER in line])
+    )
+    request_rows, query_rows = [], []
+    if requests:
+        stamps, levels, endpoints, statuses, clients = zip(*requests)
+        request_rows = list(
+            zip(
+                repeat(file_id),
+                coded(stamps, stamp_seconds),
+                coded(levels, LEVEL_INDEX.__getitem__),
+                coded(endpoints, codes["endpoints"]),
+                coded(statuses, lambda status: int(status) if status else None),
+                coded(
+                    clients, lambda client: codes["clients"](client) if client else None
+                ),
+            )
+        )
+    if queries:
+        stamps, durations, statements = zip(*queries)
+        query_rows = list(
+            zip(
+                repeat(file_id),
+                coded(stamps, stamp_seconds),
+                coded(statements, lambda sql: codes["statements"](normalize_sql(sql))),
+                coded(durations, lambda duration: round(float(duration) * 1_000_000)),
+            )
+        )
+    return request_rows, query_rows
+
+
+def ingest_tail(
+    connection, log_file: str, file_id: int, start: int, codes: dict[str, ValueCodes]
+) -> tuple[list[list], Counter]:
+    """
+    Загружает незавершенную последнюю строку файла, начинающуюся с start.
+
+    Строка без перевода строки может быть еще не дописана, поэтому смещение
+    файла остается на start, а rowid ее строк в таблицах запоминаются:
+    следующая загрузка удаляет их и читает строку заново.
+
+    :return ([[таблица, rowid], ...], число загруженных строк по таблицам)
+    """
+    tail, loaded = [], Counter()
+    for lines in iter_parts(log_file, "lines", start):
+        rows = dict(zip(DATABASE_TABLES, ingest_rows(lines, file_id, codes)))
+        for values in codes.values():
+            values.flush(connection)
+        for table, table_rows in rows.items():
+            for row in table_rows:
+                rowid = connection.execute(DATABASE_INSERTS[table], row).lastrowid
+                tail.append([table, rowid])
+            loaded[table] += len(table_rows)
+    return tail, loaded
+
+
+def ingest_logs(db_path: str, log_files: list[str]) -> Counter:
+    """
+    Разбирает файлы лога в базу SQLite db_path (команда ingest).
+
+    Файл читается пачками строк, строки пачки записываются одним executemany
+    на таблицу. Для каждого файла в таблице files хранится запись
+    plan_file_update, поэтому повторная загрузка дочитывает только добавленные
+    полные строки, а ротированный или усеченный файл загружается заново
+    вместо своих старых строк. Последняя строка без перевода строки тоже
+    загружается и перечитывается, когда файл изменится (ingest_tail). Каждый
+    файл загружается в своей транзакции.
+
+    Если загружаемых байт лога больше, чем занимает база, индексы удаляются
+    до загрузки и строятся заново после нее: сортировка один раз дешевле
+    вставки каждой строки в B-деревья индексов.
+
+    :return число загруженных строк {"requests": n, "queries": m}
+    """
+    connection = open_database(db_path, create=True)
+    codes = {
+        table: ValueCodes(connection, table)
+        for table in ("endpoints", "statements", "clients")
+    }
+    known = {
+        path: (file_id, json.loads(state))
+        for file_id, path, state in connection.execute(
+            "SELECT id, path, state FROM files"
+        )
+    }
+    plans = []
+    for log_file in log_files:
+        key = os.path.abspath(log_file)
+        file_id, previous = known.get(key, (None, None))
+        entry, start, end = plan_file_update(log_file, previous)
+        # Незавершенная строка перечитывается, только если файл изменился
+        refresh = (
+            start != end
+            or start == 0
+            or (previous["size"], previous["mtime"]) != (entry["size"], entry["mtime"])
+        )
+        plans.append((log_file, key, file_id, refresh, entry, start, end))
+    pending = sum(
+        (entry["size"] if end is None else end) - start
+        for *_, entry, start, end in plans
+    )
+    loaded = Counter()
+    try:
+        if pending > os.path.getsize(db_path):
+            indexes = connection.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'index' AND sql IS NOT NULL"
+            ).fetchall()
+            for (name,) in indexes:
+                connection.execute(f"DROP INDEX {name}")
+        for log_file, key, file_id, refresh, entry, start, end in plans:
+            with connection:
+                if file_id is None:
+                    file_id = connection.execute(
+                        "INSERT INTO files (path, state) VALUES (?, '{}')", (key,)
+                    ).lastrowid
+                elif start == 0:
+                    for table in DATABASE_TABLES:
+                        connection.execute(
+                            f"DELETE FROM {table} WHERE file = ?", (file_id,)
+                        )
+                elif refresh:
+                    for table, rowid in entry.pop("tail", []):
+                        connection.execute(
+                            f"DELETE FROM {table} WHERE rowid = ?", (rowid,)
+                        )
+                for lines in iter_parts(log_file, "lines", start, end):
+                    requests, queries = ingest_rows(lines, file_id, codes)
+                    for values in codes.values():
+                        values.flush(connection)
+                    connection.executemany(DATABASE_INSERTS["requests"], requests)
+                    connection.executemany(DATABASE_INSERTS["queries"], queries)
+                    loaded["requests"] += len(requests)
+                    loaded["queries"] += len(queries)
+                if refresh and end is not None and end < entry["size"]:
+                    entry["tail"], tail_loaded = ingest_tail(
+                        connection, log_file, file_id, end, codes
+                    )
+                    loaded.update(tail_loaded)
+                entry.pop("stats", None)
+                entry["offset"] = entry["size"] if end is None else end
+                connection.execute(
+                    "UPDATE files SET state = ? WHERE id = ?",
+                    (json.dumps(entry), file_id),
+                )
+            logger.info("Файл %s загружен в %s с байта %d", log_file, db_path, start)
+    finally:
+        connection.executescript(DATABASE_SCHEMA)
+        connection.close()
+    return loaded
+
+
+def where_clause(conditions: list[str]) -> str:
+    """Часть запроса WHERE из условий, соединенных AND."""
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def filter_conditions(
+    connection, request_filter: RequestFilter | None
+) -> tuple[list[str], list]:
+    """
+    Условия по таблице requests для фильтра строк и их параметры.
+
+    Адреса клиентов сверяются с подсетью по словарю clients, коды прошедших
+    адресов кладутся во временную таблицу.
+    """
+    if request_filter is None:
+        return [], []
+    conditions, params = [], []
+    if request_filter.levels is not None:
+        conditions.append(f"level IN ({', '.join('?' * len(request_filter.levels))})")
+        params.extend(LEVEL_INDEX[level] for level in request_filter.levels)
+    if request_filter.prefix:
+        conditions.append(
+            "endpoint IN (SELECT id FROM endpoints WHERE substr(value, 1, ?) = ?)"
+        )
+        params.extend((len(request_filter.prefix), request_filter.prefix))
+    if request_filter.network is not None:
+        connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS selected_clients (id INTEGER PRIMARY KEY)"
+        )
+        connection.execute("DELETE FROM selected_clients")
+        clients = connection.execute("SELECT id, value FROM clients").fetchall()
+        connection.executemany(
+            "INSERT INTO selected_clients VALUES (?)",
+            [(code,) for code, address in clients if request_filter.allows(address)],
+        )
+        conditions.append("client IN (SELECT id FROM selected_clients)")
+    return conditions, params
+
+
+def query_statistics(
+    db_path: str, report_type: str, aggregator: Aggregator | None = None
+):
+    """
+    Строит хранилища отчетов report_type запросами к базе ingest (--db).
+
+    Каждый отчет - агрегирующий запрос по индексу, строки лога не читаются;
+    результат то же хранилище, что дает разбор файлов.
+    """
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    connection = open_database(db_path)
+    try:
+        return aggregator.query(connection)
+    finally:
+        connection.close()
+
+
+class SampleStats:
+    """
+    Оценка отчета handlers по случайной выборке блоков файлов.
+
+    Файлы делятся на блоки по SAMPLE_BLOCK байт, строка относится к блоку, в
+    котором начинается. По прочитанным блокам для каждой ячейки (endpoint,
+    уровень) копятся суммы y, y² и x·y, где y - число запросов в блоке, x -
+    размер блока в байтах. Число запросов оценивается отношением Σy/Σx,
+    умноженным на размер всех блоков, а полуширина доверительного интервала -
+    SAMPLE_Z стандартных ошибок этой оценки с поправкой на конечную
+    совокупность: когда прочитаны все блоки, оценка точна. Сжатые файлы нельзя
+    читать с произвольного места, они читаются целиком в exact.
+    """
+
+    __slots__ = (
+        "blocks",
+        "counts",
+        "cross",
+        "exact",
+        "population",
+        "population_bytes",
+        "sampled_bytes",
+        "sampled_squares",
+        "squares",
+        "totals",
+    )
+
+    def __init__(self, population: int, population_bytes: int):
+        """Создает пустую выборку из population блоков общим размером в байтах."""
+        self.population = population
+        self.population_bytes = population_bytes
+        self.blocks = 0  # прочитано блоков
+        self.sampled_bytes = 0  # Σx
+        self.sampled_squares = 0  # Σx²
+        self.counts = EndpointCounter()  # Σy по ячейкам
+        self.squares = array("d")  # Σy² в порядке ячеек counts.counts
+        self.cross = array("d")  # Σx·y в порядке ячеек counts.counts
+        self.totals = [0, 0, 0]  # Σy, Σy², Σx·y для числа всех запросов
+        self.exact = EndpointCounter()  # файлы, прочитанные целиком
+
+    def add_block(self, counter: EndpointCounter, size: int) -> None:
+        """Добавляет счетчики блока размером size байт."""
+        self.blocks += 1
+        self.sampled_bytes += size
+        self.sampled_squares += size * size
+        self.counts.merge(counter)
+        missing = len(self.counts.counts) - len(self.squares)
+        self.squares.frombytes(bytes(8 * missing))
+        self.cross.frombytes(bytes(8 * missing))
+
+        width, total = EndpointCounter.WIDTH, 0
+        for row, endpoint in enumerate(counter.endpoints):
+            base = self.counts.index[endpoint] * width
+            cells = counter.counts[row * width : (row + 1) * width]
+            for cell, count in enumerate(cells, base):
+                if count:
+                    self.squares[cell] += count * count
+                    self.cross[cell] += size * count
+                    total += count
+        self.totals[0] += total
+        self.totals[1] += total * total
+        self.totals[2] += size * total
+
+    def estimate(self, y: float, y2: float, xy: float) -> tuple[float, float]:
+        """Оценка числа запросов по суммам Σy, Σy², Σx·y и полуширина интервала."""
+        n, population = self.blocks, self.population
+        if not self.sampled_bytes:
+            return 0.0, 0.0
+        ratio = y / self.sampled_bytes
+        value = ratio * self.population_bytes
+        if n >= population:
+            return value, 0.0
+        if n < SAMPLE_MIN_BLOCKS:
+            return value, math.inf
+        spread = (y2 - 2 * ratio * xy + ratio * ratio * self.sampled_squares) / (n - 1)
+        variance = population * population * (1 - n / population) / n * spread
+        return value, SAMPLE_Z * math.sqrt(max(variance, 0.0))
+
+    def cell(self, endpoint: str, column: int) -> tuple[float, float]:
+        """Оценка и полуширина интервала для endpoint и уровня номер column."""
+        value, margin = 0.0, 0.0
+        row = self.counts.index.get(endpoint)
+        if row is not None:
+            cell = row * EndpointCounter.WIDTH + column
+            value, margin = self.estimate(
+                self.counts.counts[cell], self.squares[cell], self.cross[cell]
+            )
+        row = self.exact.index.get(endpoint)
+        if row is not None:
+            value += self.exact.counts[row * EndpointCounter.WIDTH + column]
+        return value, margin
+
+    def total(self) -> tuple[float, float]:
+        """Оценка числа всех запросов и полуширина ее интервала."""
+        value, margin = self.estimate(*self.totals)
+        return value + sum(self.exact.counts), margin
+
+
+def iter_sample(
+    log_files: list[str],
+    aggregator: Aggregator,
+    io_mode: str = "lines",
+    rate: float | None = None,
+    budget: float | None = None,
+    seed: int | None = None,
+    metrics: Metrics | None = None,
+) -> Generator[SampleStats, None, None]:
+    """
+    Читает случайные блоки файлов и после каждого отдает уточненную оценку.
+
+    Блоки читаются в случайном порядке (seed делает его воспроизводимым), пока
+    не прочитана доля rate блоков или не истекли budget секунд, но не меньше
+    SAMPLE_MIN_BLOCKS. Начало случайного порядка - тоже случайная выборка,
+    поэтому каждая оценка, начиная с SAMPLE_MIN_BLOCKS блоков, корректна, а ее
+    интервал сужается. Сжатые файлы читаются целиком до первой оценки и входят
+    в бюджет.
+    """
+    import random
+
+    deadline = None if budget is None else time.monotonic() + budget
+    blocks, whole = [], []
+    for log_file in log_files:
+        for block in split_file(log_file, SAMPLE_BLOCK):
+            (whole if block[2] is None else blocks).append(block)
+    random.Random(seed).shuffle(blocks)
+    stats = SampleStats(len(blocks), sum(end - start for _, start, end in blocks))
+    if rate is not None:
+        blocks = blocks[: max(math.ceil(rate * len(blocks)), SAMPLE_MIN_BLOCKS)]
+
+    for file_path, _, _ in whole:
+        stats.exact.merge(
+            process_file(file_path, "handlers", io_mode, aggregator, metrics)
+        )
+    if not blocks:
+        yield stats
+    for file_path, start, end in blocks:
+        if (
+            deadline is not None
+            and stats.blocks >= SAMPLE_MIN_BLOCKS
+            and time.monotonic() >= deadline
+        ):
+            break
+        counter = process_file(
+            file_path, "handlers", io_mode, aggregator, metrics, start, end
+        )
+        stats.add_block(counter, end - start)
+        if stats.blocks >= min(SAMPLE_MIN_BLOCKS, stats.population):
+            yield stats
+
+
+def collect_statistics_sampled(
+    log_files: list[str],
+    report_type: str,
+    io_mode: str = "lines",
+    aggregator: Aggregator | None = None,
+    rate: float | None = None,
+    budget: float | None = None,
+    seed: int | None = None,
+    metrics: Metrics | None = None,
+) -> SampleStats:
+    """
+    Оценка отчета handlers по случайным блокам файлов (--sample, --budget).
+
+    Возвращает последнюю оценку iter_sample; без rate и budget читаются все
+    блоки и оценка совпадает с точным подсчетом.
+    """
+    if report_type != "handlers":
+        raise ValueError("Выборка поддерживается только для отчета handlers")
+    aggregator = aggregator or default_aggregator(report_type)
+    if aggregator.top is not None:
+        raise ValueError("Выборка несовместима с ограничением top-K")
+    estimates = iter_sample(log_files, aggregator, io_mode, rate, budget, seed, metrics)
+    stats = deque(estimates, maxlen=1)[0]
+    logger.info("Выборка: прочитано %d из %d блоков", stats.blocks, stats.population)
+    return stats
+
+
+def collect_statistics(
+    log_files: list[str],
+    report_type: str,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    io_mode: str = "lines",
+    state_path: str | None = None,
+    aggregator: Aggregator | None = None,
+    metrics: Metrics | None = None,
+    concurrency: int = 1,
+    sample: float | None = None,
+    budget: float | None = None,
+    seed: int | None = None,
+    checkpoint_path: str | None = None,
+    resume: bool = False,
+    checkpoint_interval: float = CHECKPOINT_INTERVAL,
+) -> EndpointCounter:
+    """
+    Собирает статистику из лог-файлов.
+
+    При workers > 1 файлы и их части обрабатываются в пуле процессов.
+    io_mode="mmap" читает файлы через mmap без построчного декодирования.
+    С state_path повторные запуски дочитывают только новые байты файлов.
+    aggregator задает нормализацию endpoint и ограничение top-K, в metrics
+    копятся таймеры и счетчики этапов. При concurrency > 1 до concurrency
+    файлов читаются одновременно в потоках (множество небольших файлов на
+    медленном хранилище). С sample (доля блоков) или budget (секунды) отчет
+    handlers оценивается по случайным блокам файлов и возвращается SampleStats
+    с доверительными интервалами. С checkpoint_path частичная статистика и
+    позиции в файлах периодически сохраняются, а resume продолжает разбор с
+    сохраненной контрольной точки. Файл с ошибкой чтения или распаковки
+    пропускается с ошибкой в логе, остальные файлы учитываются.
+
+    :return (EndpointCounter) {endpoint: {INFO: 1, DEBUG: 1,...}, ...}
+    """
+    aggregator = aggregator or default_aggregator(report_type)
+    if sample is not None or budget is not None:
+        return collect_statistics_sampled(
+            log_files, report_type, io_mode, aggregator, sample, budget, seed, metrics
+        )
+    if state_path is not None:
+        return collect_statistics_incremental(
+            log_files,
+            report_type,
+            state_path,
+            workers,
+            chunk_size,
+            io_mode,
+            aggregator,
+            metrics,
+        )
+    if checkpoint_path is not None:
+        return collect_statistics_checkpointed(
+            log_files,
+            report_type,
+            checkpoint_path,
+            resume,
+            workers,
+            chunk_size,
+            io_mode,
+            aggregator,
+            metrics,
+            checkpoint_interval,
+        )
+    if concurrency > 1:
+        return collect_statistics_async(
+            log_files, report_type, concurrency, aggregator, metrics, io_mode
+        )
+    if workers > 1:
+        return collect_statistics_parallel(
+            log_files, report_type, workers, chunk_size, io_mode, aggregator, metrics
+        )
+
+    collect_stats = aggregator.new_counter()
+    read = 0
+    for log_file in log_files:
+        try:
+            file_stats = process_file(
+                log_file,
+                report_type,
+                io_mode,
+                aggregator,
+                metrics,
+                *aggregator.file_range(log_file),
+            )
+        except Exception as e:
+            skip_file(log_file, describe_error(e))
+            continue
+        read += 1
+        if metrics is None:
+            collect_stats.merge(file_stats)
+            continue
+        with metrics.timer(log_file, "merge"):
+            collect_stats.merge(file_stats)
+    check_read(log_files, read)
+
+    return collect_stats
+
+
+class ReportTable:
+    """
+    Табличный отчет для вывода в форматах WRITERS.
+
+    data(ordered=True) - функция, при каждом вызове заново отдающая ленивые
+    итераторы по столбцам таблицы; с ordered=False строки столбцов могут идти
+    в любом (но общем) порядке, этого достаточно для ширины и сумм. Ширина,
+    суммы и вывод считаются по столбцам встроенными max, sum, zip и map без
+    цикла Python на каждую строку, а отформатированный отчет целиком в памяти
+    не хранится. Столбцы sum_columns
+    суммируются в итоговую строку (если totals_row) и в число для заголовка
+    title. formats - %-спецификации для столбцов с дробными числами.
+    """
+
+    __slots__ = ("columns", "data", "formats", "sum_columns", "title", "totals_row")
+
+    def __init__(
+        self,
+        columns: list[str],
+        data,
+        title: str,
+        sum_columns: Iterable[str] = (),
+        totals_row: bool = True,
+        formats: dict[str, str] | None = None,
+    ):
+        """Запоминает описание таблицы."""
+        self.columns = columns
+        self.data = data
+        self.title = title
+        self.sum_columns = [columns.index(column) for column in sum_columns]
+        self.totals_row = totals_row
+        self.formats = [(formats or {}).get(column, "%s") for column in columns]
+
+    def rows(self) -> Iterable[tuple]:
+        """Строки таблицы кортежами."""
+        return zip(*self.data())
+
+    def measure(self) -> tuple[list[int], list[int]]:
+        """Ширина столбцов и суммы столбцов sum_columns."""
+        widths = [len(column) for column in self.columns]
+        sums = [0] * len(self.columns)
+        first = next(iter(self.rows()), None)
+        if first is None:
+            return widths, sums
+        for i, value in enumerate(first):
+            column = self.data(False)[i]
+            if isinstance(value, str):
+                widths[i] = max(widths[i], max(map(len, column)))
+                continue
+            widths[i] = max(widths[i], len(self.formats[i] % max(column)))
+            if i in self.sum_columns:
+                sums[i] = sum(self.data(False)[i])
+                widths[i] = max(widths[i], len(str(sums[i])))
+        return widths, sums
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s %(levelname)s %(filename)s:%(lineno)d - %(message)s",
-)
-logger = logging.getLogger(__name__)
+    def layout(self) -> tuple[str, str, str, str | None]:
+        """
+        Заголовок, шапка, шаблон строки и итоговая строка формата table.
 
-LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
-PADDING_COL = 4
+        Ячейка дополняется пробелами до ширины столбца плюс PADDING_COL.
+        """
+        widths, sums = self.measure()
+        title = self.title.format(total=sum(sums)) + "\n"
+        plain = "".join(f"%-{width + PADDING_COL}s" for width in widths)
+        template = "".join(
+            f"%-{width + PADDING_COL}{spec[1:]}"
+            for width, spec in zip(widths, self.formats)
+        )
+        totals = None
+        if self.totals_row:
+            cells = [
+                sums[i] if i in self.sum_columns else " " for i in range(len(widths))
+            ]
+            totals = plain % tuple(cells)
+        return title, plain % tuple(self.columns), template, totals
 
 
-def read_file(file_path: str) -> Generator[str, None, None]:
-    """Генератор для построчного чтения файлов с обработкой ошибок."""
-    with open(file_path, encoding="utf-8", errors="replace") as file:
-        logger.debug(f"Начато чтение файла: {file_path}")
-        yield from file
-        logger.debug(f"Файл полностью прочитан: {file_path}")
+def render_sections(
+    sections: list[tuple[str | None, ReportTable]],
+) -> Generator[Iterable[str], None, None]:
+    """
+    Отчеты в формате table: итераторы строк, именованные - под заголовком [имя].
 
+    Строки данных форматируются шаблоном через map, без кадра Python на строку.
+    """
+    for index, (name, table) in enumerate(sections):
+        title, header, template, totals = table.layout()
+        lines = [""] if index else []
+        if name is not None:
+            lines.append(f"[{name}]")
+        yield [*lines, title, header]
+        yield map(template.__mod__, table.rows())
+        if totals is not None:
+            yield [totals]
 
-def parse_log_line(line: str, match_groups: tuple) -> dict | None:
-    """Парсит строку лога и возвращает совпадение."""
-    log_pattern = re.compile(
-        rf"(?P<log_level>{'|'.join(LOG_LEVELS)})"
-        r".*?django\.request:"
-        r"\s(?:GET|POST|PUT|DELETE|PATCH|Internal\sServer\sError:)\s"
-        r"(?P<endpoint>/[^\s]+)"
+
+def render_table(table: ReportTable) -> list[str]:
+    """Строки одного отчета в формате table."""
+    return list(chain.from_iterable(render_sections([(None, table)])))
+
+
+def write_lines(lines: Iterable[str], out) -> None:
+    """Пишет строки в out пачками RENDER_CHUNK, каждую с переводом строки."""
+    for chunk in read_batches(lines, RENDER_CHUNK):
+        out.write("\n".join(chunk))
+        out.write("\n")
+
+
+def json_rows(table: ReportTable, extra: dict | None = None) -> Iterable[str]:
+    """
+    Строки таблицы как JSON-объекты с ключами - именами столбцов.
+
+    Объект собирается %-шаблоном, строковые значения экранируются
+    encode_basestring модуля json.
+    """
+    first = next(iter(table.rows()), None)
+    if first is None:
+        return iter(())
+    prefix = "".join(
+        f"{json.dumps(k)}: {json.dumps(v)}, " for k, v in (extra or {}).items()
     )
-    if match := log_pattern.search(line):
-        return {group: match.group(group) for group in match_groups}
+    fields, columns = [], []
+    for i, (name, value) in enumerate(zip(table.columns, first)):
+        column = table.data()[i]
+        if isinstance(value, str):
+            fields.append(f'"{name.lower()}": %s')
+            columns.append(map(encode_basestring, column))
+        else:
+            fields.append(f'"{name.lower()}": {table.formats[i]}')
+            columns.append(column)
+    return map(f"{{{prefix}{', '.join(fields)}}}".__mod__, zip(*columns))
+
+
+def write_table(sections: list[tuple[str | None, ReportTable]], out) -> None:
+    """Формат table: выровненные столбцы, как в консольном отчете."""
+    write_lines(chain.from_iterable(render_sections(sections)), out)
+
+
+def write_csv(sections: list[tuple[str | None, ReportTable]], out) -> None:
+    """Формат csv: шапка и строки без итогов; несколько отчетов - под [имя]."""
+    import csv
+
+    writer = csv.writer(out, lineterminator="\n")
+    for index, (name, table) in enumerate(sections):
+        if index:
+            out.write("\n")
+        if name is not None:
+            out.write(f"[{name}]\n")
+        writer.writerow(table.columns)
+        columns = [
+            column if spec == "%s" else map(spec.__mod__, column)
+            for column, spec in zip(table.data(), table.formats)
+        ]
+        for chunk in read_batches(zip(*columns), RENDER_CHUNK):
+            writer.writerows(chunk)
+
+
+def write_json(sections: list[tuple[str | None, ReportTable]], out) -> None:
+    """Формат json: массив строк или объект {имя отчета: массив строк}."""
+    named = sections[0][0] is not None
+    if named:
+        out.write("{")
+    for index, (name, table) in enumerate(sections):
+        if named:
+            out.write(f"{', ' if index else ''}{json.dumps(name)}: ")
+        out.write("[")
+        for number, chunk in enumerate(read_batches(json_rows(table), RENDER_CHUNK)):
+            out.write((",\n" if number else "\n") + ",\n".join(chunk))
+        out.write("\n]")
+    out.write("}\n" if named else "\n")
+
+
+def write_ndjson(sections: list[tuple[str | None, ReportTable]], out) -> None:
+    """Формат ndjson: объект строки на строку, с ключом report при нескольких."""
+    for name, table in sections:
+        extra = None if name is None else {"report": name}
+        write_lines(json_rows(table, extra), out)
+
+
+WRITERS = {
+    "table": write_table,
+    "csv": write_csv,
+    "json": write_json,
+    "ndjson": write_ndjson,
+}
 
 
-def process_file(file_path: str, report_type: str) -> dict[str, dict[str, int]]:
+def itemgetter_default(key: str):
+    """Функция mapping -> mapping.get(key, 0)."""
+    return lambda mapping: mapping.get(key, 0)
+
+
+def requests_table(stats: Mapping[str, Mapping[str, int]]) -> ReportTable:
     """
-    Обрабатывает один файл.
+    Таблица отчета handlers: endpoint по алфавиту, итоги по уровням.
 
-    :return (dict) {endpoint: {INFO: 1, DEBUG: 1,...}, ...}
+    Для EndpointCounter столбцы уровней берутся срезами массива счетчиков и
+    переставляются в порядок endpoint через map, для SampleStats строится
+    таблица оценок sample_table.
     """
-    file_stats = defaultdict(lambda: defaultdict(int))
+    if isinstance(stats, SampleStats):
+        return sample_table(stats)
+    if isinstance(stats, EndpointCounter):
+        endpoints, width = stats.endpoints, stats.WIDTH
+        order = sorted(range(len(endpoints)), key=endpoints.__getitem__)
+        levels = [stats.counts[i::width] for i in range(width)]
+
+        def data(ordered: bool = True) -> list[Iterable]:
+            if not ordered:
+                return [iter(endpoints), *map(iter, levels)]
+            return [
+                map(endpoints.__getitem__, order),
+                *(map(column.__getitem__, order) for column in levels),
+            ]
 
-    if report_type == "handlers":
-        match_group = ("endpoint", "log_level")
     else:
-        logger.critical(f"Тип отчета '{report_type}' не реализован")
-        sys.exit(1)
+        handlers = sorted(stats)
+        rows = [stats[handler] for handler in handlers]
 
-    for line in read_file(file_path):
-        if parsed := parse_log_line(line, match_group):
-            file_stats[parsed["endpoint"]][parsed["log_level"]] += 1
+        def data(ordered: bool = True) -> list[Iterable]:
+            return [
+                iter(handlers),
+                *(map(itemgetter_default(level), rows) for level in LOG_LEVELS),
+            ]
 
-    return file_stats
+    return ReportTable(
+        ["HANDLER", *LOG_LEVELS], data, "Total requests: {total}", LOG_LEVELS
+    )
 
 
-def collect_statistics(
-    log_files: list[str], report_type: str
-) -> dict[str, dict[str, int]]:
+def sample_table(stats: SampleStats) -> ReportTable:
     """
-    Собирает статистику из лог-файлов.
+    Таблица оценки отчета handlers по выборке блоков.
 
-    :return (dict) {endpoint: {INFO: 1, DEBUG: 1,...}, ...}
+    Рядом со столбцом каждого уровня - столбец <уровень>_CI с полушириной 95%
+    доверительного интервала; в заголовке - оценка числа всех запросов, ее
+    интервал и доля прочитанных блоков.
     """
-    collect_stats = defaultdict(lambda: defaultdict(int))
-    for log_file in log_files:
-        file_stats = process_file(log_file, report_type)
-        for endpoint, values in file_stats.items():
-            for value, count in values.items():
-                collect_stats[endpoint][value] += count
+    handlers = sorted(set(stats.counts.endpoints) | set(stats.exact.endpoints))
+    columns = [handlers]
+    for level in range(len(LOG_LEVELS)):
+        cells = [stats.cell(handler, level) for handler in handlers]
+        columns.append([round(value) for value, _ in cells])
+        columns.append([math.ceil(margin) for _, margin in cells])
+    share = stats.blocks / stats.population if stats.population else 1.0
+    _, margin = stats.total()
+    return ReportTable(
+        [
+            "HANDLER",
+            *chain.from_iterable((level, f"{level}_CI") for level in LOG_LEVELS),
+        ],
+        lambda ordered=True: [iter(column) for column in columns],
+        f"Total requests: ~{{total}} ±{math.ceil(margin)} (95% CI, "
+        f"{stats.blocks} of {stats.population} blocks, {share:.1%})",
+        LOG_LEVELS,
+    )
 
-    return collect_stats
+
+def queries_table(stats: dict[str, QuantileSketch]) -> ReportTable:
+    """
+    Таблица отчета db: формы запросов по убыванию суммарного времени.
+
+    Перцентили - оценки скетча с относительной погрешностью SKETCH_ALPHA.
+    """
+    percentiles = [f"P{round(q * 100)}" for q in DB_PERCENTILES]
+    columns = ["QUERY", "COUNT", "TOTAL", *percentiles]
+    rows = [
+        (
+            shape,
+            sketch.count,
+            sketch.sum,
+            *(sketch.quantile(q) for q in DB_PERCENTILES),
+        )
+        for shape, sketch in sorted(stats.items(), key=lambda item: -item[1].sum)
+    ]
+    values = list(zip(*rows)) or [()] * len(columns)
+    return ReportTable(
+        columns,
+        lambda ordered=True: [iter(column) for column in values],
+        "Total queries: {total}",
+        ["COUNT"],
+        totals_row=False,
+        formats={"TOTAL": "%.2f", **dict.fromkeys(percentiles, "%.3f")},
+    )
+
+
+def errors_table(stats: ErrorStats, limit: int = ERRORS_PER_ENDPOINT) -> ReportTable:
+    """
+    Таблица отчета errors: по limit самых частых сигнатур каждого endpoint.
+
+    В заголовке - число всех ошибок, включая сигнатуры за пределами limit.
+    """
+    by_endpoint = defaultdict(list)
+    for (endpoint, cluster), count in stats.counts.items():
+        by_endpoint[endpoint].append((-count, stats.signature(cluster)))
+    rows = [
+        (endpoint, -count, signature)
+        for endpoint in sorted(by_endpoint)
+        for count, signature in sorted(by_endpoint[endpoint])[:limit]
+    ]
+    columns = ["HANDLER", "COUNT", "SIGNATURE"]
+    values = list(zip(*rows)) or [()] * len(columns)
+    return ReportTable(
+        columns,
+        lambda ordered=True: [iter(column) for column in values],
+        f"Total errors: {sum(stats.counts.values())}",
+        totals_row=False,
+    )
+
+
+def http_table(stats: HttpStats) -> ReportTable:
+    """
+    Таблица кодов ответа отчета http: endpoint и метод по алфавиту.
+
+    ERROR_RATE - доля ответов 4XX и 5XX среди ответов endpoint с этим методом.
+    """
+    rows = [
+        (endpoint, method, *counts, sum(counts[3:]) / sum(counts))
+        for (endpoint, method), counts in sorted(stats.statuses.items())
+    ]
+    columns = ["HANDLER", "METHOD", *STATUS_CLASSES, "ERROR_RATE"]
+    values = list(zip(*rows)) or [()] * len(columns)
+    return ReportTable(
+        columns,
+        lambda ordered=True: [iter(column) for column in values],
+        "Total requests: {total}",
+        STATUS_CLASSES,
+        formats={"ERROR_RATE": "%.3f"},
+    )
+
+
+def clients_table(
+    stats: HttpStats, limit: int = HTTP_CLIENTS_PER_ENDPOINT
+) -> ReportTable:
+    """
+    Таблица адресов отчета http: по limit самых частых клиентов endpoint.
+
+    Число запросов клиента - оценка сводки, меньшая точного значения не
+    больше чем на ERROR столбца; ERROR_RATE - доля ответов 4XX и 5XX endpoint.
+    """
+    totals = stats.endpoint_totals()
+    rows = [
+        (
+            endpoint,
+            sum(counts),
+            sum(counts[3:]) / sum(counts),
+            stats.dropped[endpoint],
+            ", ".join(
+                f"{address} ({count})"
+                for address, count in stats.top_clients(endpoint, limit)
+            ),
+        )
+        for endpoint, counts in sorted(totals.items())
+    ]
+    columns = ["HANDLER", "REQUESTS", "ERROR_RATE", "ERROR", "TOP_CLIENTS"]
+    values = list(zip(*rows)) or [()] * len(columns)
+    return ReportTable(
+        columns,
+        lambda ordered=True: [iter(column) for column in values],
+        f"Top {limit} clients per endpoint",
+        totals_row=False,
+        formats={"ERROR_RATE": "%.3f"},
+    )
+
+
+def timeline_table(stats: TimelineStats) -> ReportTable:
+    """
+    Таблица отчета timeline.
+
+    Строки упорядочены по началу корзины, внутри корзины - по endpoint;
+    последняя строка - итоги по уровням.
+    """
+    buckets = [
+        (format_bucket(bucket), len(stats[bucket]), requests_table(stats[bucket]).data)
+        for bucket in sorted(stats)
+    ]
+
+    def data(ordered: bool = True) -> list[Iterable]:
+        parts = [bucket_data(ordered) for _, _, bucket_data in buckets]
+        labels = chain.from_iterable(repeat(label, size) for label, size, _ in buckets)
+        return [
+            labels,
+            *(
+                chain.from_iterable([part[i] for part in parts])
+                for i in range(1 + len(LOG_LEVELS))
+            ),
+        ]
+
+    return ReportTable(
+        ["BUCKET", "HANDLER", *LOG_LEVELS], data, "Total requests: {total}", LOG_LEVELS
+    )
 
 
 def create_report(stats: dict[str, dict[str, int]]) -> list[str]:
     """Создание отчета и вывод в консоль."""
-    # Подготовка данных
-    sorted_handlers = sorted(stats.keys())
-    level_counts = defaultdict(int)
-    total = 0
-
-    # Создаем таблицу
-    header = ["HANDLER", *LOG_LEVELS]
-    rows = [header]
-    col_widths = [len(h) for h in header]
-
-    # Заполняем данные
-    for i, handler in enumerate(sorted_handlers):
-        row = [handler]
-        for level in LOG_LEVELS:
-            # обновляем отступы
-            for i, cell in enumerate(row):
-                cell_len = len(str(cell))
-                if cell_len > col_widths[i]:
-                    col_widths[i] = cell_len
-
-            # добавляем строку с handler
-            count = stats[handler].get(level, 0)
-            row.append(count)
-            level_counts[level] += count
-
-            # добавляем в итоговую сумму всех requests
-            total += count
-
-        rows.append(row)
-
-    # Добавляем строку со статистикой по log_level
-    total_by_lvl_row = [" "] + [level_counts[lvl] for lvl in LOG_LEVELS]
-    rows.append(total_by_lvl_row)
-
-    # Форматирование отчета с отступами
-    formatted_rows = [
-        "".join(
-            f"{cell:<{width + PADDING_COL}}" for cell, width in zip(row, col_widths)
-        )
-        for row in rows
-    ]
+    return render_table(requests_table(stats))
+
+
+def create_db_report(stats: dict[str, QuantileSketch]) -> list[str]:
+    """Создание отчета по длительности SQL-запросов."""
+    return render_table(queries_table(stats))
+
+
+def create_timeline_report(stats: TimelineStats) -> list[str]:
+    """Создание отчета по корзинам времени."""
+    return render_table(timeline_table(stats))
+
+
+class LogFollower:
+    """
+    Дочитывает файлы по мере записи, как tail -F.
+
+    Файл читается с начала, затем отдаются только дописанные полные строки.
+    Ротация определяется по смене inode (файл дочитывается и открывается
+    заново), усечение - по размеру меньше прочитанного (чтение с начала).
+    """
+
+    def __init__(self, paths: list[str]):
+        """Запоминает пути, файлы открываются при первом опросе."""
+        self.paths = list(paths)
+        self.files = {}
+
+    def poll(self) -> Generator[bytes, None, None]:
+        """Отдает блоки полных строк, дописанных с прошлого опроса."""
+        for path in self.paths:
+            yield from self._poll_file(path)
+
+    def close(self) -> None:
+        """Закрывает открытые файлы."""
+        for handle, _, _ in self.files.values():
+            handle.close()
+        self.files.clear()
+
+    def __enter__(self) -> "LogFollower":
+        """Возвращает себя; файлы закрываются при выходе из блока with."""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Закрывает открытые файлы, в том числе после ошибки опроса."""
+        self.close()
 
-    return [f"Total requests: {total}\n", *formatted_rows]
+    def _poll_file(self, path: str) -> Generator[bytes, None, None]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
 
+        if path in self.files:
+            handle, inode, _ = self.files[path]
+            if stat is not None and stat.st_ino != inode:
+                logger.info("Файл %s ротирован, чтение нового файла", path)
+                yield from self._read(path, final=True)
+                handle.close()
+                del self.files[path]
+            elif stat is not None and stat.st_size < handle.tell():
+                logger.info("Файл %s усечен, чтение с начала", path)
+                handle.seek(0)
+                self.files[path] = [handle, inode, b""]
 
-class ValidateLogFilesAction(argparse.Action):
-    """Кастомное действие при валидации пути к файлам лога."""
+        if path not in self.files:
+            if stat is None:
+                return
+            if detect_compression(path):
+                logger.error(
+                    "Сжатый файл не может читаться в режиме --follow: %s", path
+                )
+                self.paths.remove(path)
+                return
+            with ExitStack() as stack:
+                handle = stack.enter_context(open(path, "rb"))
+                self.files[path] = [handle, os.fstat(handle.fileno()).st_ino, b""]
+                # Дальше файлом владеет follower: он закрывается в close()
+                stack.pop_all()
+        yield from self._read(path)
 
-    def __call__(self, parser, namespace, values, option_string=None):
-        """Вызывается, при запуске анализатора аргументов."""
-        valid_files = []
-        for file_path in values:
+    def _read(self, path: str, final: bool = False) -> Generator[bytes, None, None]:
+        state = self.files[path]
+        handle, _, pending = state
+        while block := handle.read(READ_BLOCK):
+            block = pending + block
+            cut = block.rfind(b"\n") + 1
+            pending = block[cut:]
+            if cut:
+                yield block[:cut]
+        state[2] = pending
+        if final and pending:
+            yield pending
+
+
+class PollingWatcher:
+    """Ожидание изменений файлов периодическим опросом."""
+
+    def __init__(self, interval: float):
+        """Задает наибольший интервал сна между опросами."""
+        self.interval = interval
+
+    def wait(self, timeout: float | None) -> None:
+        """Спит до следующего опроса."""
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+
+    def close(self) -> None:
+        """Освобождать нечего."""
+
+
+class InotifyWatcher:
+    """Ожидание изменений файлов через inotify (Linux), без опроса в простое."""
+
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    WATCH_MASK = 0x002 | 0x008 | 0x080 | 0x100 | 0x200
+
+    def __init__(self, paths: list[str]):
+        """Подписывается на события каталогов файлов, чтобы видеть ротацию."""
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+            if (
+                libc.inotify_add_watch(self.fd, os.fsencode(directory), self.WATCH_MASK)
+                < 0
+            ):
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {directory}")
+
+    def wait(self, timeout: float | None) -> None:
+        """Блокируется до события файловой системы или истечения timeout."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
             try:
-                with open(file_path):
+                while os.read(self.fd, 64 * 1024):
                     pass
-            except FileNotFoundError:
-                logger.error(f"Файл не найден: {file_path}")
-            except PermissionError:
-                logger.error(f"Ошибка доступа к файлу: {file_path}")
-            except Exception as e:
-                logger.error(f"Ошибка при чтении файла {file_path}: {str(e)}")
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        """Закрывает дескриптор inotify."""
+        os.close(self.fd)
+
+
+def create_watcher(paths: list[str], interval: float):
+    """Возвращает InotifyWatcher, а где inotify недоступен - PollingWatcher."""
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError) as e:
+        logger.debug("inotify недоступен (%s), используется опрос", e)
+        return PollingWatcher(interval)
+
+
+class LiveScreen:
+    """Перерисовывает отчет в терминале, обновляя только изменившиеся строки."""
+
+    def __init__(self, out):
+        """Принимает поток вывода терминала."""
+        self.out = out
+        self.lines = []
+
+    def draw(self, report: list[str]) -> None:
+        """Выводит отчет; при том же числе строк переписывает только измененные."""
+        lines = "\n".join(report).split("\n")
+        if len(lines) != len(self.lines):
+            parts = ["\x1b[H\x1b[2J", "\n".join(lines)]
+        else:
+            parts = [
+                f"\x1b[{row};1H{line}\x1b[K"
+                for row, (line, old) in enumerate(zip(lines, self.lines), 1)
+                if line != old
+            ]
+            if not parts:
+                return
+        parts.append(f"\x1b[{len(lines) + 1};1H")
+        self.out.write("".join(parts))
+        self.out.flush()
+        self.lines = lines
+
+
+def follow_statistics(
+    log_files: list[str],
+    report_type: str,
+    refresh: float = FOLLOW_REFRESH,
+    out=None,
+    stop=None,
+    aggregator: Aggregator | None = None,
+) -> EndpointCounter:
+    """
+    Следит за файлами и перерисовывает отчет не чаще раза в refresh секунд.
+
+    Новые строки считаются в те же счетчики, что заполняет process_file. В
+    простое процесс ждет события inotify (или спит при опросе), а отчет не
+    перерисовывается, пока счетчики не изменились.
+
+    :param stop: функция без аргументов; цикл завершается, когда она вернет True
+    :return (EndpointCounter) итоговая статистика после остановки
+    """
+    check_report_type(report_type)
+    aggregator = aggregator or default_aggregator(report_type)
+    stats = aggregator.new_counter()
+    watcher = create_watcher(log_files, refresh)
+    screen = LiveScreen(out or sys.stdout)
+    dirty, next_draw = True, 0.0
+    try:
+        with LogFollower(log_files) as follower:
+            while stop is None or not stop():
+                for block in follower.poll():
+                    aggregator.feed(stats, aggregator.count_part(split_lines(block)))
+                    dirty = True
+                now = time.monotonic()
+                if dirty and now >= next_draw:
+                    screen.draw(aggregator.report(stats))
+                    dirty, next_draw = False, now + refresh
+                watcher.wait(max(next_draw - now, 0) if dirty else FOLLOW_IDLE_CHECK)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return stats
+
+
+def validate_log_files(
+    parser: argparse.ArgumentParser, log_files: list[str]
+) -> list[str]:
+    """
+    Валидация путей к файлам лога.
+
+    С --concurrency не вызывается: файлы проверяются при первом чтении, чтобы
+    не открывать каждый дважды.
+    """
+    valid_files = []
+    for file_path in log_files:
+        if file_path == STDIN_PATH:
+            valid_files.append(file_path)
+            continue
+        try:
+            with open(file_path):
+                pass
+        except FileNotFoundError:
+            logger.error("Файл не найден: %s", file_path)
+        except PermissionError:
+            logger.error("Ошибка доступа к файлу: %s", file_path)
+        except Exception as e:
+            logger.error("Ошибка при чтении файла %s: %s", file_path, e)
+        else:
+            file_size = os.path.getsize(file_path)
+            if file_size > 0:
+                valid_files.append(file_path)
             else:
-                file_size = os.path.getsize(file_path)
-                if file_size > 0:
-                    valid_files.append(file_path)
-                else:
-                    logger.error(f"Файл пустой: {file_path}")
-        if len(valid_files) == 0:
-            parser.error("Нет файлов для создания отчета")
-        setattr(namespace, self.dest, valid_files)
+                logger.error("Файл пустой: %s", file_path)
+    if len(valid_files) == 0:
+        parser.error("Нет файлов для создания отчета")
+    return valid_files
+
+
+def positive_int(value: str) -> int:
+    """Тип аргумента: целое число больше нуля."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"ожидается целое число > 0: {value}")
+    return number
+
+
+def positive_float(value: str) -> float:
+    """Тип аргумента: число больше нуля."""
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.0
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"ожидается число > 0: {value}")
+    return number
+
+
+def sample_rate(value: str) -> float:
+    """Тип аргумента: доля блоков выборки 0 < RATE <= 1."""
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.0
+    if not 0 < number <= 1:
+        raise argparse.ArgumentTypeError(f"ожидается доля 0 < RATE <= 1: {value}")
+    return number
+
+
+def normalize_rule(value: str) -> tuple[str, str]:
+    """Правило нормализации REGEX=PLACEHOLDER для argparse."""
+    pattern, sep, repl = value.rpartition("=")
+    if not sep or not pattern:
+        raise argparse.ArgumentTypeError(
+            f"ожидается REGEX=PLACEHOLDER, получено {value!r}"
+        )
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(
+            f"некорректное выражение {pattern!r}: {e}"
+        ) from e
+    return pattern, repl
+
+
+def duration(value: str) -> int:
+    """Длительность корзины для argparse: 30s, 1m, 5m, 1h, 1d или секунды."""
+    number, unit = value[:-1], DURATION_UNITS.get(value[-1:])
+    if unit is None:
+        number, unit = value, 1
+    try:
+        seconds = int(number) * unit
+    except ValueError:
+        seconds = 0
+    if seconds < 1:
+        raise argparse.ArgumentTypeError(
+            f"ожидается длительность вида 30s, 1m, 1h, 1d: {value}"
+        )
+    return seconds
+
+
+def timestamp(value: str) -> str:
+    """Метка времени для argparse, приводится к виду «YYYY-MM-DD HH:MM:SS»."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"ожидается время вида YYYY-MM-DD[ HH:MM[:SS]]: {value}"
+        ) from e
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def report_names(value: str) -> list[str]:
+    """Имена отчетов через запятую для argparse."""
+    names = value.split(",")
+    for name in names:
+        if name not in REPORTS:
+            raise argparse.ArgumentTypeError(
+                f"неизвестный отчет {name!r}, доступны: {', '.join(REPORTS)}"
+            )
+    return names
+
+
+def level_names(value: str) -> list[str]:
+    """Уровни логирования через запятую для argparse."""
+    levels = [level.strip().upper() for level in value.split(",")]
+    for level in levels:
+        if level not in LEVEL_INDEX:
+            raise argparse.ArgumentTypeError(
+                f"неизвестный уровень {level!r}, доступны: {', '.join(LOG_LEVELS)}"
+            )
+    return levels
+
+
+def endpoint_prefix(value: str) -> str:
+    """Префикс endpoint для argparse: путь, начинающийся с /."""
+    if not value.startswith("/") or any(char.isspace() for char in value):
+        raise argparse.ArgumentTypeError(
+            f"ожидается путь без пробелов, начинающийся с /: {value!r}"
+        )
+    return value
+
+
+def client_network(value: str):
+    """Адрес или подсеть клиента для argparse: 192.168.1.59, 192.168.1.0/24."""
+    import ipaddress
+
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"ожидается адрес или подсеть вида 192.168.1.0/24: {value}"
+        ) from e
+
+
+def create_filter(args: argparse.Namespace) -> RequestFilter | None:
+    """Создает фильтр строк по аргументам --level, --endpoint-prefix и --client-ip."""
+    if not args.level and not args.endpoint_prefix and not args.client_ip:
+        return None
+    return RequestFilter(args.level, args.endpoint_prefix, args.client_ip)
+
+
+def create_normalizer(args: argparse.Namespace) -> EndpointNormalizer | None:
+    """Создает нормализатор endpoint по аргументам --normalize*."""
+    if not args.normalize and not args.normalize_rule:
+        return None
+    rules = list(args.normalize_rule)
+    if args.normalize:
+        rules.extend(NORMALIZE_RULES)
+    return EndpointNormalizer(rules)
+
+
+def create_aggregator(args: argparse.Namespace) -> Aggregator:
+    """Создает агрегаторы отчетов --report по остальным аргументам."""
+    return combine_reports(
+        {name: REPORTS[name].from_args(args) for name in args.report.split(",")}
+    )
 
 
 def parse_args_cli():
@@ -158,20 +4846,349 @@ def parse_args_cli():
     parser = argparse.ArgumentParser(description="Анализатор логов Django")
     parser.add_argument(
         "log_files",
-        nargs="+",
-        help="Пути к файлам лога",
-        action=ValidateLogFilesAction,
+        nargs="*",
+        help="Пути к файлам лога; - читает лог из стандартного ввода",
     )
     parser.add_argument(
         "--report",
-        choices=[
-            "handlers",
-            # TODO: добавить другие отчеты
-        ],
-        default="handlers",
-        help="Тип генерируемого отчета",
+        type=report_names,
+        action="extend",
+        metavar="NAME[,NAME...]",
+        help=f"Тип генерируемого отчета: {', '.join(REPORTS)} (по умолчанию "
+        "handlers); несколько отчетов строятся за один проход по файлам",
+    )
+    parser.add_argument(
+        "--format",
+        choices=WRITERS,
+        default="table",
+        help="Формат вывода отчета: таблица, CSV, JSON или JSON по строке на запись",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Число процессов для параллельной обработки",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=positive_int,
+        default=1,
+        metavar="N",
+        help="Читать до N файлов одновременно (asyncio и потоки), каждый файл "
+        "открывается один раз; для множества небольших файлов на сетевом диске",
+    )
+    parser.add_argument(
+        "--io",
+        choices=IO_MODES,
+        default="lines",
+        help="Способ чтения файлов: построчно или через mmap",
+    )
+    parser.add_argument(
+        "--state",
+        metavar="PATH",
+        help="Файл состояния: повторные запуски дочитывают только новые строки",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        help="Периодически сохранять частичную статистику и позиции в файлах в "
+        "контрольную точку PATH",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=positive_float,
+        default=CHECKPOINT_INTERVAL,
+        metavar="SECONDS",
+        help="Интервал записи контрольной точки --checkpoint",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Продолжить прерванный разбор с контрольной точки --checkpoint",
+    )
+    parser.add_argument(
+        "--save-stats",
+        metavar="PATH",
+        help="Сохранить собранную статистику в двоичный снимок для --merge",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="SNAPSHOT",
+        help="Построить отчет по снимкам --save-stats (например, с разных "
+        "серверов) вместо разбора файлов лога",
+    )
+    parser.add_argument(
+        "--db",
+        metavar="PATH",
+        help="Построить отчет запросами к базе команды ingest вместо разбора "
+        "файлов лога",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Следить за дописываемыми файлами и обновлять отчет (как tail -F)",
+    )
+    parser.add_argument(
+        "--refresh",
+        type=positive_float,
+        default=FOLLOW_REFRESH,
+        metavar="SECONDS",
+        help="Интервал обновления отчета в режиме --follow",
+    )
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="Заменять числовые, UUID и hash-сегменты пути на {id}, {uuid}, {hash}",
+    )
+    parser.add_argument(
+        "--normalize-rule",
+        type=normalize_rule,
+        action="append",
+        default=[],
+        metavar="REGEX=PLACEHOLDER",
+        help="Свое правило нормализации endpoint, применяется до встроенных",
+    )
+    parser.add_argument(
+        "--top",
+        type=positive_int,
+        metavar="K",
+        help="Хранить не более K самых частых endpoint (Space-Saving)",
+    )
+    parser.add_argument(
+        "--bucket",
+        type=duration,
+        default=TIMELINE_BUCKET,
+        metavar="DURATION",
+        help="Размер корзины отчета timeline: 30s, 1m, 5m, 1h, 1d",
+    )
+    parser.add_argument(
+        "--errors-per-endpoint",
+        type=positive_int,
+        default=ERRORS_PER_ENDPOINT,
+        metavar="N",
+        help="Отчет errors: число самых частых сигнатур исключений на endpoint",
+    )
+    parser.add_argument(
+        "--clients-per-endpoint",
+        type=positive_int,
+        default=HTTP_CLIENTS_PER_ENDPOINT,
+        metavar="N",
+        help="Отчет http: число самых частых адресов клиентов на endpoint",
+    )
+    parser.add_argument(
+        "--since",
+        type=timestamp,
+        metavar="TIME",
+        help="Отчет timeline: учитывать строки не раньше TIME",
+    )
+    parser.add_argument(
+        "--until",
+        type=timestamp,
+        metavar="TIME",
+        help="Отчет timeline: учитывать строки раньше TIME",
+    )
+    parser.add_argument(
+        "--sorted",
+        action="store_true",
+        help="Файлы отсортированы по времени: читать только байты между "
+        "--since и --until, найденные бинарным поиском",
+    )
+    parser.add_argument(
+        "--level",
+        type=level_names,
+        action="extend",
+        metavar="LEVEL[,LEVEL...]",
+        help="Учитывать только запросы с этими уровнями (ERROR,CRITICAL)",
+    )
+    parser.add_argument(
+        "--endpoint-prefix",
+        type=endpoint_prefix,
+        metavar="PREFIX",
+        help="Учитывать только запросы к endpoint, начинающимся с PREFIX (/api/)",
+    )
+    parser.add_argument(
+        "--client-ip",
+        type=client_network,
+        metavar="NETWORK",
+        help="Учитывать только запросы клиентов из подсети или с адреса NETWORK "
+        "([192.168.1.59] в конце строки), например 192.168.1.0/24",
+    )
+    parser.add_argument(
+        "--sample",
+        type=sample_rate,
+        metavar="RATE",
+        help="Оценить отчет handlers по доле RATE (0 < RATE <= 1) случайных блоков "
+        "файлов, с 95%% доверительными интервалами",
+    )
+    parser.add_argument(
+        "--budget",
+        type=positive_float,
+        metavar="SECONDS",
+        help="Оценить отчет handlers по случайным блокам, читая их не дольше "
+        "SECONDS секунд",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Зерно случайного выбора блоков --sample и --budget",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Вывести в stderr время этапов и счетчики по файлам и процессам",
+    )
+    parser.add_argument(
+        "--stats-json",
+        metavar="PATH",
+        help="Записать время этапов и счетчики в JSON-файл",
+    )
+    parser.add_argument(
+        "--log-level",
+        type=str.upper,
+        choices=LOG_LEVELS,
+        default="WARNING",
+        help="Уровень сообщений анализатора в stderr, по умолчанию WARNING",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Профилировать запуск через cProfile и сохранить pstats в файл "
+        "(процессы пула не профилируются)",
+    )
+    args = parser.parse_args()
+    if args.concurrency > 1 and (args.workers > 1 or args.state or args.follow):
+        parser.error("--concurrency несовместим с --workers, --state и --follow")
+    if args.follow and args.format != "table":
+        parser.error("--follow выводит отчет только в формате table")
+    if args.merge and (args.log_files or args.state or args.follow):
+        parser.error(
+            "--merge строит отчет по снимкам без файлов лога, --state и --follow"
+        )
+    if args.db and (
+        args.log_files
+        or args.merge
+        or args.state
+        or args.follow
+        or args.sample
+        or args.budget
+    ):
+        parser.error(
+            "--db строит отчет по базе без файлов лога, --merge, --state, --follow, "
+            "--sample и --budget"
+        )
+    if not args.merge and not args.db and not args.log_files:
+        parser.error("Укажите файлы лога, --merge или --db")
+    if args.follow and args.save_stats:
+        parser.error("--save-stats несовместим с --follow")
+    if args.log_files.count(STDIN_PATH) > 1:
+        parser.error("Стандартный ввод (-) можно указать только один раз")
+    if STDIN_PATH in args.log_files and (args.workers > 1 or args.state or args.follow):
+        parser.error(
+            "Чтение стандартного ввода (-) несовместимо с --workers, --state и --follow"
+        )
+    if args.resume and not args.checkpoint:
+        parser.error("--resume требует --checkpoint")
+    if args.checkpoint and (
+        args.concurrency > 1
+        or args.state
+        or args.follow
+        or args.merge
+        or args.db
+        or args.sample
+        or args.budget
+        or STDIN_PATH in args.log_files
+    ):
+        parser.error(
+            "--checkpoint несовместим с --concurrency, --state, --follow, --merge, "
+            "--db, --sample, --budget и стандартным вводом"
+        )
+    if args.concurrency == 1 and not args.merge and not args.db:
+        args.log_files = validate_log_files(parser, args.log_files)
+    args.report = ",".join(dict.fromkeys(args.report or ["handlers"]))
+    if args.db and {"errors", "http"} & set(args.report.split(",")):
+        parser.error("Отчеты errors и http не строятся по базе --db")
+    if "timeline" not in args.report and (args.since or args.until or args.sorted):
+        parser.error("--since, --until и --sorted работают только с --report timeline")
+    if args.since and args.until and args.since >= args.until:
+        parser.error("--since должно быть раньше --until")
+    if "db" in args.report.split(",") and (
+        args.level or args.endpoint_prefix or args.client_ip
+    ):
+        parser.error(
+            "--level, --endpoint-prefix и --client-ip отбирают строки django.request "
+            "и не применимы к отчету db"
+        )
+    if args.sample or args.budget:
+        if args.report != "handlers":
+            parser.error("--sample и --budget работают только с --report handlers")
+        if (
+            args.workers > 1
+            or args.concurrency > 1
+            or args.state
+            or args.follow
+            or args.merge
+            or args.save_stats
+            or args.top
+            or STDIN_PATH in args.log_files
+        ):
+            parser.error(
+                "--sample и --budget несовместимы с --workers, --concurrency, "
+                "--state, --follow, --merge, --save-stats, --top и стандартным вводом"
+            )
+    return args
+
+
+def parse_args_ingest():
+    """Парсер аргументов команды ingest с валидацией файлов."""
+    parser = argparse.ArgumentParser(
+        prog="main.py ingest",
+        description="Загрузка логов Django в базу SQLite для отчетов --db",
+    )
+    parser.add_argument("database", help="Путь к базе SQLite, создается при загрузке")
+    parser.add_argument(
+        "log_files",
+        nargs="+",
+        help="Пути к файлам лога; повторная загрузка дочитывает новые строки",
+    )
+    parser.add_argument(
+        "--log-level",
+        type=str.upper,
+        choices=LOG_LEVELS,
+        default="WARNING",
+        help="Уровень сообщений анализатора в stderr, по умолчанию WARNING",
+    )
+    args = parser.parse_args(sys.argv[2:])
+    if STDIN_PATH in args.log_files:
+        parser.error("Стандартный ввод (-) не загружается в базу")
+    args.log_files = validate_log_files(parser, args.log_files)
+    return args
+
+
+def ingest():
+    """Команда ingest: загрузка файлов лога в базу SQLite."""
+    args = parse_args_ingest()
+    logging.getLogger().setLevel(args.log_level)
+    try:
+        loaded = ingest_logs(args.database, args.log_files)
+    except Exception as e:
+        logger.critical("Критическая ошибка: %s", e)
+        sys.exit(1)
+    logger.info(
+        "Загружено в %s: запросов %d, SQL-запросов %d",
+        args.database,
+        loaded["requests"],
+        loaded["queries"],
     )
-    return parser.parse_args()
+
+
+def write_metrics(metrics: Metrics, summary: bool, json_path: str | None) -> None:
+    """Выводит сводку метрик в stderr и/или записывает их в JSON-файл."""
+    if summary:
+        print("\n".join(metrics.summary()), file=sys.stderr)  # noqa: T201
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(metrics.to_dict(), file, ensure_ascii=False, indent=2)
 
 
 def measure_time(func):
@@ -181,7 +5198,7 @@ def measure_time(func):
         start = time.perf_counter()
         result = func(*args, **kwargs)
         end = time.perf_counter()
-        logger.debug(f"{func.__name__} выполнилась за {end - start:.4f} сек")
+        logger.debug("%s выполнилась за %.4f сек", func.__name__, end - start)
         return result
 
     return wrapper
@@ -190,15 +5207,68 @@ def measure_time(func):
 @measure_time
 def main():
     """Точка входа в приложение."""
+    logging.basicConfig(format=LOG_FORMAT)
+    if sys.argv[1:2] == ["ingest"]:
+        ingest()
+        return
     args = parse_args_cli()
+    logging.getLogger().setLevel(args.log_level)
+    aggregator = create_aggregator(args)
+    metrics = Metrics() if args.stats or args.stats_json else None
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
 
     try:
-        stats = collect_statistics(args.log_files, args.report)
-        report = create_report(stats)
-        print("\n".join(report))  # noqa
+        if profiler is not None:
+            profiler.enable()
+        if args.follow:
+            follow_statistics(
+                args.log_files, args.report, args.refresh, aggregator=aggregator
+            )
+            return
+        if args.merge:
+            stats = merge_snapshots(args.merge, args.report, aggregator, metrics)
+        elif args.db:
+            stats = query_statistics(args.db, args.report, aggregator)
+        else:
+            stats = collect_statistics(
+                args.log_files,
+                args.report,
+                args.workers,
+                io_mode=args.io,
+                state_path=args.state,
+                aggregator=aggregator,
+                metrics=metrics,
+                concurrency=args.concurrency,
+                sample=args.sample,
+                budget=args.budget,
+                seed=args.seed,
+                checkpoint_path=args.checkpoint,
+                resume=args.resume,
+                checkpoint_interval=args.checkpoint_interval,
+            )
+        if args.save_stats:
+            save_snapshot(args.save_stats, args.report, aggregator, stats)
+            logger.info("Снимок статистики сохранен в %s", args.save_stats)
+        write = WRITERS[args.format]
+        if metrics is None:
+            write(aggregator.sections(stats), sys.stdout)
+        else:
+            with metrics.timer("", "report"):
+                write(aggregator.sections(stats), sys.stdout)
     except Exception as e:
-        logger.critical(f"Критическая ошибка: {e}")
+        logger.critical("Критическая ошибка: %s", e)
         sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logger.info("Профиль cProfile сохранен в %s", args.profile)
+        if metrics is not None:
+            write_metrics(metrics, args.stats, args.stats_json)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+"""Одновременное чтение множества файлов через asyncio (--concurrency)."""
+
+import gzip
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import collect_statistics
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+@pytest.fixture
+def many_files(tmp_path):
+    """Фикстура с набором небольших файлов, один из них сжат gzip."""
+    with open("logs/app1.log", encoding="utf-8") as file:
+        lines = file.readlines()
+    paths = []
+    for i in range(0, len(lines), 10):
+        path = tmp_path / f"worker-{i:03}.log"
+        path.write_text("".join(lines[i : i + 10]))
+        paths.append(str(path))
+    compressed = tmp_path / "worker-gz.log.gz"
+    compressed.write_bytes(gzip.compress("".join(lines).encode()))
+    paths.append(str(compressed))
+    return paths
+
+
+@pytest.mark.parametrize("report_type", ["handlers", "db", "handlers,timeline"])
+def test_matches_serial(many_files, report_type):
+    """Результат совпадает с последовательной обработкой."""
+    aggregator = main.default_aggregator(report_type)
+    serial = collect_statistics(many_files, report_type)
+    concurrent = collect_statistics(many_files, report_type, concurrency=4)
+
+    assert aggregator.report(concurrent) == aggregator.report(serial)
+
+
+def test_mmap_matches_serial(many_files, tmp_path):
+    """Режим mmap совпадает с последовательной обработкой, пустой файл пропущен."""
+    empty = tmp_path / "empty.log"
+    empty.write_text("")
+    files = [*many_files, str(empty)]
+    serial = collect_statistics(many_files, "handlers,db", io_mode="mmap")
+    concurrent = collect_statistics(files, "handlers,db", io_mode="mmap", concurrency=4)
+
+    aggregator = main.default_aggregator("handlers,db")
+    assert aggregator.report(concurrent) == aggregator.report(serial)
+
+
+def test_sorted_reads_only_range(tmp_path, monkeypatch):
+    """Отчет timeline с --sorted читает только диапазон байт file_range."""
+    path = tmp_path / "sorted.log"
+    with open("logs/app1.log", encoding="utf-8") as file:
+        path.write_text("".join(sorted(file)))
+    aggregator = main.TimelineAggregator(
+        60, "2025-03-28 12:10:00", "2025-03-28 12:30:00", sorted_input=True
+    )
+    ranges = []
+    iter_counts = main.iter_counts
+
+    def spy(file_path, io_mode="lines", start=0, end=None, *args, **kwargs):
+        ranges.append((start, end))
+        return iter_counts(file_path, io_mode, start, end, *args, **kwargs)
+
+    monkeypatch.setattr(main, "iter_counts", spy)
+    concurrent = collect_statistics(
+        [str(path)], "timeline", aggregator=aggregator, concurrency=2
+    )
+
+    assert concurrent == collect_statistics(
+        [str(path)], "timeline", aggregator=aggregator
+    )
+    assert ranges[0] == aggregator.file_range(str(path)) != (0, None)
+
+
+def test_each_file_opened_once(many_files):
+    """Каждый файл открывается ровно один раз."""
+    opened = Counter()
+
+    def counting_open(file_path, *args, **kwargs):
+        opened[file_path] += 1
+        return open(file_path, *args, **kwargs)
+
+    with patch.object(main, "open", counting_open, create=True):
+        collect_statistics(many_files, "handlers", concurrency=8)
+
+    assert opened == Counter(many_files)
+
+
+def test_invalid_files_skipped(tmp_path, caplog):
+    """Отсутствующие и пустые файлы пропускаются с ошибкой в логе."""
+    empty = tmp_path / "empty.log"
+    empty.write_text("")
+    files = [str(tmp_path / "missing.log"), str(empty), *LOG_FILES]
+
+    stats = collect_statistics(files, "handlers", concurrency=4)
+
+    assert stats == collect_statistics(LOG_FILES, "handlers")
+    messages = [record.message for record in caplog.records]
+    assert any("Файл не найден" in message for message in messages)
+    assert any("Файл пустой" in message for message in messages)
+
+
+def test_no_valid_files(tmp_path):
+    """Без единого прочитанного файла работа завершается."""
+    with pytest.raises(SystemExit):
+        collect_statistics([str(tmp_path / "missing.log")], "handlers", concurrency=2)
+
+
+def test_metrics(many_files):
+    """Метрики файлов собираются из потоков."""
+    metrics = main.Metrics()
+    collect_statistics(many_files, "handlers", metrics=metrics, concurrency=4)
+
+    totals = metrics.to_dict()["totals"]["counters"]
+    assert totals["lines_seen"] == 200
+    assert set(metrics.to_dict()["files"]) == set(many_files)
+
+
+def test_parse_args_defers_validation():
+    """С --concurrency файлы не открываются при разборе аргументов."""
+    argv = ["main.py", "logs/app1.log", "missing.log", "--concurrency", "16"]
+    with patch("sys.argv", argv):
+        args = main.parse_args_cli()
+
+    assert args.log_files == ["logs/app1.log", "missing.log"]
+    assert args.concurrency == 16
+
+
+@pytest.mark.parametrize("extra", [["--workers", "2"], ["--follow"]])
+def test_parse_args_incompatible(extra):
+    """--concurrency не сочетается с пулом процессов и режимом --follow."""
+    argv = ["main.py", "logs/app1.log", "--concurrency", "4", *extra]
+    with patch("sys.argv", argv):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,124 @@
+"""Генератор синтетических логов и запуск бенчмарков."""
+
+import argparse
+import json
+import subprocess
+import sys
+
+import pytest
+
+import main
+from benchmarks import generate, run
+
+
+def test_generator_is_deterministic():
+    """Одинаковые параметры дают одинаковый лог, другое зерно - другой."""
+    first = list(generate.generate_lines(500, seed=7))
+
+    assert first == list(generate.generate_lines(500, seed=7))
+    assert first != list(generate.generate_lines(500, seed=8))
+
+
+def test_generator_options(tmp_path):
+    """Доли уровней, число endpoint и доля запросов соблюдаются."""
+    path = tmp_path / "bench.log"
+    generate.write_log(
+        str(path),
+        2000,
+        level_mix={"INFO": 1, "ERROR": 1},
+        endpoints=30,
+        request_share=0.5,
+    )
+
+    stats = main.collect_statistics([str(path)], "handlers")
+    requests = sum(sum(levels.values()) for levels in stats.values())
+
+    assert len(path.read_text().splitlines()) == 2000
+    assert len(stats) == 30
+    assert {level for levels in stats.values() for level in levels} == {
+        "INFO",
+        "ERROR",
+    }
+    assert 900 < requests < 1100
+
+
+def test_parse_level_mix():
+    """Веса уровней разбираются из строки, ошибки отклоняются."""
+    assert generate.parse_level_mix("info=3,ERROR=1") == {"INFO": 3, "ERROR": 1}
+    for value in ["INFO", "INFO=x", "INFO=0", "INFO=1,TRACE=1"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            generate.parse_level_mix(value)
+
+
+def test_run_benchmark(tmp_path, monkeypatch):
+    """Бенчмарк возвращает пропускную способность и пиковый RSS."""
+    monkeypatch.setattr(run, "SMALL_FILES", 20)
+    monkeypatch.setattr(run, "SMALL_FILE_LINES", 10)
+    path = tmp_path / "bench.log"
+    generate.write_log(str(path), 1000)
+
+    for name in run.BENCHMARKS:
+        result = run.run_benchmark(name, str(path), 1000, repeat=1)
+        assert result["lines_per_sec"] > 0
+        assert result["peak_rss_mb"] > 0
+    assert not hasattr(main, "open")
+
+
+def test_compare_with_baseline():
+    """Падение пропускной способности и рост RSS сверх допуска - регрессии."""
+    baseline = {
+        "benchmarks": {
+            "read_file": {"lines_per_sec": 1000.0, "peak_rss_mb": 100.0},
+            "process_file": {"lines_per_sec": 1000.0, "peak_rss_mb": 100.0},
+        }
+    }
+    results = {
+        "benchmarks": {
+            "read_file": {"lines_per_sec": 950.0, "peak_rss_mb": 105.0},
+            "process_file": {"lines_per_sec": 800.0, "peak_rss_mb": 150.0},
+            "create_report": {"lines_per_sec": 1.0, "peak_rss_mb": 1.0},
+        }
+    }
+
+    regressions = run.compare(results, baseline, tolerance=0.1)
+
+    assert len(regressions) == 2
+    assert all(item.startswith("process_file") for item in regressions)
+
+
+def test_main_writes_json_and_compares(tmp_path):
+    """Запуск сохраняет JSON и возвращает 1 при регрессии относительно базы."""
+    output = tmp_path / "bench.json"
+    argv = ["--lines", "1000", "--repeat", "1", "--bench", "read_file"]
+    argv += ["--data-dir", str(tmp_path)]
+
+    assert run.main([*argv, "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results["meta"]["lines"] == 1000
+    assert set(results["benchmarks"]) == {"read_file"}
+
+    results["benchmarks"]["read_file"]["lines_per_sec"] *= 100
+    output.write_text(json.dumps(results))
+    assert run.main([*argv, "--baseline", str(output)]) == 1
+    assert run.main([*argv, "--startup-budget", "0.001"]) == 1
+
+
+def test_import_is_lazy():
+    """Импорт main не загружает тяжелые модули и не настраивает логирование."""
+    code = (
+        "import logging, sys, main; "
+        "print(','.join(sorted(sys.modules))); "
+        "print(len(logging.getLogger().handlers))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    modules, handlers = result.stdout.splitlines()
+
+    heavy = {"asyncio", "concurrent", "coverage", "ctypes", "csv", "multiprocessing"}
+    assert heavy.isdisjoint(name.split(".")[0] for name in modules.split(","))
+    assert handlers == "0"
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,229 @@
+"""Контрольные точки --checkpoint, продолжение --resume и пропуск файлов с ошибкой."""
+
+import gzip
+import logging
+import os
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+import main
+from benchmarks import generate
+from main import collect_statistics, load_checkpoint
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+CHUNK = 64 * 1024
+
+
+@pytest.fixture(scope="module")
+def log_files(tmp_path_factory):
+    """Тестовые логи, сгенерированный лог из нескольких частей и его gzip."""
+    directory = tmp_path_factory.mktemp("checkpoint")
+    path = directory / "bench.log"
+    generate.write_log(str(path), 20_000, endpoints=30)
+    with open(path, "rb") as src, gzip.open(directory / "bench.log.gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return [*LOG_FILES, str(path), str(directory / "bench.log.gz")]
+
+
+@pytest.fixture
+def corrupt_file(tmp_path):
+    """gzip, обрезанный посередине: распаковка падает с EOFError."""
+    path = tmp_path / "corrupt.log.gz"
+    data = gzip.compress(open("logs/app1.log", "rb").read())
+    path.write_bytes(data[: len(data) // 2])
+    return str(path)
+
+
+def interrupted(after: int):
+    """process_chunk, прерывающий разбор после after частей."""
+    process_chunk = main.process_chunk
+
+    def wrapper(task):
+        if len(wrapper.calls) == after:
+            raise KeyboardInterrupt
+        wrapper.calls.append(task)
+        return process_chunk(task)
+
+    wrapper.calls = []
+    return wrapper
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_matches_full_run(tmp_path, monkeypatch, log_files, workers):
+    """Разбор с контрольной точкой дает тот же отчет, в конце все файлы прочитаны."""
+    monkeypatch.setattr(main, "HTTP_CLIENTS_CAPACITY", 1000)
+    aggregator = main.default_aggregator("handlers,http,timeline")
+    checkpoint = str(tmp_path / "run.ckpt")
+
+    stats = collect_statistics(
+        log_files,
+        "handlers,http,timeline",
+        workers,
+        CHUNK,
+        aggregator=aggregator,
+        checkpoint_path=checkpoint,
+        checkpoint_interval=0.001,
+    )
+
+    expected = collect_statistics(log_files, "handlers,http,timeline")
+    assert aggregator.report(stats) == aggregator.report(expected)
+    totals, _, progress = load_checkpoint(
+        checkpoint, "handlers,http,timeline", aggregator
+    )
+    assert aggregator.report(totals) == aggregator.report(expected)
+    assert progress["current"] is None
+    assert set(progress["done"]) == set(map(os.path.abspath, log_files))
+    assert not os.path.exists(f"{checkpoint}.tmp")
+
+
+@pytest.mark.parametrize("after", [1, 4, 7])
+def test_resume_after_interrupt(tmp_path, monkeypatch, log_files, after):
+    """--resume после прерывания дочитывает остаток и дает отчет полного разбора."""
+    checkpoint = str(tmp_path / "run.ckpt")
+    options = {"chunk_size": CHUNK, "checkpoint_path": checkpoint}
+    with monkeypatch.context() as patched:
+        patched.setattr(main, "process_chunk", interrupted(after))
+        with pytest.raises(KeyboardInterrupt):
+            collect_statistics(
+                log_files, "handlers,db", checkpoint_interval=0, **options
+            )
+    _, _, progress = load_checkpoint(
+        checkpoint, "handlers,db", main.default_aggregator("handlers,db")
+    )
+    resumed = interrupted(-1)
+    monkeypatch.setattr(main, "process_chunk", resumed)
+
+    stats = collect_statistics(log_files, "handlers,db", resume=True, **options)
+
+    aggregator = main.default_aggregator("handlers,db")
+    expected = collect_statistics(log_files, "handlers,db")
+    assert aggregator.report(stats) == aggregator.report(expected)
+    current = progress["current"] or {"file": None}
+    assert progress["done"] or progress["current"]
+    for file_path, start, *_ in resumed.calls:
+        assert os.path.abspath(file_path) not in progress["done"]
+        if os.path.abspath(file_path) == current["file"]:
+            assert start >= current["offset"]
+
+
+def test_resume_without_checkpoint(tmp_path, caplog):
+    """Без файла контрольной точки --resume начинает полный разбор."""
+    checkpoint = str(tmp_path / "run.ckpt")
+
+    stats = collect_statistics(
+        LOG_FILES, "handlers", checkpoint_path=checkpoint, resume=True
+    )
+
+    assert main.create_report(stats) == main.create_report(
+        collect_statistics(LOG_FILES, "handlers")
+    )
+    assert "не найдена" in caplog.text
+    assert os.path.exists(checkpoint)
+
+
+def test_resume_rejects_changed_files(tmp_path):
+    """Измененный, не указанный файл и другие настройки агрегации - ошибка."""
+    log_file = tmp_path / "app.log"
+    shutil.copy("logs/app1.log", log_file)
+    checkpoint = str(tmp_path / "run.ckpt")
+    collect_statistics([str(log_file)], "handlers", checkpoint_path=checkpoint)
+    options = {"checkpoint_path": checkpoint, "resume": True}
+
+    with pytest.raises(ValueError):
+        collect_statistics(LOG_FILES, "handlers", **options)
+    with pytest.raises(ValueError):
+        collect_statistics(
+            [str(log_file)],
+            "handlers",
+            aggregator=main.Aggregator(top=10),
+            **options,
+        )
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(open("logs/app2.log", encoding="utf-8").read())
+    with pytest.raises(ValueError):
+        collect_statistics([str(log_file)], "handlers", **options)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"io_mode": "mmap"},
+        {"workers": 3},
+        {"concurrency": 2},
+        {"state_path": "state"},
+        {"checkpoint_path": "run.ckpt"},
+    ],
+)
+def test_corrupt_file_skipped(tmp_path, caplog, corrupt_file, options):
+    """Поврежденный файл пропускается с ошибкой в логе, остальные учитываются."""
+    options = {
+        name: str(tmp_path / value) if name.endswith("path") else value
+        for name, value in options.items()
+    }
+    caplog.set_level(logging.ERROR)
+
+    stats = collect_statistics(
+        [LOG_FILES[0], corrupt_file, LOG_FILES[1]], "handlers", **options
+    )
+
+    expected = collect_statistics(LOG_FILES[:2], "handlers")
+    assert main.create_report(stats) == main.create_report(expected)
+    assert f"Файл {corrupt_file} пропущен из-за ошибки" in caplog.text
+
+
+def test_skipped_file_retried_on_resume(tmp_path, corrupt_file):
+    """Пропущенный файл не попадает в контрольную точку и читается при --resume."""
+    checkpoint = str(tmp_path / "run.ckpt")
+    options = {"checkpoint_path": checkpoint}
+    collect_statistics([LOG_FILES[0], corrupt_file], "handlers", **options)
+    with open(corrupt_file, "wb") as file:
+        file.write(gzip.compress(open("logs/app2.log", "rb").read()))
+
+    stats = collect_statistics(
+        [LOG_FILES[0], corrupt_file], "handlers", resume=True, **options
+    )
+
+    expected = collect_statistics(LOG_FILES[:2], "handlers")
+    assert main.create_report(stats) == main.create_report(expected)
+
+
+def test_all_files_failed(corrupt_file):
+    """Если ни один файл не прочитан, запуск завершается с ошибкой."""
+    with pytest.raises(SystemExit):
+        collect_statistics([corrupt_file], "handlers")
+
+
+def test_main_checkpoint_resume(tmp_path, capsys):
+    """Аргументы --checkpoint и --resume: повторный запуск выводит тот же отчет."""
+    argv = ["main.py", *LOG_FILES, "--checkpoint", str(tmp_path / "run.ckpt")]
+    with patch("sys.argv", argv):
+        main.main()
+    full = capsys.readouterr().out
+    with patch("sys.argv", [*argv, "--resume", "--workers", "2"]):
+        main.main()
+
+    assert capsys.readouterr().out == full
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        ["--resume"],
+        ["--checkpoint", "run.ckpt", "--state", "state.json"],
+        ["--checkpoint", "run.ckpt", "--concurrency", "4"],
+        ["--checkpoint", "run.ckpt", "--sample", "0.1"],
+        ["--checkpoint", "run.ckpt", "--checkpoint-interval", "0"],
+    ],
+)
+def test_parse_args_checkpoint_invalid(extra):
+    """--resume без --checkpoint и несовместимые режимы отклоняются."""
+    with patch("sys.argv", ["main.py", "logs/app1.log", *extra]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,81 @@
+"""Пакетный классификатор строк совпадает с построчным parse_log_line."""
+
+import glob
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+import main
+
+EDGE_LINES = [
+    "INFO django.request: GET /api/users",
+    "Some invalid log line",
+    "2025-03-28 12:01:42,000 WARNING django.security: IntegrityError",
+    "2025-03-28 12:01:42,000 INFO django.request: OPTIONS /skipped/ 200 OK",
+    "2025-03-28 12:01:42,000 INFO django.request:\n",
+    "2025-03-28 12:01:42,000 INFO django.request: GET\n",
+    "DEBUG INFO django.request: GET /first/ django.request: GET /second/\n",
+    "2025-03-28 12:01:42,000 ERROR django.request: Internal Server Error: /x/ [1]\n",
+]
+
+
+def expected_pairs(lines):
+    """Эталон: построчный разбор через parse_log_line."""
+    result = []
+    for line in lines:
+        if parsed := main.parse_log_line(line, ("endpoint", "log_level")):
+            result.append((parsed["endpoint"], parsed["log_level"]))
+    return result
+
+
+def test_classify_lines_edge_cases():
+    """Граничные строки разбираются так же, как построчно."""
+    assert main.classify_lines(EDGE_LINES) == expected_pairs(EDGE_LINES)
+
+
+@pytest.mark.parametrize("log_file", sorted(glob.glob("logs/*.log")))
+def test_classify_lines_fixtures(log_file):
+    """Файлы из logs/ разбираются так же, как построчно."""
+    with open(log_file, encoding="utf-8") as file:
+        lines = file.readlines()
+
+    assert main.classify_lines(lines) == expected_pairs(lines)
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        EDGE_LINES,
+        [
+            "2025-03-28 12:01:42,000 INFO ERROR django.request: GET /a/ 200",
+            "2025-03-28 12:01:42,000 DEBUG django.db.backends: django.request: GET /b/",
+            "2025-03-28 12:01:42,000 INFO django.request: Not Found: /c/ "
+            "django.request: POST /d/ 404",
+            "2025-03-28 12:01:42,000 INFOdjango.request: GET /e/",
+            "2025-03-28 12:01:42,000\tERROR django.request:\tGET\t/f/",
+            "12:01:42 WARNING django.request: PATCH /g/ 200",
+        ],
+        Path("logs/app1.log").read_text(encoding="utf-8").splitlines(),
+    ],
+)
+def test_count_requests(lines):
+    """Подсчет пачки отрезками строк совпадает с парами find_requests."""
+    assert main.count_requests(lines) == Counter(main.find_requests(lines))
+
+
+def test_classify_line():
+    """Одиночная строка возвращает кортеж (endpoint, log_level)."""
+    assert main.classify_line(EDGE_LINES[0]) == ("/api/users", "INFO")
+    assert main.classify_line(EDGE_LINES[1]) is None
+
+
+def test_read_batches():
+    """Поток строк делится на пачки заданного размера."""
+    batches = list(main.read_batches(iter(range(7)), size=3))
+
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+if __name__ == "__main__":
+    pytest.main()
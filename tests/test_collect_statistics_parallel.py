@@ -0,0 +1,83 @@
+"""Параллельный сбор статистики по файлам и их байтовым диапазонам."""
+
+import pytest
+
+from main import (
+    collect_statistics,
+    read_file_range,
+    read_range_batches,
+    split_file,
+)
+
+LOG_CONTENT = (
+    "2025-03-28 12:44:46,000 INFO django.request: GET /api/v1/reviews/ 204 OK [192.168.1.59]\n"
+    "2025-03-28 12:11:57,000 ERROR django.request: Internal Server Error: /admin/dashboard/\n"
+    "2025-03-28 12:25:45,000 DEBUG django.db.backends: (0.41) SELECT * FROM 'products';\n"
+    "2025-03-28 12:05:13,000 INFO django.request: GET /api/v1/reviews/ 201 OK\n"
+    "2025-03-28 12:21:51,000 WARNING django.request: GET /admin/dashboard/ 200 OK\n"
+)
+
+
+@pytest.fixture
+def log_files(tmp_path):
+    """Фикстура с несколькими лог-файлами, последний без перевода строки в конце."""
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"app{i}.log"
+        path.write_text(
+            LOG_CONTENT * (i + 1) + "2025-03-28 INFO django.request: GET /tail/"
+        )
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 10_000])
+def test_read_file_range_covers_all_lines(log_files, chunk_size):
+    """Диапазоны не теряют и не дублируют строки при любом размере."""
+    path = log_files[-1]
+    lines = [
+        line
+        for _, start, end in split_file(path, chunk_size)
+        for line in read_file_range(path, start, end)
+    ]
+
+    with open(path, encoding="utf-8") as file:
+        assert lines == file.readlines()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 10_000])
+def test_read_range_batches_covers_all_lines(log_files, chunk_size, monkeypatch):
+    """Блочное чтение диапазонов отдает те же строки без переводов строки."""
+    monkeypatch.setattr("main.READ_BLOCK", 50)
+    path = log_files[-1]
+    lines = [
+        line
+        for _, start, end in split_file(path, chunk_size)
+        for batch in read_range_batches(path, start, end)
+        for line in batch
+    ]
+
+    with open(path, encoding="utf-8") as file:
+        assert lines == file.read().splitlines()
+
+
+@pytest.mark.parametrize("chunk_size", [16, 200, 10_000])
+def test_parallel_matches_serial(log_files, chunk_size):
+    """Результат пула процессов совпадает с последовательной обработкой."""
+    serial = collect_statistics(log_files, "handlers")
+    parallel = collect_statistics(
+        log_files, "handlers", workers=2, chunk_size=chunk_size
+    )
+
+    assert parallel == serial
+    assert parallel["/tail/"] == {"INFO": 3}
+
+
+def test_parallel_invalid_report_type(log_files):
+    """Неизвестный тип отчета завершает работу до запуска пула."""
+    with pytest.raises(SystemExit):
+        collect_statistics(log_files, "invalid", workers=2)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,90 @@
+"""Потоковое чтение сжатых ротированных логов."""
+
+import bz2
+import gzip
+import io
+import lzma
+
+import pytest
+
+import main
+
+MODULES = [gzip, bz2, lzma]
+
+
+@pytest.fixture
+def plain_log(tmp_path):
+    """Фикстура с обычным лог-файлом из logs/."""
+    path = tmp_path / "app.log"
+    with open("logs/app1.log", "rb") as file:
+        path.write_bytes(file.read() * 3)
+    return str(path)
+
+
+def compress(plain_log, module, name="app.log.1"):
+    """Сжимает лог-файл модулем module в файл без говорящего расширения."""
+    path = f"{plain_log}.{module.__name__}.{name}"
+    with open(plain_log, "rb") as source, module.open(path, "wb") as target:
+        target.write(source.read())
+    return path
+
+
+@pytest.mark.parametrize("module", MODULES, ids=lambda m: m.__name__)
+def test_detect_compression_by_magic(plain_log, module):
+    """Формат определяется по сигнатуре, а не по имени файла."""
+    assert main.detect_compression(compress(plain_log, module)) == module.__name__
+    assert main.detect_compression(plain_log) is None
+
+
+@pytest.mark.parametrize("io_mode", main.IO_MODES)
+@pytest.mark.parametrize("module", MODULES, ids=lambda m: m.__name__)
+def test_compressed_matches_plain(plain_log, module, io_mode):
+    """Статистика сжатого файла совпадает со статистикой исходного."""
+    expected = main.collect_statistics([plain_log], "handlers")
+    compressed = compress(plain_log, module)
+
+    assert main.collect_statistics([compressed], "handlers", io_mode=io_mode) == (
+        expected
+    )
+
+
+def test_compressed_parallel(plain_log):
+    """Сжатые файлы обрабатываются в пуле целиком, по одному на задачу."""
+    files = [plain_log, *(compress(plain_log, module) for module in MODULES)]
+    compressed = files[1]
+
+    assert main.split_file(compressed, chunk_size=10) == [(compressed, 0, None)]
+    assert main.collect_statistics(
+        files, "handlers", workers=2, chunk_size=100
+    ) == main.collect_statistics(files, "handlers")
+
+
+def test_compressed_incremental(plain_log, tmp_path):
+    """Неизмененный сжатый файл берется из состояния, измененный читается заново."""
+    compressed = compress(plain_log, gzip)
+    state_file = str(tmp_path / "state.json")
+    expected = main.collect_statistics([compressed], "handlers")
+
+    for _ in range(2):
+        assert (
+            main.collect_statistics([compressed], "handlers", state_path=state_file)
+            == expected
+        )
+
+    with gzip.open(compressed, "ab") as file:
+        file.write(b"INFO django.request: GET /rotated/\n")
+    result = main.collect_statistics([compressed], "handlers", state_path=state_file)
+    assert result == main.collect_statistics([compressed], "handlers")
+    assert result["/rotated/"] == {"INFO": 1}
+
+
+def test_read_blocks_cut_on_newlines(monkeypatch):
+    """Блоки заканчиваются переводом строки, кроме последнего."""
+    monkeypatch.setattr(main, "READ_BLOCK", 4)
+    stream = io.BytesIO(b"a\nbbbbbbb\ncc\nd")
+
+    assert list(main.read_blocks(stream)) == [b"a\n", b"bbbbbbb\n", b"cc\n", b"d"]
+
+
+if __name__ == "__main__":
+    pytest.main()
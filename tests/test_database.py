@@ -0,0 +1,221 @@
+"""Команда ingest и отчеты по базе SQLite (--db)."""
+
+import ipaddress
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+import main
+from benchmarks import generate
+from main import (
+    Aggregator,
+    RequestFilter,
+    collect_statistics,
+    ingest_logs,
+    query_statistics,
+)
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+@pytest.fixture(scope="module")
+def log_files(tmp_path_factory):
+    """Тестовые логи и сгенерированный лог со всеми уровнями."""
+    path = tmp_path_factory.mktemp("database") / "bench.log"
+    generate.write_log(str(path), 20_000, endpoints=30)
+    return [*LOG_FILES, str(path)]
+
+
+@pytest.fixture(scope="module")
+def database(log_files, tmp_path_factory):
+    """База, в которую загружены все тестовые логи."""
+    path = str(tmp_path_factory.mktemp("database") / "logs.db")
+    ingest_logs(path, log_files)
+    return path
+
+
+@pytest.mark.parametrize("report_type", ["handlers", "db", "timeline"])
+def test_reports_match_parsing(log_files, database, report_type):
+    """Отчет по базе совпадает с отчетом по файлам лога."""
+    aggregator = main.default_aggregator(report_type)
+
+    stats = query_statistics(database, report_type)
+
+    expected = collect_statistics(log_files, report_type)
+    assert aggregator.report(stats) == aggregator.report(expected)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"levels": ["ERROR", "CRITICAL"]},
+        {"prefix": "/api/"},
+        {"levels": ["INFO"], "prefix": "/admin/"},
+        {"network": ipaddress.ip_network("192.168.1.0/28")},
+    ],
+)
+def test_filters_match_parsing(log_files, database, options):
+    """Фильтры строк переводятся в условия запроса без изменения результата."""
+    aggregator = Aggregator(request_filter=RequestFilter(**options))
+
+    stats = query_statistics(database, "handlers", aggregator)
+
+    expected = collect_statistics(log_files, "handlers", aggregator=aggregator)
+    assert aggregator.report(stats) == aggregator.report(expected)
+
+
+def test_timeline_interval(log_files, database):
+    """--since и --until ограничивают корзины timeline по индексу времени."""
+    aggregator = main.TimelineAggregator(
+        60, since="2025-03-28 12:50:00", until="2025-03-28 12:55:00"
+    )
+
+    stats = query_statistics(database, "timeline", aggregator)
+
+    expected = collect_statistics(log_files, "timeline", aggregator=aggregator)
+    assert len(stats) == 5
+    assert aggregator.report(stats) == aggregator.report(expected)
+
+
+def test_several_reports(log_files, database):
+    """Несколько отчетов строятся запросами к одной базе."""
+    aggregator = main.ReportSet(
+        {"handlers": Aggregator(), "db": main.QueryAggregator()}
+    )
+
+    stats = query_statistics(database, "handlers,db", aggregator)
+
+    expected = collect_statistics(log_files, "handlers,db", aggregator=aggregator)
+    assert aggregator.report(stats) == aggregator.report(expected)
+
+
+def test_errors_report_rejected(database):
+    """Сообщения исключений в базу не загружаются, отчет errors не строится."""
+    with pytest.raises(ValueError):
+        query_statistics(database, "errors")
+
+
+def test_incremental_ingest(tmp_path):
+    """Повторная загрузка дочитывает только дописанные строки."""
+    log_file = tmp_path / "app.log"
+    database = str(tmp_path / "logs.db")
+    shutil.copy("logs/app1.log", log_file)
+    ingest_logs(database, [str(log_file)])
+
+    assert ingest_logs(database, [str(log_file)]).total() == 0
+    with open(log_file, "a", encoding="utf-8") as file, open("logs/app2.log") as src:
+        file.write(src.read())
+    loaded = ingest_logs(database, [str(log_file)])
+
+    appended = collect_statistics(["logs/app2.log"], "handlers")
+    assert loaded["requests"] == sum(
+        sum(levels.values()) for levels in appended.values()
+    )
+    expected = collect_statistics(["logs/app1.log", "logs/app2.log"], "handlers")
+    assert main.create_report(query_statistics(database, "handlers")) == (
+        main.create_report(expected)
+    )
+
+
+def test_unterminated_line_ingested(tmp_path):
+    """Последняя строка без перевода строки загружается и перечитывается."""
+    log_file = tmp_path / "app.log"
+    database = str(tmp_path / "logs.db")
+    with open("logs/app1.log", encoding="utf-8") as file:
+        lines = file.read().splitlines(keepends=True)
+    partial = "2025-03-28 12:44:46,000 ERROR django.request: GET /api/v1/tail/"
+    log_file.write_text("".join(lines[:-1]) + lines[-1].rstrip("\n"))
+    ingest_logs(database, [str(log_file)])
+
+    def report():
+        return main.create_report(query_statistics(database, "handlers"))
+
+    expected = collect_statistics([str(log_file)], "handlers")
+    assert report() == main.create_report(expected)
+    assert ingest_logs(database, [str(log_file)]).total() == 0
+
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write("\n" + partial)
+    assert ingest_logs(database, [str(log_file)])["requests"] == 2
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(" 500 Internal\n" + lines[0].rstrip("\n"))
+    assert ingest_logs(database, [str(log_file)])["requests"] == 2
+
+    expected = collect_statistics([str(log_file)], "handlers")
+    assert report() == main.create_report(expected)
+
+
+def test_file_indexes(database):
+    """Строки файла удаляются по индексу, без просмотра всей таблицы."""
+    connection = main.open_database(database)
+    for table in main.DATABASE_TABLES:
+        plan = connection.execute(
+            f"EXPLAIN QUERY PLAN DELETE FROM {table} WHERE file = ?", (1,)
+        ).fetchall()
+        assert f"USING INDEX {table}_file" in plan[0][-1]
+    connection.close()
+
+
+def test_rotated_file_reloaded(tmp_path):
+    """Ротированный файл загружается заново вместо своих старых строк."""
+    log_file = tmp_path / "app.log"
+    database = str(tmp_path / "logs.db")
+    shutil.copy("logs/app1.log", log_file)
+    ingest_logs(database, [str(log_file)])
+
+    log_file.unlink()
+    shutil.copy("logs/app3.log", log_file)
+    ingest_logs(database, [str(log_file)])
+
+    assert main.create_report(query_statistics(database, "handlers")) == (
+        main.create_report(collect_statistics(["logs/app3.log"], "handlers"))
+    )
+
+
+def test_missing_and_invalid_database(tmp_path):
+    """Отсутствующая база и файл не базы ingest дают понятную ошибку."""
+    with pytest.raises(FileNotFoundError):
+        query_statistics(str(tmp_path / "missing.db"), "handlers")
+    with pytest.raises(ValueError):
+        query_statistics("logs/app1.log", "handlers")
+
+
+def test_main_ingest_and_db(tmp_path, capsys):
+    """Команда ingest загружает логи, --db строит по базе тот же отчет."""
+    database = str(tmp_path / "logs.db")
+    with patch("sys.argv", ["main.py", "ingest", database, *LOG_FILES]):
+        main.main()
+    with patch("sys.argv", ["main.py", "--db", database, "--report", "db"]):
+        main.main()
+    from_database = capsys.readouterr().out
+    with patch("sys.argv", ["main.py", *LOG_FILES, "--report", "db"]):
+        main.main()
+
+    assert from_database == capsys.readouterr().out
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["main.py", "ingest", "logs.db"],
+        ["main.py", "ingest", "logs.db", "-"],
+        ["main.py", "ingest", "logs.db", "missing.log"],
+        ["main.py", "--db", "logs.db", "logs/app1.log"],
+        ["main.py", "--db", "logs.db", "--state", "state.json"],
+        ["main.py", "--db", "logs.db", "--sample", "0.1"],
+        ["main.py", "--db", "logs.db", "--report", "errors"],
+    ],
+)
+def test_parse_args_database_invalid(argv):
+    """Без файлов, со стандартным вводом и с несовместимыми режимами - ошибка."""
+    with patch("sys.argv", argv):
+        with pytest.raises(SystemExit):
+            if argv[1] == "ingest":
+                main.parse_args_ingest()
+            else:
+                main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,146 @@
+"""Отчет db: перцентили длительности SQL-запросов по форме запроса."""
+
+import random
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import QuantileSketch, normalize_sql
+
+LOG_CONTENT = (
+    "2025-03-28 12:25:45,000 DEBUG django.db.backends: (0.41) "
+    "SELECT * FROM 'products' WHERE id = 4;\n"
+    "2025-03-28 12:44:46,000 INFO django.request: GET /api/v1/reviews/ 204 OK\n"
+    "2025-03-28 12:03:09,000 DEBUG django.db.backends: (0.19) "
+    "SELECT * FROM 'users' WHERE id = 32;\n"
+    "2025-03-28 12:24:19,000 DEBUG django.db.backends: (0.13) "
+    "SELECT * FROM 'products' WHERE id = 60;\n"
+)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Фикстура с лог-файлом из запросов к двум таблицам."""
+    path = tmp_path / "app.log"
+    path.write_text(LOG_CONTENT * 20)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    ("sql", "shape"),
+    [
+        (
+            "SELECT * FROM 'products' WHERE id = 4",
+            "SELECT * FROM 'products' WHERE id = ?",
+        ),
+        (
+            "SELECT * FROM \"auth_user\" WHERE name = 'it''s' AND age > -3.5",
+            'SELECT * FROM "auth_user" WHERE name = ? AND age > ?',
+        ),
+        (
+            "SELECT id FROM 'orders' WHERE id IN (1, 2, 3) LIMIT 21",
+            "SELECT id FROM 'orders' WHERE id IN (?) LIMIT ?",
+        ),
+        ("UPDATE  'cart'\tSET total = 10", "UPDATE 'cart' SET total = ?"),
+        (
+            "SELECT * FROM t2 JOIN v1 ON t2.id = v1.id",
+            "SELECT * FROM t2 JOIN v1 ON t2.id = v1.id",
+        ),
+    ],
+)
+def test_normalize_sql(sql, shape):
+    """Литералы заменяются на ?, имена таблиц и столбцов сохраняются."""
+    assert normalize_sql(sql) == shape
+
+
+def test_sketch_relative_accuracy():
+    """Перцентили скетча отличаются от точных не больше чем на SKETCH_ALPHA."""
+    rng = random.Random(5)
+    values = [rng.lognormvariate(-2, 1.5) for _ in range(20_000)]
+    sketch = QuantileSketch()
+    sketch.add(values)
+    values.sort()
+
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= exact * main.SKETCH_ALPHA * 1.01
+    assert sketch.count == len(values)
+    assert sketch.sum == pytest.approx(sum(values))
+
+
+def test_sketch_merge_and_state():
+    """Слияние скетчей равно скетчу по всем значениям, состояние без потерь."""
+    first, second, total = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    first.add([0.0, 0.1, 0.2])
+    second.add([0.3, 4.0])
+    total.add([0.0, 0.1, 0.2, 0.3, 4.0])
+
+    merged = QuantileSketch.from_state(first.to_state()).merge(second)
+
+    assert merged.to_state() == total.to_state()
+    assert merged.quantile(0) == 0.0
+    assert merged.quantile(1) == 4.0
+
+
+def test_sketch_bins_are_bounded(monkeypatch):
+    """Число корзин ограничено, старшие перцентили остаются точными."""
+    monkeypatch.setattr(main, "SKETCH_MAX_BINS", 16)
+    sketch = QuantileSketch()
+    sketch.add([10 ** (i / 10) for i in range(-60, 40)])
+
+    assert len(sketch.bins) <= 16
+    assert sketch.quantile(0.99) == pytest.approx(10**3.8, rel=main.SKETCH_ALPHA)
+
+
+@pytest.mark.parametrize(
+    ("workers", "io_mode"), [(1, "lines"), (1, "mmap"), (2, "lines")]
+)
+def test_collect_db_statistics(log_file, workers, io_mode):
+    """Скетчи по частям файла и процессам совпадают с последовательным разбором."""
+    stats = main.collect_statistics(
+        [log_file], "db", workers, chunk_size=300, io_mode=io_mode
+    )
+
+    products = stats["SELECT * FROM 'products' WHERE id = ?"]
+    assert set(stats) == {
+        "SELECT * FROM 'products' WHERE id = ?",
+        "SELECT * FROM 'users' WHERE id = ?",
+    }
+    assert products.count == 40
+    assert products.sum == pytest.approx(0.54 * 20)
+    assert products.quantile(0.99) == pytest.approx(0.41, rel=main.SKETCH_ALPHA)
+
+
+def test_db_report_rows(log_file):
+    """Отчет отсортирован по суммарному времени и содержит перцентили."""
+    report = main.create_db_report(main.collect_statistics([log_file], "db"))
+
+    assert report[0] == "Total queries: 60\n"
+    assert report[1].split() == ["QUERY", "COUNT", "TOTAL", "P50", "P95", "P99"]
+    assert report[2].startswith("SELECT * FROM 'products' WHERE id = ?")
+    assert report[2].split()[-5:] == ["40", "10.80", "0.130", "0.410", "0.410"]
+
+
+def test_db_incremental_state(log_file, tmp_path):
+    """Скетчи сохраняются в файл состояния и дополняются новыми строками."""
+    state = str(tmp_path / "state.json")
+    main.collect_statistics([log_file], "db", state_path=state)
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(LOG_CONTENT)
+
+    stats = main.collect_statistics([log_file], "db", state_path=state)
+
+    assert stats["SELECT * FROM 'users' WHERE id = ?"].count == 21
+
+
+def test_parse_args_report_db():
+    """Тип отчета db принимается и выбирает агрегатор скетчей."""
+    with patch("sys.argv", ["main.py", "logs/app1.log", "--report", "db"]):
+        args = main.parse_args_cli()
+
+    assert isinstance(main.create_aggregator(args), main.QueryAggregator)
+
+
+if __name__ == "__main__":
+    pytest.main()
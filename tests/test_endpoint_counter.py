@@ -0,0 +1,76 @@
+"""Компактное хранилище счетчиков EndpointCounter."""
+
+import pickle
+from collections import Counter
+
+import pytest
+
+from main import LOG_LEVELS, EndpointCounter
+
+
+@pytest.fixture
+def counter():
+    """Фикстура с двумя endpoint."""
+    return EndpointCounter().update(
+        Counter(
+            {
+                ("INFO", "/api/"): 3,
+                ("ERROR", "/api/"): 1,
+                ("DEBUG", "/admin/"): 2,
+            }
+        )
+    )
+
+
+def test_mapping_view(counter):
+    """Хранилище читается как словарь с ненулевыми уровнями."""
+    assert counter == {"/api/": {"INFO": 3, "ERROR": 1}, "/admin/": {"DEBUG": 2}}
+    assert list(counter) == ["/api/", "/admin/"]
+    assert len(counter) == 2
+    assert "/missing/" not in counter
+
+
+def test_merge_adds_rows(counter):
+    """Слияние складывает общие endpoint и дописывает новые."""
+    other = EndpointCounter()
+    other.add("/admin/", "DEBUG", 5)
+    other.add("/new/", "CRITICAL")
+
+    counter.merge(other)
+
+    assert counter == {
+        "/api/": {"INFO": 3, "ERROR": 1},
+        "/admin/": {"DEBUG": 7},
+        "/new/": {"CRITICAL": 1},
+    }
+    assert other == {"/admin/": {"DEBUG": 5}, "/new/": {"CRITICAL": 1}}
+
+
+def test_merge_into_empty_copies(counter):
+    """Слияние в пустое хранилище не разделяет массив с источником."""
+    merged = EndpointCounter().merge(counter)
+    merged.add("/api/", "INFO")
+
+    assert merged["/api/"] == {"INFO": 4, "ERROR": 1}
+    assert counter["/api/"] == {"INFO": 3, "ERROR": 1}
+
+
+def test_pickle_roundtrip(counter):
+    """Хранилище передается между процессами без потерь."""
+    restored = pickle.loads(pickle.dumps(counter))
+
+    assert restored == counter
+    restored.add("/api/", "INFO")
+    assert restored["/api/"]["INFO"] == 4
+
+
+def test_state_roundtrip(counter):
+    """Состояние для JSON хранит счетчики всех уровней в порядке LOG_LEVELS."""
+    state = counter.to_state()
+
+    assert state["/admin/"] == [2 if level == "DEBUG" else 0 for level in LOG_LEVELS]
+    assert EndpointCounter.from_state(state) == counter
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,175 @@
+"""Отчет errors: сигнатуры исключений Internal Server Error по endpoint."""
+
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import ErrorAggregator, ErrorStats, collect_statistics
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+ERROR_LINE = (
+    "2025-03-28 12:00:00,000 ERROR django.request: Internal Server Error: "
+    "{endpoint} [192.168.1.1] - {exception}: {message}\n"
+)
+
+
+def error_lines(errors) -> list[str]:
+    """Строки лога для троек (endpoint, тип исключения, сообщение)."""
+    return [
+        ERROR_LINE.format(endpoint=endpoint, exception=exception, message=message)
+        for endpoint, exception, message in errors
+    ]
+
+
+def signatures(stats: ErrorStats) -> dict[str, int]:
+    """Число ошибок по сигнатурам без разбивки по endpoint."""
+    result = {}
+    for (_, cluster), count in stats.counts.items():
+        signature = stats.signature(cluster)
+        result[signature] = result.get(signature, 0) + count
+    return result
+
+
+def test_find_errors():
+    """Из строки берутся endpoint, тип исключения и сообщение."""
+    lines = error_lines([("/api/", "django.db.DatabaseError", "Deadlock - retry")])
+    lines.append("2025-03-28 12:00:00,000 INFO django.request: GET /api/ 200 OK\n")
+
+    assert main.find_errors(lines) == [
+        ("/api/", "django.db.DatabaseError", "Deadlock - retry")
+    ]
+
+
+def test_variable_messages_clustered():
+    """Сообщения с разными значениями сводятся к одному шаблону."""
+    errors = [("/api/", "DoesNotExist", f"User id={i} not found") for i in range(50)]
+    errors += [("/api/", "KeyError", f"'field_{name}'") for name in "abcdef"]
+    errors += [("/api/", "ValueError", f"Invalid value for {name}") for name in "xyz"]
+
+    stats = ErrorStats().update(main.find_errors(error_lines(errors)))
+
+    assert signatures(stats) == {
+        "DoesNotExist: User <*> not found": 50,
+        "KeyError: <*>": 6,
+        "ValueError: Invalid value for <*>": 3,
+    }
+
+
+def test_exception_types_not_mixed():
+    """Одинаковые сообщения разных исключений - разные сигнатуры."""
+    stats = ErrorStats().update(
+        [("/a/", "OSError", "Disk full"), ("/a/", "IOError", "Disk full")]
+    )
+
+    assert len(signatures(stats)) == 2
+
+
+def test_total_matches_log():
+    """Число ошибок равно числу строк Internal Server Error в логах."""
+    expected = 0
+    for log_file in LOG_FILES:
+        with open(log_file, encoding="utf-8") as file:
+            expected += sum("Internal Server Error:" in line for line in file)
+
+    stats = collect_statistics(LOG_FILES, "errors")
+
+    assert sum(stats.counts.values()) == expected > 0
+
+
+@pytest.mark.parametrize(
+    "options", [{"io_mode": "mmap"}, {"workers": 3}, {"concurrency": 2}]
+)
+def test_modes_match(monkeypatch, options):
+    """Построчный режим, mmap, пул процессов и asyncio дают один отчет."""
+    monkeypatch.setattr(main, "READ_BLOCK", 4096)
+    aggregator = ErrorAggregator()
+
+    stats = collect_statistics(LOG_FILES, "errors", **options)
+
+    assert aggregator.report(stats) == aggregator.report(
+        collect_statistics(LOG_FILES, "errors")
+    )
+
+
+def test_state_and_snapshot_roundtrip(tmp_path):
+    """Состояние JSON и двоичный снимок восстанавливают сигнатуры."""
+    aggregator = ErrorAggregator()
+    stats = collect_statistics(LOG_FILES, "errors")
+    path = str(tmp_path / "errors.bin")
+
+    main.save_snapshot(path, "errors", aggregator, stats)
+
+    expected = aggregator.report(stats)
+    assert aggregator.report(ErrorStats.from_state(stats.to_state())) == expected
+    assert aggregator.report(main.load_snapshot(path, "errors", aggregator)) == (
+        expected
+    )
+
+
+def test_merge_matches_parsing():
+    """Объединение статистик по файлам совпадает с разбором всех файлов."""
+    merged = ErrorStats()
+    for log_file in LOG_FILES:
+        merged.merge(collect_statistics([log_file], "errors"))
+
+    assert signatures(merged) == signatures(collect_statistics(LOG_FILES, "errors"))
+
+
+def test_signatures_bounded(monkeypatch):
+    """Сверх ERRORS_MAX_SIGNATURES кластеры не создаются, ошибки не теряются."""
+    monkeypatch.setattr(main, "ERRORS_MAX_SIGNATURES", 10)
+    errors = [("/a/", f"Error{i}", f"unique message {i}") for i in range(100)]
+    errors += [("/a/", "Error0", f"word{'x' * i} other text") for i in range(100)]
+
+    stats = ErrorStats().update(errors)
+
+    assert len(stats.templates) <= 10 + len(stats.overflow)
+    assert sum(stats.counts.values()) == 200
+
+
+def test_leaf_bounded(monkeypatch):
+    """В листе дерева не больше ERRORS_MAX_LEAF кластеров."""
+    monkeypatch.setattr(main, "ERRORS_MAX_LEAF", 4)
+    words = [chr(97 + i) * 3 for i in range(20)]
+    errors = [("/a/", "Error", f"Bad input {word} {word} {word}") for word in words]
+
+    stats = ErrorStats().update(errors)
+
+    assert len(stats.templates) == 4
+    assert sum(stats.counts.values()) == 20
+
+
+def test_limit_per_endpoint():
+    """--errors-per-endpoint ограничивает число строк на endpoint."""
+    stats = collect_statistics(LOG_FILES, "errors")
+    table = ErrorAggregator(limit=1).table(stats)
+
+    handlers, counts, _ = (list(column) for column in table.data())
+
+    assert len(handlers) == len(set(handlers))
+    assert table.title == f"Total errors: {sum(stats.counts.values())}"
+    assert sum(counts) < sum(stats.counts.values())
+
+
+def test_main_report_errors(capsys):
+    """Аргумент --report errors выводит таблицу сигнатур."""
+    argv = ["main.py", *LOG_FILES, "--report", "errors", "--errors-per-endpoint", "2"]
+    with patch("sys.argv", argv):
+        main.main()
+
+    out = capsys.readouterr().out
+    assert out.startswith("Total errors:")
+    assert "SIGNATURE" in out
+
+
+def test_parse_args_errors_per_endpoint():
+    """--errors-per-endpoint принимает только положительные числа."""
+    argv = ["main.py", "logs/app1.log", "--errors-per-endpoint", "0"]
+    with patch("sys.argv", argv):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
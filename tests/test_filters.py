@@ -0,0 +1,242 @@
+"""Фильтры --level, --endpoint-prefix и --client-ip на этапе поиска строк."""
+
+import ipaddress
+import re
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+import main
+from benchmarks import generate
+from main import Aggregator, RequestFilter, collect_statistics
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+CLIENT = re.compile(r"\[([^\]\s]*)\]")
+FILTERS = [
+    {"levels": ["ERROR"]},
+    {"levels": ["ERROR", "CRITICAL"]},
+    {"levels": ["DEBUG", "INFO", "WARNING"]},
+    {"prefix": "/api/"},
+    {"levels": ["INFO"], "prefix": "/admin/"},
+    {"network": ipaddress.ip_network("192.168.1.0/28")},
+    {"levels": ["ERROR"], "network": ipaddress.ip_network("192.168.1.40/29")},
+]
+
+
+@pytest.fixture(scope="module")
+def log_files(tmp_path_factory):
+    """Тестовые логи и сгенерированный лог со всеми уровнями."""
+    path = tmp_path_factory.mktemp("filters") / "bench.log"
+    generate.write_log(str(path), 20_000, endpoints=30)
+    return [*LOG_FILES, str(path)]
+
+
+def expected_counts(log_files, levels=None, prefix=None, network=None) -> Counter:
+    """Разбор без фильтра построчно, затем отбор пар (log_level, endpoint)."""
+    counter = Counter()
+    for log_file in log_files:
+        with open(log_file, encoding="utf-8") as file:
+            for line in file:
+                found = main.classify_line(line)
+                if found is None:
+                    continue
+                endpoint, level = found
+                if levels is not None and level not in levels:
+                    continue
+                if prefix is not None and not endpoint.startswith(prefix):
+                    continue
+                if network is not None:
+                    client = CLIENT.search(line, line.index(endpoint))
+                    if client is None or (
+                        ipaddress.ip_address(client[1]) not in network
+                    ):
+                        continue
+                counter[level, endpoint] += 1
+    return counter
+
+
+def counts(stats) -> Counter:
+    """Ненулевые счетчики хранилища handlers как {(log_level, endpoint): count}."""
+    return Counter(
+        {
+            (level, endpoint): count
+            for endpoint, levels in stats.items()
+            for level, count in levels.items()
+            if count
+        }
+    )
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+@pytest.mark.parametrize("options", FILTERS)
+def test_matches_post_filter(log_files, io_mode, options):
+    """Фильтр на этапе поиска дает то же, что разбор целиком и отбор после."""
+    aggregator = Aggregator(request_filter=RequestFilter(**options))
+
+    stats = collect_statistics(
+        log_files, "handlers", io_mode=io_mode, aggregator=aggregator
+    )
+
+    assert counts(stats) == expected_counts(log_files, **options)
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+def test_level_is_first_level_word(tmp_path, io_mode):
+    """Уровень строки - первое слово уровня, слова уровня дальше не учитываются."""
+    path = tmp_path / "app.log"
+    path.write_text(
+        "2025-03-28 12:00:00,000 INFO django.request: GET /ERROR/ 200 OK [10.0.0.1]\n"
+        "2025-03-28 12:00:01,000 INFO ERROR django.request: GET /a/ 200 OK [10.0.0.1]\n"
+        "2025-03-28 12:00:02,000 ERROR INFO django.request: GET /b/ 500 [10.0.0.1]\n"
+        "2025-03-28 12:00:03,000 ERROR django.request: GET /c/ 500 [10.0.0.1]\n",
+        encoding="utf-8",
+    )
+    aggregator = Aggregator(request_filter=RequestFilter(["ERROR"]))
+
+    stats = collect_statistics(
+        [str(path)], "handlers", io_mode=io_mode, aggregator=aggregator
+    )
+
+    assert counts(stats) == {("ERROR", "/b/"): 1, ("ERROR", "/c/"): 1}
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+def test_client_network(tmp_path, io_mode):
+    """Адрес клиента сверяется с подсетью точно, строки без адреса отбрасываются."""
+    path = tmp_path / "app.log"
+    path.write_text(
+        "".join(
+            f"2025-03-28 12:00:00,000 INFO django.request: GET /a/ 200 OK {client}\n"
+            for client in [
+                "[10.1.2.3]",
+                "[10.1.2.30]",
+                "[10.1.20.3]",
+                "[2001:db8::1]",
+                "",
+                "[not-an-ip]",
+            ]
+        ),
+        encoding="utf-8",
+    )
+
+    def total(network: str) -> int:
+        request_filter = RequestFilter(network=ipaddress.ip_network(network))
+        stats = collect_statistics(
+            [str(path)],
+            "handlers",
+            io_mode=io_mode,
+            aggregator=Aggregator(request_filter=request_filter),
+        )
+        return sum(counts(stats).values())
+
+    assert total("10.1.2.0/24") == 2
+    assert total("10.1.2.0/28") == 1
+    assert total("10.0.0.0/8") == 3
+    assert total("2001:db8::/32") == 1
+
+
+@pytest.mark.parametrize("options", [{"io_mode": "mmap"}, {"workers": 3}])
+def test_timeline_and_errors(monkeypatch, options):
+    """Фильтр работает и для отчетов timeline и errors во всех режимах."""
+    monkeypatch.setattr(main, "CHUNK_SIZE", 4096)
+    request_filter = RequestFilter(["ERROR"], "/api/")
+    aggregator = main.ReportSet(
+        {
+            "timeline": main.TimelineAggregator(request_filter=request_filter),
+            "errors": main.ErrorAggregator(request_filter=request_filter),
+        }
+    )
+
+    stats = collect_statistics(
+        LOG_FILES, "timeline,errors", aggregator=aggregator, **options
+    )
+
+    expected = collect_statistics(LOG_FILES, "timeline,errors", aggregator=aggregator)
+    assert aggregator.report(stats) == aggregator.report(expected)
+    endpoints = {endpoint for endpoint, _ in stats["errors"].counts}
+    assert endpoints and all(endpoint.startswith("/api/") for endpoint in endpoints)
+    timeline = sum(counts(bucket).total() for bucket in stats["timeline"].values())
+    assert timeline == expected_counts(LOG_FILES, ["ERROR"], "/api/").total()
+
+
+def test_workers_match(monkeypatch):
+    """Фильтр передается процессам пула вместе с агрегатором."""
+    monkeypatch.setattr(main, "CHUNK_SIZE", 4096)
+    aggregator = Aggregator(request_filter=RequestFilter(["INFO"], "/api/"))
+
+    stats = collect_statistics(LOG_FILES, "handlers", 3, aggregator=aggregator)
+
+    assert counts(stats) == expected_counts(LOG_FILES, ["INFO"], "/api/")
+
+
+def test_snapshot_checks_filter(tmp_path):
+    """Снимок, собранный с другим фильтром, не объединяется."""
+    path = str(tmp_path / "stats.bin")
+    aggregator = Aggregator(request_filter=RequestFilter(["ERROR"]))
+    main.save_snapshot(
+        path,
+        "handlers",
+        aggregator,
+        collect_statistics(LOG_FILES, "handlers", aggregator=aggregator),
+    )
+
+    assert "filter" not in Aggregator().signature()
+    main.load_snapshot(path, "handlers", aggregator)
+    for other in [Aggregator(), Aggregator(request_filter=RequestFilter(["INFO"]))]:
+        with pytest.raises(ValueError):
+            main.load_snapshot(path, "handlers", other)
+
+
+def test_main_filters(capsys):
+    """Аргументы фильтров ограничивают отчет выбранными запросами."""
+    argv = [
+        "main.py",
+        *LOG_FILES,
+        "--level",
+        "error,critical",
+        "--endpoint-prefix",
+        "/api/",
+        "--client-ip",
+        "192.168.1.0/24",
+        "--format",
+        "csv",
+    ]
+    with patch("sys.argv", argv):
+        main.main()
+
+    rows = capsys.readouterr().out.splitlines()
+    expected = expected_counts(LOG_FILES, ["ERROR", "CRITICAL"], "/api/")
+    assert len(rows) - 1 == len({endpoint for _, endpoint in expected})
+    assert all(row.startswith("/api/") for row in rows[1:])
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        ["--level", "FATAL"],
+        ["--endpoint-prefix", "api/"],
+        ["--client-ip", "300.1.1.1"],
+        ["--report", "db", "--level", "ERROR"],
+    ],
+)
+def test_parse_args_filters_invalid(extra):
+    """Неизвестный уровень, префикс без /, неверный адрес и отчет db отклоняются."""
+    with patch("sys.argv", ["main.py", "logs/app1.log", *extra]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+def test_parse_args_filters():
+    """Уровни приводятся к верхнему регистру, адрес - к подсети."""
+    argv = ["main.py", "logs/app1.log", "--level", "error", "--level", "info"]
+    with patch("sys.argv", [*argv, "--client-ip", "192.168.1.59"]):
+        args = main.parse_args_cli()
+
+    request_filter = main.create_filter(args)
+    assert request_filter.levels == ["INFO", "ERROR"]
+    assert str(request_filter.network) == "192.168.1.59/32"
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,118 @@
+"""Режим --follow: дочитывание файлов и перерисовка отчета."""
+
+import io
+import os
+
+import pytest
+
+import main
+
+LINE = "2025-03-28 12:44:46,000 INFO django.request: GET /api/v1/reviews/ 204 OK\n"
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Фикстура с лог-файлом из одной строки."""
+    path = tmp_path / "app.log"
+    path.write_text(LINE)
+    return str(path)
+
+
+def read_all(follower):
+    """Собирает все блоки одного опроса."""
+    return b"".join(follower.poll()).decode()
+
+
+def test_follower_reads_appended_lines(log_file):
+    """Отдаются только дописанные полные строки."""
+    with main.LogFollower([log_file]) as follower:
+        assert read_all(follower) == LINE
+        assert read_all(follower) == ""
+
+        with open(log_file, "a", encoding="utf-8") as file:
+            file.write(LINE + "2025-03-28 INFO django.request: GET /partial/")
+        assert read_all(follower) == LINE
+
+        with open(log_file, "a", encoding="utf-8") as file:
+            file.write("\n")
+        assert read_all(follower) == "2025-03-28 INFO django.request: GET /partial/\n"
+    assert follower.files == {}
+
+
+def test_follower_handles_rotation(log_file):
+    """После ротации старый файл дочитывается, новый читается с начала."""
+    with main.LogFollower([log_file]) as follower:
+        read_all(follower)
+
+        with open(log_file, "a", encoding="utf-8") as file:
+            file.write("old tail without newline")
+        os.rename(log_file, f"{log_file}.1")
+        with open(log_file, "w", encoding="utf-8") as file:
+            file.write(LINE)
+
+        assert read_all(follower) == "old tail without newline" + LINE
+
+
+def test_follower_handles_truncation(log_file):
+    """После усечения файл читается с начала."""
+    with main.LogFollower([log_file]) as follower:
+        read_all(follower)
+
+        with open(log_file, "w", encoding="utf-8") as file:
+            file.write("short\n")
+
+        assert read_all(follower) == "short\n"
+
+
+def test_follower_closes_files_on_error(log_file):
+    """Файлы закрываются и при ошибке во время опроса."""
+    with pytest.raises(RuntimeError):
+        with main.LogFollower([log_file]) as follower:
+            read_all(follower)
+            handle = follower.files[log_file][0]
+            raise RuntimeError
+    assert handle.closed
+    assert follower.files == {}
+
+
+def test_live_screen_redraws_changed_rows():
+    """Повторная отрисовка переписывает только измененные строки."""
+    out = io.StringIO()
+    screen = main.LiveScreen(out)
+    screen.draw(["a", "b", "c"])
+    assert out.getvalue().startswith("\x1b[H\x1b[2J")
+
+    out.truncate(0)
+    out.seek(0)
+    screen.draw(["a", "B", "c"])
+    assert out.getvalue() == "\x1b[2;1HB\x1b[K\x1b[4;1H"
+
+    out.truncate(0)
+    out.seek(0)
+    screen.draw(["a", "B", "c"])
+    assert out.getvalue() == ""
+
+
+def test_follow_statistics(log_file, monkeypatch):
+    """Цикл слежения заполняет статистику и выводит отчет."""
+    monkeypatch.setattr(main, "FOLLOW_IDLE_CHECK", 0.01)
+    calls = []
+    out = io.StringIO()
+
+    def stop():
+        calls.append(None)
+        if len(calls) == 2:
+            with open(log_file, "a", encoding="utf-8") as file:
+                file.write(LINE)
+        return len(calls) > 4
+
+    stats = main.follow_statistics(
+        [log_file], "handlers", refresh=0.01, out=out, stop=stop
+    )
+
+    assert stats == {"/api/v1/reviews/": {"INFO": 2}}
+    assert "Total requests: " in out.getvalue()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,238 @@
+"""Отчет http: коды ответа по endpoint и методу, доля ошибок, частые клиенты."""
+
+import ipaddress
+import re
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+import main
+from benchmarks import generate
+from main import HttpAggregator, HttpStats, collect_statistics
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+REQUEST_LINE = (
+    "2025-03-28 12:00:00,000 INFO django.request: {method} {endpoint} {status} OK "
+    "[{client}]\n"
+)
+LINE = re.compile(
+    r"django\.request: (?:(GET|POST|PUT|DELETE|PATCH) (\S+) (\d)\d\d |"
+    r"Internal Server Error: (\S+))(?:[^\[]*\[([^\]\s]*)\])?"
+)
+
+
+@pytest.fixture(scope="module")
+def log_files(tmp_path_factory):
+    """Тестовые логи и сгенерированный лог."""
+    path = tmp_path_factory.mktemp("http") / "bench.log"
+    generate.write_log(str(path), 20_000, endpoints=30)
+    return [*LOG_FILES, str(path)]
+
+
+@pytest.fixture(autouse=True)
+def exact_clients(monkeypatch):
+    """Сводка адресов больше числа адресов в логах: счетчики точные."""
+    monkeypatch.setattr(main, "HTTP_CLIENTS_CAPACITY", 1000)
+
+
+def expected_counts(log_files) -> tuple[Counter, Counter]:
+    """Разбор построчно: {(endpoint, метод, класс): count} и {(endpoint, адрес)}."""
+    statuses, clients = Counter(), Counter()
+    for log_file in log_files:
+        with open(log_file, encoding="utf-8") as file:
+            for line in file:
+                match = LINE.search(line)
+                if match is None:
+                    continue
+                method, endpoint, status, error_endpoint, client = match.groups()
+                if error_endpoint:
+                    endpoint, method, status = error_endpoint, "-", "5"
+                statuses[endpoint, method, main.STATUS_CLASSES[int(status) - 1]] += 1
+                if client:
+                    clients[endpoint, client] += 1
+    return statuses, clients
+
+
+def status_counts(stats: HttpStats) -> Counter:
+    """Ненулевые счетчики набора как {(endpoint, метод, класс): count}."""
+    return Counter(
+        {
+            (endpoint, method, status): count
+            for (endpoint, method), counts in stats.statuses.items()
+            for status, count in zip(main.STATUS_CLASSES, counts)
+            if count
+        }
+    )
+
+
+def client_counts(stats: HttpStats) -> Counter:
+    """Счетчики сводок адресов как {(endpoint, адрес): count}."""
+    return Counter(
+        {
+            (endpoint, main.format_address(address)): count
+            for endpoint, sketch in stats.clients.items()
+            for address, count in sketch.items()
+        }
+    )
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+def test_matches_line_parsing(log_files, io_mode):
+    """Счетчики кодов и адресов совпадают с построчным разбором."""
+    stats = collect_statistics(log_files, "http", io_mode=io_mode)
+
+    statuses, clients = expected_counts(log_files)
+    assert status_counts(stats) == statuses
+    assert client_counts(stats) == clients
+    assert not any(stats.dropped.values())
+
+
+@pytest.mark.parametrize(
+    "options", [{"io_mode": "mmap"}, {"workers": 3}, {"concurrency": 2}]
+)
+def test_modes_match(monkeypatch, log_files, options):
+    """Построчный режим, mmap, пул процессов и asyncio дают один отчет."""
+    monkeypatch.setattr(main, "CHUNK_SIZE", 64 * 1024)
+    aggregator = HttpAggregator()
+
+    stats = collect_statistics(log_files, "http", **options)
+
+    assert aggregator.report(stats) == aggregator.report(
+        collect_statistics(log_files, "http")
+    )
+
+
+def test_error_rate_and_methods():
+    """Доля ошибок - 4XX и 5XX среди ответов; Internal Server Error - 5XX без метода."""
+    lines = [
+        REQUEST_LINE.format(
+            method="GET", endpoint="/a/", status=200, client="10.0.0.1"
+        ),
+        REQUEST_LINE.format(
+            method="GET", endpoint="/a/", status=404, client="10.0.0.1"
+        ),
+        REQUEST_LINE.format(method="POST", endpoint="/a/", status=302, client="::1"),
+        "2025-03-28 12:00:00,000 ERROR django.request: Internal Server Error: /a/ "
+        "[10.0.0.2] - ValueError: boom\n",
+    ]
+    stats = HttpStats().update(*main.find_http(lines))
+
+    rows = list(main.http_table(stats).rows())
+    clients = list(main.clients_table(stats, 1).rows())
+
+    assert rows == [
+        ("/a/", "-", 0, 0, 0, 0, 1, 1.0),
+        ("/a/", "GET", 0, 1, 0, 1, 0, 0.5),
+        ("/a/", "POST", 0, 0, 1, 0, 0, 0.0),
+    ]
+    assert clients == [("/a/", 4, 0.5, 0, "10.0.0.1 (2)")]
+
+
+@pytest.mark.parametrize("address", ["192.168.1.59", "10.0.0.1", "2001:db8::1", "::1"])
+def test_pack_address(address):
+    """Адрес упаковывается в число и восстанавливается; IPv4 не смешивается с IPv6."""
+    packed = main.pack_address(address)
+
+    assert isinstance(packed, int)
+    assert main.format_address(packed) == str(ipaddress.ip_address(address))
+    assert main.pack_address("not-an-ip") is None
+    assert main.pack_address("0.0.0.1") != main.pack_address("::1")
+
+
+def test_heavy_hitters_bounded(monkeypatch):
+    """Сводка ограничена, частые адреса сохраняются, недостача не больше dropped."""
+    monkeypatch.setattr(main, "HTTP_CLIENTS_CAPACITY", 8)
+    heavy = {f"10.0.0.{i}": 500 - 100 * i for i in range(1, 4)}
+    stats = HttpStats()
+    for batch in range(50):
+        clients = Counter(
+            {("/a/", main.pack_address(a)): n // 50 for a, n in heavy.items()}
+        )
+        for i in range(40):
+            clients["/a/", main.pack_address(f"10.1.{batch}.{i}")] += 1
+        stats.update(Counter(), clients)
+
+    sketch = stats.clients["/a/"]
+    assert len(sketch) <= 8
+    dropped = stats.dropped["/a/"]
+    assert 0 < dropped <= (sum(heavy.values()) + 50 * 40) / 9
+    for address, count in heavy.items():
+        assert count - dropped <= sketch[main.pack_address(address)] <= count
+    assert [address for address, _ in stats.top_clients("/a/", 3)] == list(heavy)
+
+
+def test_merge_matches_parsing(log_files):
+    """Объединение наборов по файлам совпадает с разбором всех файлов."""
+    merged = HttpStats()
+    for log_file in log_files:
+        merged.merge(collect_statistics([log_file], "http"))
+
+    expected = collect_statistics(log_files, "http")
+    assert status_counts(merged) == status_counts(expected)
+    assert client_counts(merged) == client_counts(expected)
+
+
+def test_state_and_snapshot_roundtrip(tmp_path, monkeypatch):
+    """Состояние JSON и двоичный снимок восстанавливают набор вместе с dropped."""
+    monkeypatch.setattr(main, "HTTP_CLIENTS_CAPACITY", 4)
+    lines = [
+        REQUEST_LINE.format(method="GET", endpoint="/a/", status=200, client=client)
+        for client in [*(f"10.0.0.{i}" for i in range(10)), "2001:db8::1", "::1"] * 2
+    ]
+    stats = HttpStats().update(*main.find_http(lines))
+    aggregator = HttpAggregator()
+    path = str(tmp_path / "http.bin")
+
+    main.save_snapshot(path, "http", aggregator, stats)
+
+    expected = aggregator.report(stats)
+    assert stats.dropped["/a/"] > 0
+    assert aggregator.report(HttpStats.from_state(stats.to_state())) == expected
+    assert aggregator.report(main.load_snapshot(path, "http", aggregator)) == expected
+
+
+def test_filter_and_normalize():
+    """Фильтр строк и нормализация endpoint применяются к отчету http."""
+    aggregator = HttpAggregator(
+        normalizer=main.EndpointNormalizer(),
+        request_filter=main.RequestFilter(["ERROR"]),
+    )
+
+    stats = collect_statistics(LOG_FILES, "http", aggregator=aggregator)
+
+    assert {method for _, method in stats.statuses} == {"-"}
+    assert sum(map(sum, stats.statuses.values())) == sum(
+        "Internal Server Error:" in line
+        for log_file in LOG_FILES
+        for line in open(log_file, encoding="utf-8")
+    )
+
+
+def test_main_report_http(capsys):
+    """Аргумент --report http выводит таблицы кодов и адресов клиентов."""
+    argv = ["main.py", *LOG_FILES, "--report", "http", "--clients-per-endpoint", "2"]
+    with patch("sys.argv", argv):
+        main.main()
+
+    out = capsys.readouterr().out
+    assert out.startswith("[http]\nTotal requests:")
+    assert "[http-clients]\nTop 2 clients per endpoint" in out
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["main.py", "logs/app1.log", "--clients-per-endpoint", "0"],
+        ["main.py", "--db", "logs.db", "--report", "http"],
+    ],
+)
+def test_parse_args_http_invalid(argv):
+    """Число адресов должно быть положительным, по базе --db отчет не строится."""
+    with patch("sys.argv", argv):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
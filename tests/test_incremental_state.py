@@ -0,0 +1,124 @@
+"""Инкрементальная обработка с файлом состояния."""
+
+import json
+
+import pytest
+
+import main
+
+LINES = [
+    "2025-03-28 12:44:46,000 INFO django.request: GET /api/v1/reviews/ 204 OK\n",
+    "2025-03-28 12:25:45,000 DEBUG django.db.backends: (0.41) SELECT 1;\n",
+    "2025-03-28 12:11:57,000 ERROR django.request: Internal Server Error: /admin/\n",
+]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """Фикстура с путями к лог-файлу и файлу состояния."""
+    log_file = tmp_path / "app.log"
+    log_file.write_text("".join(LINES))
+    return str(log_file), str(tmp_path / "state.json")
+
+
+@pytest.fixture
+def count_calls(monkeypatch):
+    """Фикстура, запоминающая прочитанные байтовые диапазоны."""
+    calls = []
+    iter_counts = main.iter_counts
+
+    def spy(file_path, io_mode="lines", start=0, end=None, *args, **kwargs):
+        calls.append((start, end))
+        return iter_counts(file_path, io_mode, start, end, *args, **kwargs)
+
+    monkeypatch.setattr(main, "iter_counts", spy)
+    return calls
+
+
+def collect(log_file, state_file):
+    """Сбор статистики с файлом состояния."""
+    return main.collect_statistics([log_file], "handlers", state_path=state_file)
+
+
+def test_first_run_saves_offset(paths):
+    """Первый запуск совпадает с полным разбором и сохраняет смещение."""
+    log_file, state_file = paths
+
+    assert collect(log_file, state_file) == main.collect_statistics(
+        [log_file], "handlers"
+    )
+    with open(state_file, encoding="utf-8") as file:
+        entry = next(iter(json.load(file)["files"].values()))
+    assert entry["offset"] == len("".join(LINES).encode())
+
+
+def test_rerun_reads_only_appended_tail(paths, count_calls):
+    """Повторный запуск дочитывает только добавленные строки."""
+    log_file, state_file = paths
+    collect(log_file, state_file)
+    size = len("".join(LINES).encode())
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(LINES[0])
+    count_calls.clear()
+
+    result = collect(log_file, state_file)
+
+    assert count_calls == [(size, size + len(LINES[0].encode()))]
+    assert result == main.collect_statistics([log_file], "handlers")
+    assert result["/api/v1/reviews/"] == {"INFO": 2}
+
+
+def test_unchanged_file_is_not_read(paths, count_calls):
+    """Неизмененный файл берется из состояния без разбора."""
+    log_file, state_file = paths
+    expected = collect(log_file, state_file)
+    count_calls.clear()
+
+    assert collect(log_file, state_file) == expected
+    assert count_calls == []
+
+
+def test_partial_line_is_counted_but_not_saved(paths):
+    """Незавершенная строка попадает в отчет, но смещение стоит перед ней."""
+    log_file, state_file = paths
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write("2025-03-28 12:44:46,000 WARNING django.request: GET /tail/")
+
+    assert collect(log_file, state_file)["/tail/"] == {"WARNING": 1}
+
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(" 200 OK\n")
+    assert collect(log_file, state_file)["/tail/"] == {"WARNING": 1}
+
+
+@pytest.mark.parametrize(
+    "new_content",
+    [LINES[0], LINES[2] + LINES[1] + LINES[0] + LINES[0]],
+    ids=["truncated", "rewritten"],
+)
+def test_truncation_triggers_full_rescan(paths, new_content):
+    """Усечение или подмена содержимого приводит к полному разбору."""
+    log_file, state_file = paths
+    collect(log_file, state_file)
+    with open(log_file, "w", encoding="utf-8") as file:
+        file.write(new_content)
+
+    assert collect(log_file, state_file) == main.collect_statistics(
+        [log_file], "handlers"
+    )
+
+
+def test_corrupted_state_file(paths, caplog):
+    """Поврежденный файл состояния игнорируется с предупреждением."""
+    log_file, state_file = paths
+    with open(state_file, "w", encoding="utf-8") as file:
+        file.write("{broken")
+
+    assert collect(log_file, state_file) == main.collect_statistics(
+        [log_file], "handlers"
+    )
+    assert any("не прочитан" in record.message for record in caplog.records)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,104 @@
+"""Инструментирование этапов обработки: таймеры, счетчики и профилирование."""
+
+import json
+import pstats
+from unittest.mock import patch
+
+import pytest
+
+import main
+
+LOG_CONTENT = (
+    "2025-03-28 12:44:46,000 INFO django.request: GET /api/v1/reviews/ 204 OK\n"
+    "2025-03-28 12:25:45,000 DEBUG django.db.backends: (0.41) SELECT 1;\n"
+    "2025-03-28 12:11:57,000 ERROR django.request: Internal Server Error: /admin/\n"
+    "2025-03-28 12:05:13,000 INFO django.request: GET /api/v1/reviews/ 201 OK\n"
+) * 10
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Фикстура с лог-файлом на 40 строк."""
+    path = tmp_path / "app.log"
+    path.write_text(LOG_CONTENT)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    ("io_mode", "workers", "chunk_size"),
+    [("lines", 1, main.CHUNK_SIZE), ("mmap", 1, main.CHUNK_SIZE), ("lines", 2, 500)],
+)
+def test_counters(log_file, io_mode, workers, chunk_size):
+    """Счетчики файла не зависят от способа чтения и числа процессов."""
+    metrics = main.Metrics()
+    stats = main.collect_statistics(
+        [log_file], "handlers", workers, chunk_size, io_mode, metrics=metrics
+    )
+    counters = metrics.to_dict()["files"][log_file]["counters"]
+
+    assert stats == main.collect_statistics([log_file], "handlers")
+    assert counters == {
+        "bytes_read": len(LOG_CONTENT),
+        "lines_seen": 40,
+        "lines_matched": 30,
+        "level_INFO": 20,
+        "level_ERROR": 10,
+    }
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+def test_lines_seen_without_trailing_newline(tmp_path, io_mode):
+    """Последняя строка без перевода строки учитывается в lines_seen."""
+    path = tmp_path / "app.log"
+    path.write_text(LOG_CONTENT.rstrip("\n"))
+    metrics = main.Metrics()
+    main.collect_statistics([str(path)], "handlers", io_mode=io_mode, metrics=metrics)
+    counters = metrics.to_dict()["files"][str(path)]["counters"]
+
+    assert counters["lines_seen"] == 40
+    assert counters["lines_matched"] == 30
+
+
+def test_worker_breakdown(log_file):
+    """В пуле процессов метрики файла разбиваются по процессам."""
+    metrics = main.Metrics()
+    main.collect_statistics([log_file], "handlers", 2, 500, metrics=metrics)
+    section = metrics.to_dict()["files"][log_file]
+
+    assert "MainProcess" in section["workers"]
+    assert len(section["workers"]) > 1
+    assert set(section["timers"]) == {"read", "parse", "merge"}
+    lines_seen = [
+        worker["counters"].get("lines_seen", 0)
+        for worker in section["workers"].values()
+    ]
+    assert sum(lines_seen) == 40
+
+
+def test_summary(log_file):
+    """Сводка перечисляет итоги и файлы."""
+    metrics = main.Metrics()
+    main.collect_statistics([log_file], "handlers", metrics=metrics)
+    summary = metrics.summary()
+
+    assert summary[0].startswith("Итого: read")
+    assert "lines_matched 30" in summary[0]
+    assert summary[1].startswith(log_file)
+
+
+def test_main_stats_json_and_profile(log_file, tmp_path, capsys):
+    """Аргументы --stats, --stats-json и --profile сохраняют метрики и профиль."""
+    stats_path, profile_path = tmp_path / "stats.json", tmp_path / "run.pstats"
+    argv = ["main.py", log_file, "--stats", "--stats-json", str(stats_path)]
+    with patch("sys.argv", [*argv, "--profile", str(profile_path)]):
+        main.main()
+
+    data = json.loads(stats_path.read_text())
+    assert data["totals"]["counters"]["lines_matched"] == 30
+    assert "report" in data["files"][""]["timers"]
+    assert "Итого:" in capsys.readouterr().err
+    assert pstats.Stats(str(profile_path)).total_calls > 0
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,165 @@
+"""Нормализация endpoint и ограничение числа endpoint в режиме top-K."""
+
+import pickle
+import random
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import Aggregator, EndpointNormalizer, TopEndpointCounter
+
+UUID = "3f2b8c1e-9a4d-4e6f-8b7a-1c2d3e4f5a6b"
+
+
+@pytest.mark.parametrize(
+    ("endpoint", "expected"),
+    [
+        ("/api/v1/users/1234/orders/987/", "/api/v1/users/{id}/orders/{id}/"),
+        (f"/api/files/{UUID}/", "/api/files/{uuid}/"),
+        ("/static/app.9f86d081884c7d65.js", "/static/app.9f86d081884c7d65.js"),
+        ("/media/9f86d081884c7d659a2feaa0c55ad015/", "/media/{hash}/"),
+        ("/api/v1/reviews/?page=2", "/api/v1/reviews/?page=2"),
+        ("/api/v2/items/42?expand=1", "/api/v2/items/{id}?expand=1"),
+    ],
+)
+def test_default_rules(endpoint, expected):
+    """Встроенные правила заменяют только сегменты пути целиком."""
+    assert EndpointNormalizer()(endpoint) == expected
+
+
+def test_user_rules_before_default():
+    """Свои правила применяются до встроенных."""
+    normalizer = EndpointNormalizer(
+        [(r"(?<=/users/)[^/]+", "{user}"), *main.NORMALIZE_RULES]
+    )
+
+    assert normalizer("/users/alice/posts/7/") == "/users/{user}/posts/{id}/"
+
+
+def test_normalizer_cache_is_bounded(monkeypatch):
+    """Кэш нормализатора очищается при переполнении."""
+    monkeypatch.setattr(main, "NORMALIZE_CACHE_SIZE", 10)
+    normalizer = EndpointNormalizer()
+    for i in range(25):
+        normalizer(f"/items/{i}/")
+
+    assert len(normalizer.cache) <= 10
+
+
+def test_collect_statistics_normalized(tmp_path):
+    """Пути с разными идентификаторами сливаются в один endpoint отчета."""
+    path = tmp_path / "app.log"
+    path.write_text(
+        "".join(
+            f"2025-03-28 12:44:46,000 {level} django.request: GET /users/{i}/ 200\n"
+            for i, level in enumerate(["INFO", "INFO", "ERROR"])
+        )
+    )
+
+    stats = main.collect_statistics(
+        [str(path)], "handlers", aggregator=Aggregator(EndpointNormalizer())
+    )
+
+    assert stats == {"/users/{id}/": {"INFO": 2, "ERROR": 1}}
+
+
+def test_top_keeps_capacity_and_heavy_hitters():
+    """Хранилище top-K ограничено capacity и сохраняет частые endpoint."""
+    rng = random.Random(1)
+    stream = ["/heavy/"] * 300 + ["/warm/"] * 150
+    stream += [f"/rare/{i}/" for i in range(1000)]
+    rng.shuffle(stream)
+
+    top = TopEndpointCounter(10)
+    for endpoint in stream:
+        top.add(endpoint, "INFO")
+
+    assert len(top) == 10
+    for endpoint, count in (("/heavy/", 300), ("/warm/", 150)):
+        assert endpoint in top
+        assert (
+            top[endpoint]["INFO"]
+            <= count
+            <= top[endpoint]["INFO"] + top.error(endpoint)
+        )
+
+
+def test_top_exact_under_capacity():
+    """Пока endpoint меньше capacity, счетчики точные."""
+    counter = Counter({("INFO", "/a/"): 3, ("ERROR", "/a/"): 1, ("DEBUG", "/b/"): 2})
+    top = TopEndpointCounter(5).update(counter)
+
+    assert top == main.EndpointCounter().update(counter)
+    assert top.error("/a/") == 0
+
+
+def test_top_merge_and_pickle():
+    """Слияние и сериализация сохраняют ограничение и погрешности."""
+    first, second = TopEndpointCounter(3), TopEndpointCounter(3)
+    for i in range(6):
+        first.add(f"/first/{i}/", "INFO", i + 1)
+        second.add(f"/second/{i}/", "INFO", 10 * (i + 1))
+
+    merged = pickle.loads(pickle.dumps(first)).merge(second)
+
+    assert len(merged) == 3
+    assert set(merged) == {"/second/3/", "/second/4/", "/second/5/"}
+    assert all(merged[endpoint]["INFO"] >= 40 for endpoint in merged)
+
+
+def test_top_parallel(tmp_path):
+    """Режим top-K работает в пуле процессов."""
+    path = tmp_path / "app.log"
+    path.write_text(
+        "INFO django.request: GET /hot/ 200\n" * 50
+        + "".join(f"INFO django.request: GET /cold/{i}/ 200\n" for i in range(40))
+    )
+
+    stats = main.collect_statistics(
+        [str(path)], "handlers", workers=2, chunk_size=256, aggregator=Aggregator(top=5)
+    )
+
+    assert len(stats) == 5
+    assert stats["/hot/"]["INFO"] >= 50 - stats.error("/hot/")
+
+
+def test_state_reset_on_aggregation_change(tmp_path):
+    """Счетчики из файла состояния не смешиваются с другой агрегацией."""
+    path = tmp_path / "app.log"
+    path.write_text("INFO django.request: GET /users/1/ 200\n")
+    state = str(tmp_path / "state.json")
+
+    main.collect_statistics([str(path)], "handlers", state_path=state)
+    stats = main.collect_statistics(
+        [str(path)],
+        "handlers",
+        state_path=state,
+        aggregator=Aggregator(EndpointNormalizer()),
+    )
+
+    assert stats == {"/users/{id}/": {"INFO": 1}}
+
+
+def test_parse_args_normalize_rule():
+    """Аргументы --normalize-rule и --top собираются в агрегатор."""
+    argv = ["main.py", "logs/app1.log", "--normalize", "--top", "100"]
+    argv += ["--normalize-rule", r"(?<=/users/)\w+={user}"]
+    with patch("sys.argv", argv):
+        aggregator = main.create_aggregator(main.parse_args_cli())
+
+    assert aggregator.top == 100
+    assert aggregator.normalizer("/users/bob/7/") == "/users/{user}/{id}/"
+
+
+def test_parse_args_invalid_normalize_rule():
+    """Правило без замены или с ошибкой в выражении отклоняется."""
+    for rule in ["no-placeholder", "([=x"]:
+        with patch("sys.argv", ["main.py", "logs/app1.log", "--normalize-rule", rule]):
+            with pytest.raises(SystemExit):
+                main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
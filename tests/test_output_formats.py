@@ -0,0 +1,144 @@
+"""Вывод отчетов в форматах table, csv, json и ndjson."""
+
+import csv
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import WRITERS, EndpointCounter, create_report
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+@pytest.fixture
+def stats():
+    """Фикстура со статистикой handlers по тестовым логам."""
+    return main.collect_statistics(LOG_FILES, "handlers")
+
+
+def write(sections, fmt: str) -> str:
+    """Выводит таблицы в формате fmt и возвращает текст."""
+    out = io.StringIO()
+    WRITERS[fmt](sections, out)
+    return out.getvalue()
+
+
+def test_table_matches_report(stats):
+    """Формат table пишет те же строки, что возвращает create_report."""
+    sections = main.Aggregator().sections(stats)
+
+    assert write(sections, "table") == "\n".join(create_report(stats)) + "\n"
+
+
+def test_counter_and_dict_render_equally(stats):
+    """Быстрый путь EndpointCounter совпадает с отчетом по словарю."""
+    assert create_report(stats) == create_report(dict(stats.items()))
+
+
+def test_totals_are_aligned():
+    """Итоговая строка шире значений столбца не сдвигает соседние столбцы."""
+    counter = EndpointCounter()
+    for i in range(12):
+        counter.add(f"/h{i}/", "DEBUG", 99_999)
+
+    report = create_report(counter)
+
+    assert report[-1].split() == ["1199988", "0", "0", "0", "0"]
+    assert report[-1].index("0") == report[1].index("INFO")
+
+
+def test_csv(stats):
+    """CSV содержит шапку и строки без итогов."""
+    rows = list(
+        csv.reader(io.StringIO(write(main.Aggregator().sections(stats), "csv")))
+    )
+
+    assert rows[0] == ["HANDLER", *main.LOG_LEVELS]
+    assert len(rows) == len(stats) + 1
+    assert rows[1][0] == min(stats)
+
+
+def test_json_and_ndjson_db():
+    """JSON - массив объектов, дробные значения округлены как в таблице."""
+    aggregator = main.QueryAggregator()
+    stats = main.collect_statistics(LOG_FILES, "db")
+
+    rows = json.loads(write(aggregator.sections(stats), "json"))
+    lines = write(aggregator.sections(stats), "ndjson").splitlines()
+
+    assert [json.loads(line) for line in lines] == rows
+    assert set(rows[0]) == {"query", "count", "total", "p50", "p95", "p99"}
+    assert sum(row["count"] for row in rows) == sum(s.count for s in stats.values())
+    assert rows[0]["total"] == round(max(s.sum for s in stats.values()), 2)
+
+
+def test_several_reports():
+    """Несколько отчетов: объект по именам в JSON и ключ report в NDJSON."""
+    aggregator = main.default_aggregator("handlers,timeline")
+    sections = aggregator.sections(
+        main.collect_statistics(LOG_FILES, "handlers,timeline")
+    )
+
+    document = json.loads(write(sections, "json"))
+    records = [json.loads(line) for line in write(sections, "ndjson").splitlines()]
+
+    assert list(document) == ["handlers", "timeline"]
+    assert {record["report"] for record in records} == {"handlers", "timeline"}
+    assert len(records) == len(document["handlers"]) + len(document["timeline"])
+
+
+@pytest.mark.parametrize("fmt", ["table", "csv", "json", "ndjson"])
+def test_empty_report(fmt):
+    """Пустая статистика выводится в любом формате."""
+    text = write(main.Aggregator().sections(EndpointCounter()), fmt)
+
+    if fmt == "json":
+        assert json.loads(text) == []
+    elif fmt == "ndjson":
+        assert text == ""
+    else:
+        assert "HANDLER" in text
+
+
+def test_special_characters_escaped():
+    """Кавычки и не-ASCII в endpoint не ломают CSV и JSON."""
+    counter = EndpointCounter()
+    counter.add('/поиск/"q",1/', "INFO")
+    sections = main.Aggregator().sections(counter)
+
+    assert json.loads(write(sections, "json"))[0]["handler"] == '/поиск/"q",1/'
+    assert next(csv.reader(io.StringIO(write(sections, "csv").splitlines()[1]))) == [
+        '/поиск/"q",1/',
+        "0",
+        "1",
+        "0",
+        "0",
+        "0",
+    ]
+
+
+def test_main_format_json(capsys):
+    """Аргумент --format выбирает формат вывода main."""
+    with patch("sys.argv", ["main.py", *LOG_FILES, "--format", "json"]):
+        main.main()
+
+    rows = json.loads(capsys.readouterr().out)
+    assert sum(row["info"] for row in rows) == sum(
+        levels.get("INFO", 0)
+        for levels in main.collect_statistics(LOG_FILES, "handlers").values()
+    )
+
+
+def test_parse_args_follow_table_only():
+    """Режим --follow выводит только таблицу."""
+    argv = ["main.py", "logs/app1.log", "--follow", "--format", "csv"]
+    with patch("sys.argv", argv):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
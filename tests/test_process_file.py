@@ -1,7 +1,5 @@
 """Функция collect_statistics собирает статистику из лог-файлов."""
 
-from unittest.mock import mock_open, patch
-
 import pytest
 
 from main import collect_statistics
@@ -64,10 +62,15 @@ TEST_CASES = [
 
 
 @pytest.fixture
-def list_mock_files(request):
-    """Фикстура, создающая mock-файлы на основе параметра request."""
+def list_mock_files(request, tmp_path):
+    """Фикстура, создающая файлы лога на основе параметра request."""
     log_contents = request.param
-    return [mock_open(read_data=content).return_value for content in log_contents]
+    paths = []
+    for i, content in enumerate(log_contents):
+        path = tmp_path / f"app{i}.log"
+        path.write_text(content, encoding="utf-8")
+        paths.append(str(path))
+    return paths
 
 
 @pytest.mark.parametrize(
@@ -78,9 +81,8 @@ def list_mock_files(request):
 )
 def test_collect_statistics(list_mock_files, expected_stats, test_id):
     """Тест сбора статистики из нескольких файлов."""
-    with patch("builtins.open", side_effect=list_mock_files):
-        result = collect_statistics(list_mock_files, report_type="handlers")
-        assert result == expected_stats
+    result = collect_statistics(list_mock_files, report_type="handlers")
+    assert result == expected_stats
 
 
 if __name__ == "__main__":
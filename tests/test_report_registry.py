@@ -0,0 +1,90 @@
+"""Реестр отчетов и несколько отчетов за один проход по файлам."""
+
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import REPORTS, ReportSet, collect_statistics
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+def test_registry_contains_reports():
+    """Встроенные отчеты зарегистрированы под своими именами."""
+    assert REPORTS["handlers"] is main.Aggregator
+    assert REPORTS["db"] is main.QueryAggregator
+    assert REPORTS["timeline"] is main.TimelineAggregator
+
+
+@pytest.mark.parametrize(
+    ("workers", "io_mode"), [(1, "lines"), (1, "mmap"), (2, "lines")]
+)
+def test_single_pass_matches_separate_runs(workers, io_mode):
+    """Отчеты одного прохода совпадают с отдельными запусками."""
+    stats = collect_statistics(
+        LOG_FILES, "handlers,db,timeline", workers, chunk_size=2048, io_mode=io_mode
+    )
+
+    for name in ("handlers", "db", "timeline"):
+        separate = collect_statistics(LOG_FILES, name)
+        assert REPORTS[name]().report(stats[name]) == REPORTS[name]().report(separate)
+
+
+def test_files_read_once(monkeypatch):
+    """Каждый файл читается один раз при любом числе отчетов."""
+    calls = []
+    iter_parts = main.iter_parts
+
+    def spy(file_path, *args, **kwargs):
+        calls.append(file_path)
+        return iter_parts(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(main, "iter_parts", spy)
+    collect_statistics(LOG_FILES, "handlers,db")
+
+    assert calls == LOG_FILES
+
+
+def test_report_sections():
+    """Отчет набора состоит из отчетов под заголовками с именами."""
+    aggregator = main.default_aggregator("db,handlers")
+    report = aggregator.report(collect_statistics(LOG_FILES, "db,handlers"))
+
+    assert isinstance(aggregator, ReportSet)
+    assert report[0] == "[db]"
+    assert report[1].startswith("Total queries:")
+    assert report[report.index("[handlers]") - 1] == ""
+
+
+def test_state_roundtrip(tmp_path):
+    """Набор отчетов сохраняется в файле состояния и восстанавливается."""
+    state = str(tmp_path / "state.json")
+    aggregator = main.default_aggregator("handlers,db")
+
+    first = collect_statistics(LOG_FILES, "handlers,db", state_path=state)
+    second = collect_statistics(LOG_FILES, "handlers,db", state_path=state)
+
+    assert aggregator.report(second) == aggregator.report(first)
+
+
+def test_parse_args_several_reports():
+    """Отчеты перечисляются через запятую или повтором --report без дублей."""
+    argv = ["main.py", "logs/app1.log", "--report", "db,handlers", "--report", "db"]
+    with patch("sys.argv", argv):
+        args = main.parse_args_cli()
+    aggregator = main.create_aggregator(args)
+
+    assert args.report == "db,handlers"
+    assert list(aggregator.reports) == ["db", "handlers"]
+
+
+def test_parse_args_unknown_report():
+    """Неизвестное имя в списке отчетов отклоняется."""
+    with patch("sys.argv", ["main.py", "logs/app1.log", "--report", "handlers,x"]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
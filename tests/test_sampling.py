@@ -0,0 +1,169 @@
+"""Оценка отчета handlers по случайной выборке блоков (--sample, --budget)."""
+
+import gzip
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+import main
+from benchmarks import generate
+from main import SampleStats, collect_statistics, create_report, iter_sample
+
+LINES = 50_000
+SEEDS = range(50)
+
+
+@pytest.fixture(scope="module")
+def log_file(tmp_path_factory):
+    """Фикстура со сгенерированным логом на LINES строк."""
+    path = tmp_path_factory.mktemp("sample") / "bench.log"
+    generate.write_log(str(path), LINES, endpoints=20)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    """Блоки по 16 КБ, чтобы в небольшом логе их были сотни."""
+    monkeypatch.setattr(main, "SAMPLE_BLOCK", 16 * 1024)
+
+
+def exact_cells(stats) -> dict[tuple[str, int], int]:
+    """Точные счетчики {(endpoint, номер уровня): count}."""
+    return {
+        (endpoint, column): levels.get(level, 0)
+        for endpoint, levels in stats.items()
+        for column, level in enumerate(main.LOG_LEVELS)
+    }
+
+
+def test_intervals_cover_exact_counts(log_file):
+    """95% интервалы по 10% блоков накрывают точные значения почти всегда."""
+    exact = collect_statistics([log_file], "handlers")
+    total = sum(sum(levels.values()) for levels in exact.values())
+
+    covered_totals, covered_cells, cells = 0, 0, 0
+    for seed in SEEDS:
+        stats = collect_statistics([log_file], "handlers", sample=0.1, seed=seed)
+        value, margin = stats.total()
+        covered_totals += abs(value - total) <= margin
+        for (endpoint, column), count in exact_cells(exact).items():
+            value, margin = stats.cell(endpoint, column)
+            covered_cells += abs(value - count) <= margin
+            cells += 1
+
+    assert covered_totals >= 0.85 * len(SEEDS)
+    assert covered_cells >= 0.85 * cells
+
+
+def test_full_sample_is_exact(log_file):
+    """Выборка всех блоков совпадает с точным подсчетом, интервалы нулевые."""
+    exact = collect_statistics([log_file], "handlers")
+
+    stats = collect_statistics([log_file], "handlers", sample=1.0, seed=1)
+
+    assert stats.blocks == stats.population
+    for (endpoint, column), count in exact_cells(exact).items():
+        assert stats.cell(endpoint, column) == pytest.approx((count, 0.0))
+
+
+def test_seed_is_reproducible(log_file):
+    """Одно зерно дает одну выборку и один отчет."""
+    first = collect_statistics([log_file], "handlers", sample=0.05, seed=3)
+    second = collect_statistics([log_file], "handlers", sample=0.05, seed=3)
+
+    assert create_report(first) == create_report(second)
+
+
+def test_progressive_refinement(log_file):
+    """Каждый следующий блок уточняет оценку, интервал в итоге сужается."""
+    margins, blocks = [], []
+    for stats in iter_sample([log_file], main.Aggregator(), seed=5):
+        blocks.append(stats.blocks)
+        margins.append(stats.total()[1])
+
+    assert blocks == list(range(main.SAMPLE_MIN_BLOCKS, blocks[-1] + 1))
+    assert margins[-1] == 0.0 < margins[len(margins) // 2] < margins[0]
+
+
+def test_budget_reads_minimum_blocks(log_file):
+    """Даже с исчерпанным бюджетом читается SAMPLE_MIN_BLOCKS блоков."""
+    stats = collect_statistics([log_file], "handlers", budget=1e-9, seed=1)
+
+    assert stats.blocks == main.SAMPLE_MIN_BLOCKS
+    assert stats.total()[0] > 0
+
+
+def test_compressed_file_read_whole(log_file, tmp_path):
+    """Сжатый файл читается целиком и входит в оценку точно."""
+    compressed = tmp_path / "app1.log.gz"
+    with open("logs/app1.log", "rb") as file:
+        compressed.write_bytes(gzip.compress(file.read()))
+    exact = collect_statistics(["logs/app1.log"], "handlers")
+
+    stats = collect_statistics([str(compressed)], "handlers", sample=0.5)
+
+    assert isinstance(stats, SampleStats)
+    assert stats.population == 0
+    assert stats.exact == exact
+    assert stats.total() == (sum(exact.counts), 0.0)
+
+
+def test_report_with_intervals(log_file):
+    """В отчете рядом с уровнями - полуширины интервалов, в заголовке - оценка."""
+    stats = collect_statistics([log_file], "handlers", sample=0.1, seed=2)
+    aggregator = main.Aggregator()
+
+    out = io.StringIO()
+    main.WRITERS["json"](aggregator.sections(stats), out)
+
+    report = create_report(stats)
+    rows = json.loads(out.getvalue())
+
+    assert report[0].startswith("Total requests: ~")
+    assert "95% CI" in report[0]
+    assert report[1].split()[:3] == ["HANDLER", "DEBUG", "DEBUG_CI"]
+    assert {"handler", "info", "info_ci"} <= set(rows[0])
+
+
+def test_other_reports_rejected(log_file):
+    """Выборка поддерживается только для отчета handlers без top-K."""
+    with pytest.raises(ValueError):
+        collect_statistics([log_file], "db", sample=0.1)
+    with pytest.raises(ValueError):
+        collect_statistics(
+            [log_file], "handlers", aggregator=main.Aggregator(top=5), sample=0.1
+        )
+
+
+def test_main_sample(log_file, capsys):
+    """Аргумент --sample выводит оценку с интервалами."""
+    with patch("sys.argv", ["main.py", log_file, "--sample", "0.1", "--seed", "1"]):
+        main.main()
+
+    assert capsys.readouterr().out.startswith("Total requests: ~")
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        ["--sample", "0"],
+        ["--sample", "1.5"],
+        ["--budget", "0"],
+        ["--sample", "0.1", "--report", "db"],
+        ["--sample", "0.1", "--workers", "2"],
+        ["--budget", "1", "--state", "state.json"],
+        ["--sample", "0.1", "--top", "10"],
+        ["--sample", "0.1", "--save-stats", "stats.bin"],
+    ],
+)
+def test_parse_args_sample_invalid(extra):
+    """Доля выборки в (0, 1], бюджет > 0, несовместимые режимы отклоняются."""
+    with patch("sys.argv", ["main.py", "logs/app1.log", *extra]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
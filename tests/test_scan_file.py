@@ -0,0 +1,70 @@
+"""Режим mmap считает запросы так же, как построчное чтение."""
+
+import pytest
+
+import main
+
+LOG_CONTENT = (
+    "INFO django.request: GET /api/users\n"
+    "Some invalid log line\n"
+    "2025-03-28 12:01:42,000 INFO django.request: OPTIONS /skipped/ 200 OK\n"
+    "2025-03-28 12:01:42,000 INFO django.request:\n"
+    "DEBUG INFO django.request: GET /first/ django.request: GET /second/\n"
+    "django.request: GET /no-level/ then ERROR django.request: POST /late/\n"
+    "2025-03-28 12:01:42,000 ERROR django.request: Internal Server Error: /x/ [1]\n"
+    "2025-03-28 12:01:42,000 WARNING django.request: GET /кириллица/ 200 OK\n"
+)
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    """Фикстура с лог-файлом из граничных строк и файлов logs/."""
+    path = tmp_path / "app.log"
+    with open("logs/app1.log", encoding="utf-8") as file:
+        path.write_text(LOG_CONTENT + file.read() + "INFO django.request: GET /tail/")
+    return str(path)
+
+
+def test_scan_file_matches_lines(log_file):
+    """Счетчики mmap совпадают с построчным режимом."""
+    assert main.count_file(log_file, "mmap") == main.count_file(log_file, "lines")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 50, 1000])
+def test_scan_file_ranges(log_file, chunk_size):
+    """Сумма по диапазонам совпадает с подсчетом по всему файлу."""
+    expected = main.count_file(log_file, "lines")
+    total = main.Counter()
+    for path, start, end in main.split_file(log_file, chunk_size):
+        total.update(main.count_file(path, "mmap", start, end))
+
+    assert total == expected
+
+
+def test_scan_file_small_windows(log_file, monkeypatch):
+    """Окна отображения не теряют строки на своих границах."""
+    monkeypatch.setattr(main, "MMAP_WINDOW", 64)
+
+    assert main.count_file(log_file, "mmap") == main.count_file(log_file, "lines")
+
+
+def test_scan_file_empty(tmp_path):
+    """Пустой файл не отображается и дает пустой счетчик."""
+    path = tmp_path / "empty.log"
+    path.write_bytes(b"")
+
+    assert main.scan_file(str(path)) == {}
+
+
+def test_collect_statistics_mmap_parallel(log_file):
+    """Режим mmap работает в пуле процессов."""
+    serial = main.collect_statistics([log_file], "handlers")
+    parallel = main.collect_statistics(
+        [log_file], "handlers", workers=2, chunk_size=100, io_mode="mmap"
+    )
+
+    assert parallel == serial
+
+
+if __name__ == "__main__":
+    pytest.main()
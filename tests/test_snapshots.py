@@ -0,0 +1,144 @@
+"""Двоичные снимки статистики (--save-stats) и их объединение (--merge)."""
+
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import (
+    TimelineAggregator,
+    collect_statistics,
+    load_snapshot,
+    merge_snapshots,
+    save_snapshot,
+)
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+def snapshot_files(tmp_path, report_type: str, aggregator=None) -> list[str]:
+    """Сохраняет снимок каждого тестового лога и возвращает пути снимков."""
+    aggregator = aggregator or main.default_aggregator(report_type)
+    paths = []
+    for index, log_file in enumerate(LOG_FILES):
+        path = str(tmp_path / f"server{index}.bin")
+        stats = collect_statistics([log_file], report_type, aggregator=aggregator)
+        save_snapshot(path, report_type, aggregator, stats)
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("report_type", ["handlers", "db", "timeline"])
+def test_merge_matches_parsing(tmp_path, report_type):
+    """Объединение снимков по файлам совпадает с разбором всех файлов."""
+    aggregator = main.default_aggregator(report_type)
+
+    merged = merge_snapshots(snapshot_files(tmp_path, report_type), report_type)
+
+    assert aggregator.report(merged) == aggregator.report(
+        collect_statistics(LOG_FILES, report_type)
+    )
+
+
+def test_roundtrip_exact(tmp_path):
+    """Снимок восстанавливает хранилища без потерь, включая скетчи."""
+    aggregator = main.default_aggregator("handlers,db")
+    stats = collect_statistics(LOG_FILES, "handlers,db")
+    path = str(tmp_path / "stats.bin")
+
+    save_snapshot(path, "handlers,db", aggregator, stats)
+    loaded = load_snapshot(path, "handlers,db", aggregator)
+
+    assert loaded["handlers"] == stats["handlers"]
+    assert loaded["db"].to_state() == stats["db"].to_state()
+
+
+def test_top_errors_preserved(tmp_path):
+    """Погрешности top-K сохраняются и складываются при объединении."""
+    aggregator = main.Aggregator(top=2)
+    paths = snapshot_files(tmp_path, "handlers", aggregator)
+
+    merged = merge_snapshots(paths, "handlers", aggregator)
+    loaded = [load_snapshot(path, "handlers", aggregator) for path in paths]
+
+    assert len(merged) == 2
+    assert sum(merged.errors) >= max(sum(stats.errors) for stats in loaded) > 0
+
+
+def test_report_subset(tmp_path):
+    """Из снимка нескольких отчетов берется только запрошенный."""
+    paths = snapshot_files(tmp_path, "handlers,db")
+
+    merged = merge_snapshots(paths, "db")
+
+    assert merged.to_state() == collect_statistics(LOG_FILES, "db").to_state()
+
+
+def test_settings_mismatch(tmp_path):
+    """Снимок с другими настройками агрегации или без отчета не объединяется."""
+    paths = snapshot_files(tmp_path, "timeline", TimelineAggregator(bucket=300))
+
+    with pytest.raises(ValueError, match="другими настройками"):
+        merge_snapshots(paths, "timeline")
+    with pytest.raises(ValueError, match="нет отчета"):
+        merge_snapshots(paths, "handlers")
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"not a snapshot", main.SNAPSHOT_HEADER.pack(b"DJLOGSNP", 99)]
+)
+def test_invalid_file(tmp_path, data):
+    """Файл не того формата или другой версии отклоняется."""
+    path = tmp_path / "bad.bin"
+    path.write_bytes(data)
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(path), "handlers", main.Aggregator())
+
+
+def test_truncated_file(tmp_path):
+    """Обрезанный снимок отклоняется, а не читается частично."""
+    path = snapshot_files(tmp_path, "handlers")[0]
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:-3])
+
+    with pytest.raises(ValueError, match="поврежден"):
+        load_snapshot(path, "handlers", main.Aggregator())
+
+
+def test_main_save_and_merge(tmp_path, capsys):
+    """--save-stats на серверах и --merge на одной машине дают тот же отчет."""
+    paths = []
+    for index, log_file in enumerate(LOG_FILES):
+        paths.append(str(tmp_path / f"server{index}.bin"))
+        with patch("sys.argv", ["main.py", log_file, "--save-stats", paths[-1]]):
+            main.main()
+    capsys.readouterr()
+
+    with patch("sys.argv", ["main.py", "--merge", *paths]):
+        main.main()
+
+    report = main.create_report(collect_statistics(LOG_FILES, "handlers"))
+    assert capsys.readouterr().out == "\n".join(report) + "\n"
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        [],
+        ["logs/app1.log", "--merge", "a.bin"],
+        ["--merge", "a.bin", "--follow"],
+        ["logs/app1.log", "--follow", "--save-stats", "a.bin"],
+    ],
+)
+def test_parse_args_invalid(argv):
+    """--merge не сочетается с файлами лога, без них нужен --merge."""
+    with patch("sys.argv", ["main.py", *argv]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()
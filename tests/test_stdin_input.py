@@ -0,0 +1,98 @@
+"""Чтение лога из стандартного ввода (-) в конце конвейера."""
+
+import gzip
+import io
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import collect_statistics
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+def log_bytes() -> bytes:
+    """Содержимое тестовых логов подряд."""
+    data = b""
+    for log_file in LOG_FILES:
+        with open(log_file, "rb") as file:
+            data += file.read()
+    return data
+
+
+def fake_stdin(data: bytes) -> io.TextIOWrapper:
+    """Стандартный ввод с данными data."""
+    return io.TextIOWrapper(io.BufferedReader(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+@pytest.mark.parametrize("report_type", ["handlers", "db,timeline"])
+def test_matches_files(monkeypatch, io_mode, report_type):
+    """Статистика stdin совпадает со статистикой тех же файлов."""
+    monkeypatch.setattr(main, "READ_BLOCK", 4096)
+    aggregator = main.default_aggregator(report_type)
+
+    with patch("sys.stdin", fake_stdin(log_bytes())):
+        stats = collect_statistics(["-"], report_type, io_mode=io_mode)
+
+    assert aggregator.report(stats) == aggregator.report(
+        collect_statistics(LOG_FILES, report_type)
+    )
+
+
+def test_compressed_stdin():
+    """Сжатый gzip поток на stdin распаковывается."""
+    with patch("sys.stdin", fake_stdin(gzip.compress(log_bytes()))):
+        stats = collect_statistics(["-"], "handlers")
+
+    assert stats == collect_statistics(LOG_FILES, "handlers")
+
+
+def test_stdin_with_files():
+    """Стандартный ввод можно указать вместе с файлами."""
+    with open(LOG_FILES[0], "rb") as file:
+        data = file.read()
+
+    with patch("sys.stdin", fake_stdin(data)):
+        stats = collect_statistics(["-", *LOG_FILES[1:]], "handlers")
+
+    assert stats == collect_statistics(LOG_FILES, "handlers")
+
+
+def test_pipeline():
+    """main.py работает в конце конвейера оболочки."""
+    result = subprocess.run(
+        [sys.executable, "main.py", "-", "--format", "csv"],
+        input=log_bytes(),
+        capture_output=True,
+        check=True,
+    )
+
+    rows = result.stdout.decode().splitlines()
+    assert len(rows) == len(collect_statistics(LOG_FILES, "handlers")) + 1
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [["-"], ["--workers", "2"], ["--follow"], ["--state", "state.json"]],
+)
+def test_parse_args_stdin_invalid(extra):
+    """Стандартный ввод указывается один раз, без пула, --state и --follow."""
+    with patch("sys.argv", ["main.py", "-", *extra]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+def test_parse_args_stdin():
+    """Путь - не проверяется как файл."""
+    with patch("sys.argv", ["main.py", "-", "logs/app1.log"]):
+        args = main.parse_args_cli()
+
+    assert args.log_files == ["-", "logs/app1.log"]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,170 @@
+"""Отчет timeline: запросы по корзинам времени, фильтр since/until."""
+
+import random
+from unittest.mock import patch
+
+import pytest
+
+import main
+from main import TimelineAggregator, collect_statistics, find_time_offset
+
+LOG_FILES = ["logs/app1.log", "logs/app2.log", "logs/app3.log"]
+
+
+def request_line(minute: int, second: int, level: str, endpoint: str) -> str:
+    """Строка django.request с меткой 2025-03-28 12:MM:SS."""
+    return (
+        f"2025-03-28 12:{minute:02}:{second:02},000 {level} django.request: "
+        f"GET {endpoint} 200 OK\n"
+    )
+
+
+@pytest.fixture
+def sorted_log(tmp_path):
+    """Фикстура с отсортированным по времени логом и строками traceback."""
+    lines = []
+    for minute in range(60):
+        lines.append(request_line(minute, 0, "INFO", "/api/"))
+        lines.append(request_line(minute, 30, "ERROR", f"/item/{minute % 3}/"))
+        lines.append("Traceback (most recent call last):\n")
+    path = tmp_path / "sorted.log"
+    path.write_text("".join(lines))
+    return str(path)
+
+
+def test_totals_match_handlers():
+    """Сумма по корзинам совпадает с отчетом handlers, порядок строк не важен."""
+    handlers = collect_statistics(LOG_FILES, "handlers")
+    timeline = collect_statistics(
+        LOG_FILES, "timeline", aggregator=TimelineAggregator(bucket=300)
+    )
+
+    merged = main.EndpointCounter()
+    for counts in timeline.values():
+        merged.merge(counts)
+    assert merged == handlers
+    assert all(bucket % 300 == 0 for bucket in timeline)
+
+
+def test_out_of_order_lines(tmp_path):
+    """Перемешанные строки попадают в корзины по своим меткам."""
+    lines = [request_line(minute, 5, "INFO", "/a/") for minute in (5, 0, 7, 1, 6)]
+    path = tmp_path / "app.log"
+    path.write_text("".join(lines))
+
+    stats = collect_statistics([str(path)], "timeline")
+    report = main.create_timeline_report(stats)
+
+    assert {main.format_bucket(b): c["/a/"]["INFO"] for b, c in stats.items()} == {
+        "2025-03-28 12:00:00": 1,
+        "2025-03-28 12:01:00": 1,
+        "2025-03-28 12:05:00": 1,
+        "2025-03-28 12:06:00": 1,
+        "2025-03-28 12:07:00": 1,
+    }
+    assert report[0] == "Total requests: 5\n"
+    assert report[2].startswith("2025-03-28 12:00:00")
+
+
+@pytest.mark.parametrize("io_mode", ["lines", "mmap"])
+def test_since_until_filter(sorted_log, io_mode):
+    """Учитываются только строки из [since, until)."""
+    aggregator = TimelineAggregator(600, "2025-03-28 12:10:00", "2025-03-28 12:30:00")
+    stats = collect_statistics(
+        [sorted_log], "timeline", io_mode=io_mode, aggregator=aggregator
+    )
+
+    assert sorted(map(main.format_bucket, stats)) == [
+        "2025-03-28 12:10:00",
+        "2025-03-28 12:20:00",
+    ]
+    assert sum(counts["/api/"]["INFO"] for counts in stats.values()) == 20
+
+
+def test_find_time_offset(sorted_log):
+    """Бинарный поиск указывает на первую строку с меткой не раньше заданной."""
+    with open(sorted_log, "rb") as file:
+        data = file.read()
+
+    offset = find_time_offset(sorted_log, "2025-03-28 12:10:15")
+
+    assert data[offset:].startswith(request_line(10, 30, "ERROR", "/item/1/").encode())
+    assert find_time_offset(sorted_log, "2025-03-28 11:00:00") == 0
+    assert find_time_offset(sorted_log, "2025-03-28 13:00:00") == len(data) - len(
+        b"Traceback (most recent call last):\n"
+    )
+
+
+def test_sorted_reads_only_range(sorted_log, monkeypatch):
+    """Для отсортированного файла читается только найденный диапазон байт."""
+    calls = []
+    iter_counts = main.iter_counts
+
+    def spy(file_path, io_mode="lines", start=0, end=None, *args, **kwargs):
+        calls.append((start, end))
+        return iter_counts(file_path, io_mode, start, end, *args, **kwargs)
+
+    monkeypatch.setattr(main, "iter_counts", spy)
+    since, until = "2025-03-28 12:10:00", "2025-03-28 12:30:00"
+    full = collect_statistics(
+        [sorted_log], "timeline", aggregator=TimelineAggregator(60, since, until)
+    )
+    aggregator = TimelineAggregator(60, since, until, sorted_input=True)
+    ranged = collect_statistics([sorted_log], "timeline", aggregator=aggregator)
+    parallel = collect_statistics(
+        [sorted_log], "timeline", workers=2, chunk_size=512, aggregator=aggregator
+    )
+
+    assert ranged == parallel == full
+    assert calls[:2] == [
+        (0, None),
+        (find_time_offset(sorted_log, since), find_time_offset(sorted_log, until)),
+    ]
+
+
+def test_random_bisect(tmp_path):
+    """Бинарный поиск согласован с линейным на случайных отсортированных логах."""
+    rng = random.Random(7)
+    seconds = sorted(rng.randrange(3600) for _ in range(200))
+    lines = [request_line(s // 60, s % 60, "INFO", "/x/") for s in seconds]
+    path = tmp_path / "app.log"
+    path.write_text("".join(lines))
+
+    for _ in range(20):
+        target = rng.randrange(3600)
+        stamp = f"2025-03-28 12:{target // 60:02}:{target % 60:02}"
+        expected = sum(len(line) for line in lines if line[:19] < stamp)
+        assert find_time_offset(str(path), stamp) == expected
+
+
+def test_parse_args_timeline():
+    """Аргументы --bucket, --since и --until разбираются в агрегатор."""
+    argv = ["main.py", "logs/app1.log", "--report", "timeline", "--bucket", "5m"]
+    argv += ["--since", "2025-03-28 12:00", "--until", "2025-03-28T13:00:00"]
+    with patch("sys.argv", argv):
+        aggregator = main.create_aggregator(main.parse_args_cli())
+
+    assert aggregator.bucket == 300
+    assert aggregator.since == "2025-03-28 12:00:00"
+    assert aggregator.until == "2025-03-28 13:00:00"
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        ["--report", "timeline", "--bucket", "0m"],
+        ["--report", "timeline", "--bucket", "1w"],
+        ["--report", "timeline", "--since", "yesterday"],
+        ["--since", "2025-03-28"],
+        ["--report", "timeline", "--since", "2025-03-29", "--until", "2025-03-28"],
+    ],
+)
+def test_parse_args_timeline_invalid(extra):
+    """Некорректные аргументы отчета timeline отклоняются."""
+    with patch("sys.argv", ["main.py", "logs/app1.log", *extra]):
+        with pytest.raises(SystemExit):
+            main.parse_args_cli()
+
+
+if __name__ == "__main__":
+    pytest.main()